@@ -0,0 +1,285 @@
+"""
+API HTTP de solo lectura del Sistema de Calificaciones (JSON).
+
+Pensada para otros sistemas del campus (LMS, portal de estudiantes). Usa solo la
+biblioteca estándar: un servidor asyncio atiende las conexiones y las consultas a
+SQLite se ejecutan en un pool acotado de hilos con conexiones de solo lectura.
+
+Uso (desde la raíz del proyecto):
+    python api.py --host 127.0.0.1 --port 8600 --workers 8
+
+Rutas:
+    GET /api/salud
+    GET /api/profesores/<clave>/materias
+    GET /api/materias/<codigo>/estudiantes?profesor=<clave>[&grupo=<grupo>][&semestre=<semestre>]
+    GET /api/materias/<codigo>/estadisticas[?profesor=<clave>][&grupo=<grupo>][&semestre=<semestre>]
+
+Si la variable de entorno CALIFICACIONES_API_TOKEN está definida, cada petición
+debe incluir la cabecera "Authorization: Bearer <token>". Sin token la API solo
+acepta escuchar en la interfaz local (127.0.0.1, ::1 o localhost).
+"""
+
+import argparse
+import asyncio
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database.database import db
+from utils.recursos import registro
+
+logger = logging.getLogger(__name__)
+
+ESTADOS_HTTP = {
+    200: 'OK',
+    400: 'Bad Request',
+    401: 'Unauthorized',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable'
+}
+
+# Límites de cada petición: longitud de la línea de petición y de cada cabecera (también
+# es el límite del StreamReader), número de cabeceras y tamaño del cuerpo
+MAX_LINEA = 8192
+MAX_CABECERAS = 100
+MAX_CUERPO = 64 * 1024
+
+
+class ErrorHTTP(Exception):
+    """Error que se responde al cliente con su código de estado"""
+
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.mensaje = mensaje
+
+
+def buscar_profesor(clave):
+    profesor = db.get_profesor(clave)
+    if profesor is None:
+        raise ErrorHTTP(404, f"No existe el profesor {clave}")
+    return profesor
+
+
+def buscar_materia(codigo):
+    materia = db.get_materia(codigo)
+    if materia is None:
+        raise ErrorHTTP(404, f"No existe la materia {codigo}")
+    return materia
+
+
+def materias_profesor(clave, query):
+    """Materias y grupos asignados a un profesor"""
+    profesor = buscar_profesor(clave)
+    materias = db.get_profesor_materias(profesor['id'])
+    return {'profesor': clave,
+            'materias': [{campo: m[campo] for campo in ('codigo', 'nombre', 'grupo', 'semestre')} for m in materias]}
+
+
+def estudiantes_materia(codigo, query):
+    """Lista de estudiantes de una materia con sus calificaciones"""
+    if 'profesor' not in query:
+        raise ErrorHTTP(400, "Falta el parámetro profesor")
+    materia = buscar_materia(codigo)
+    profesor = buscar_profesor(query['profesor'])
+    estudiantes = db.get_estudiantes_materia(materia['id'], profesor['id'], grupo=query.get('grupo'),
+                                             semestre=query.get('semestre'))
+    return {'materia': codigo, 'profesor': profesor['clave'], 'grupo': query.get('grupo'),
+            'estudiantes': [{campo: valor for campo, valor in est.items() if campo != 'id'} for est in estudiantes]}
+
+
+def estadisticas_materia(codigo, query):
+    """Resumen y distribución de calificaciones de una materia"""
+    materia = buscar_materia(codigo)
+    profesor_id = buscar_profesor(query['profesor'])['id'] if 'profesor' in query else None
+    resumen = db.get_resumen_calificaciones(profesor_id=profesor_id, materia_id=materia['id'],
+                                            semestre=query.get('semestre'), grupo=query.get('grupo'))
+    return {'materia': codigo, 'profesor': query.get('profesor'), 'grupo': query.get('grupo'), **resumen}
+
+
+# Rutas: (patrón de la ruta, función que recibe los grupos del patrón y los parámetros)
+RUTAS = [
+    (re.compile(r'^/api/profesores/([^/]+)/materias$'), materias_profesor),
+    (re.compile(r'^/api/materias/([^/]+)/estudiantes$'), estudiantes_materia),
+    (re.compile(r'^/api/materias/([^/]+)/estadisticas$'), estadisticas_materia)
+]
+
+
+class GradesAPI:
+    """Servidor HTTP/1.1 mínimo con conexiones persistentes (keep-alive)"""
+
+    def __init__(self, workers=8, token=None):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api-db')
+        self.token = token
+        self.peticiones = 0
+        # Una conexión de solo lectura por hilo del pool
+        db.read_pool.size = max(db.read_pool.size, workers)
+
+    async def leer_linea(self, reader):
+        try:
+            return await reader.readline()
+        except ValueError:
+            # El StreamReader no encontró el fin de línea dentro de MAX_LINEA bytes
+            raise ErrorHTTP(400, "Línea de petición o cabecera demasiado larga")
+
+    async def leer_peticion(self, reader):
+        """Lee la línea de petición, las cabeceras y el cuerpo; None si el cliente cerró"""
+        linea = await self.leer_linea(reader)
+        if not linea:
+            return None
+
+        partes = linea.decode('latin-1').split()
+        cabeceras = {}
+        while True:
+            cabecera = await self.leer_linea(reader)
+            if cabecera in (b'\r\n', b'\n', b''):
+                break
+            if len(cabeceras) >= MAX_CABECERAS:
+                raise ErrorHTTP(400, "Demasiadas cabeceras")
+            nombre, _, valor = cabecera.decode('latin-1').partition(':')
+            cabeceras[nombre.strip().lower()] = valor.strip()
+
+        # Las rutas no usan cuerpo, pero hay que consumirlo para la siguiente petición
+        longitud = cabeceras.get('content-length') or '0'
+        if not (longitud.isascii() and longitud.isdigit()):
+            raise ErrorHTTP(400, "Content-Length inválido")
+        if int(longitud) > MAX_CUERPO:
+            raise ErrorHTTP(413, "El cuerpo de la petición es demasiado grande")
+        if int(longitud):
+            await reader.readexactly(int(longitud))
+        return partes, cabeceras
+
+    async def manejar_conexion(self, reader, writer):
+        """Atiende las peticiones de una conexión hasta que el cliente la cierre"""
+        try:
+            while True:
+                try:
+                    peticion = await self.leer_peticion(reader)
+                except ErrorHTTP as e:
+                    # Tras una petición que excede los límites la conexión no se puede reutilizar
+                    writer.write(self.respuesta(e.estado, {'error': e.mensaje}, False))
+                    await writer.drain()
+                    break
+                if peticion is None:
+                    break
+
+                partes, cabeceras = peticion
+                if len(partes) != 3:
+                    estado, cuerpo, mantener = 400, {'error': "Petición mal formada"}, False
+                else:
+                    metodo, objetivo, version = partes
+                    conexion = cabeceras.get('connection', '').lower()
+                    mantener = conexion == 'keep-alive' if version == 'HTTP/1.0' else conexion != 'close'
+                    estado, cuerpo = await self.despachar(metodo, objetivo, cabeceras)
+
+                writer.write(self.respuesta(estado, cuerpo, mantener))
+                await writer.drain()
+                if not mantener:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def despachar(self, metodo, objetivo, cabeceras):
+        """Resuelve la ruta y ejecuta la consulta en el pool de hilos"""
+        self.peticiones += 1
+        try:
+            if metodo != 'GET':
+                raise ErrorHTTP(405, "Solo se admiten peticiones GET")
+            # Comparación en tiempo constante (se comparan los bytes tal como llegan)
+            if self.token and not hmac.compare_digest(cabeceras.get('authorization', '').encode('latin-1'),
+                                                      f"Bearer {self.token}".encode('utf-8')):
+                raise ErrorHTTP(401, "Token inválido o ausente")
+
+            url = urlsplit(objetivo)
+            if url.path == '/api/salud':
+                salud = await asyncio.get_running_loop().run_in_executor(self.executor, registro().salud)
+                return (200 if salud['ok'] else 503), {'estado': 'ok' if salud['ok'] else 'degradado',
+                                                       'peticiones': self.peticiones, **salud}
+
+            query = {clave: valores[0] for clave, valores in parse_qs(url.query).items()}
+            for patron, funcion in RUTAS:
+                coincidencia = patron.match(url.path)
+                if coincidencia:
+                    argumentos = [unquote(grupo) for grupo in coincidencia.groups()]
+                    loop = asyncio.get_running_loop()
+                    return 200, await loop.run_in_executor(self.executor, funcion, *argumentos, query)
+
+            raise ErrorHTTP(404, "Ruta no encontrada")
+        except ErrorHTTP as e:
+            return e.estado, {'error': e.mensaje}
+        except Exception:
+            logger.exception("Error al atender %s %s", metodo, objetivo)
+            return 500, {'error': "Error interno del servidor"}
+
+    def respuesta(self, estado, cuerpo, mantener):
+        """Serializa una respuesta HTTP con cuerpo JSON"""
+        datos = json.dumps(cuerpo, ensure_ascii=False, default=str).encode('utf-8')
+        encabezado = (f"HTTP/1.1 {estado} {ESTADOS_HTTP[estado]}\r\n"
+                      f"Content-Type: application/json; charset=utf-8\r\n"
+                      f"Content-Length: {len(datos)}\r\n"
+                      f"Connection: {'keep-alive' if mantener else 'close'}\r\n\r\n")
+        return encabezado.encode('latin-1') + datos
+
+    def cerrar(self):
+        self.executor.shutdown(wait=True)
+
+
+def es_local(host):
+    """Indica si `host` es una dirección de la interfaz local (loopback)"""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+async def servir(host, port, workers, token=None):
+    """Inicia el servidor y atiende peticiones hasta que se interrumpa"""
+    api = GradesAPI(workers=workers, token=token)
+    registro().calentar()
+    servidor = await asyncio.start_server(api.manejar_conexion, host, port, limit=MAX_LINEA)
+    direcciones = ", ".join(str(sock.getsockname()) for sock in servidor.sockets)
+    print(f"API de calificaciones escuchando en {direcciones}", flush=True)
+    try:
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        api.cerrar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP de solo lectura del Sistema de Calificaciones")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--workers', type=int, default=8, help="Hilos (y conexiones) para las consultas")
+    args = parser.parse_args()
+
+    token = os.environ.get('CALIFICACIONES_API_TOKEN')
+    # La API entrega nombres y calificaciones: fuera de la interfaz local exige token
+    if not token and not es_local(args.host):
+        parser.error(f"Para escuchar en {args.host} define CALIFICACIONES_API_TOKEN "
+                     f"(sin token solo se permite la interfaz local)")
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(servir(args.host, args.port, args.workers, token=token))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
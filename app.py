@@ -6,7 +6,7 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from utils.auth import check_authentication, logout_user, get_current_user
-from database.database import db
+from utils.recursos import registro
 from pages.login import show_login_page
 from pages.dashboard import show_dashboard
 from pages.calificaciones import show_calificaciones_page
@@ -66,19 +66,9 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def initialize_database():
-    """Inicializa la base de datos con datos de muestra si es necesario"""
-    if 'db_initialized' not in st.session_state:
-        with st.spinner("Inicializando base de datos..."):
-            try:
-                message = db.populate_sample_data()
-                st.session_state.db_initialized = True
-                if "exitosamente" in message:
-                    st.success("Base de datos inicializada correctamente")
-                else:
-                    st.info(message)
-            except Exception as e:
-                st.error(f"Error al inicializar la base de datos: {str(e)}")
+# Los recursos compartidos (base de datos, procesos trabajadores, cachés) se preparan una
+# vez por proceso del servidor; en las siguientes ejecuciones del script no hace nada
+registro().calentar()
 
 def show_sidebar():
     """Muestra la barra lateral con navegación"""
@@ -150,8 +140,8 @@ def show_sidebar():
 def main():
     """Función principal de la aplicación"""
     
-    # Inicializar la base de datos
-    initialize_database()
+    # El esquema se migra al importar database.database; los datos de muestra se
+    # cargan una sola vez con "python cli.py seed"
     
     # Inicializar el estado de la página si no existe
     if 'page' not in st.session_state:
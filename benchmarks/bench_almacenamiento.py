@@ -0,0 +1,121 @@
+"""
+Compara los perfiles de almacenamiento (PRAGMA) de la base de datos con una carga
+parecida a la de la aplicación: una carga masiva, capturas individuales (una
+transacción por calificación, como en la edición en pantalla) y consultas de
+estadísticas sobre toda la materia.
+
+Cada perfil usa una base de datos nueva en --directorio; para que la medición de
+escrituras refleje el costo de fsync, use un directorio en el mismo disco que
+database/ (no un tmpfs).
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_almacenamiento.py --estudiantes 20000 --capturas 500
+    python benchmarks/bench_almacenamiento.py --perfiles basico rendimiento --directorio /var/tmp
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.database import DatabaseManager
+from database.storage import PERFILES
+
+SEMESTRE = '2024-1'
+
+
+def preparar(db, estudiantes):
+    """Crea un profesor, una materia y `estudiantes` inscritos en ella"""
+    def insertar(conn):
+        profesor_id = conn.execute(
+            "INSERT INTO profesores (nombre, apellido_paterno, apellido_materno, clave, password) "
+            "VALUES ('Bench', 'Prueba', 'Prueba', 'BENCH', '')").lastrowid
+        materia_id = conn.execute("INSERT INTO materias (nombre, codigo) VALUES ('Benchmark', 'BENCH')").lastrowid
+        conn.execute("INSERT INTO profesor_materia (profesor_id, materia_id, semestre, grupo) VALUES (?, ?, ?, 'A')",
+                     (profesor_id, materia_id, SEMESTRE))
+        conn.executemany(
+            "INSERT INTO estudiantes (nombre, apellido_paterno, apellido_materno, clave) VALUES ('E', 'P', 'M', ?)",
+            [(f"B{i:07d}",) for i in range(estudiantes)])
+        ids = [row[0] for row in conn.execute("SELECT id FROM estudiantes WHERE clave LIKE 'B%'")]
+        conn.executemany(
+            "INSERT INTO inscripciones (estudiante_id, materia_id, profesor_id, semestre, grupo) VALUES (?, ?, ?, ?, 'A')",
+            [(estudiante_id, materia_id, profesor_id, SEMESTRE) for estudiante_id in ids])
+        return profesor_id, materia_id, ids
+
+    return db.writer.execute(insertar)
+
+
+def registro(rng, estudiante_id, materia_id, profesor_id):
+    calificacion = lambda: round(rng.uniform(4.0, 10.0), 1)
+    return {'estudiante_id': estudiante_id, 'materia_id': materia_id, 'profesor_id': profesor_id,
+            'parcial_1': calificacion(), 'parcial_2': calificacion(), 'parcial_3': calificacion(),
+            'ordinario': calificacion(), 'semestre': SEMESTRE}
+
+
+def medir(perfil, directorio, estudiantes, capturas, consultas, seed=42):
+    rng = random.Random(seed)
+    ruta = os.path.join(directorio, f"bench_{perfil}.db")
+    db = DatabaseManager(ruta, perfil=perfil)
+    # Las consultas se miden contra la base de datos principal
+    db.snapshot.max_staleness = 0
+    try:
+        profesor_id, materia_id, ids = preparar(db, estudiantes)
+
+        inicio = time.perf_counter()
+        db.save_calificaciones([registro(rng, i, materia_id, profesor_id) for i in ids], usuario='bench').result()
+        carga = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        for _ in range(capturas):
+            db.save_calificaciones([registro(rng, rng.choice(ids), materia_id, profesor_id)], usuario='bench').result()
+        captura = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        for _ in range(consultas):
+            db.get_resumen_calificaciones(profesor_id=profesor_id, materia_id=materia_id)
+        consulta = time.perf_counter() - inicio
+
+        # Con las estadísticas de ANALYZE el planificador puede elegir otros índices
+        mantenimiento = db.ejecutar_mantenimiento()
+        inicio = time.perf_counter()
+        for _ in range(consultas):
+            db.get_resumen_calificaciones(profesor_id=profesor_id, materia_id=materia_id)
+        consulta_analizada = time.perf_counter() - inicio
+
+        return {
+            'perfil': perfil,
+            'estudiantes': estudiantes,
+            'carga_masiva_s': round(carga, 3),
+            'capturas_por_segundo': round(capturas / captura, 1),
+            'resumen_ms': round(consulta / consultas * 1000, 2),
+            'resumen_tras_mantenimiento_ms': round(consulta_analizada / consultas * 1000, 2),
+            'mantenimiento_s': mantenimiento['segundos'],
+            'tamano_mb': round(os.path.getsize(ruta) / 1024 / 1024, 2)
+        }
+    finally:
+        db.writer.stop()
+        db.read_pool.cerrar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de los perfiles de almacenamiento")
+    parser.add_argument('--perfiles', nargs='+', choices=list(PERFILES), default=list(PERFILES))
+    parser.add_argument('--estudiantes', type=int, default=20000, help="Estudiantes inscritos en la materia")
+    parser.add_argument('--capturas', type=int, default=500, help="Calificaciones guardadas una por una")
+    parser.add_argument('--consultas', type=int, default=20, help="Consultas de resumen de la materia")
+    parser.add_argument('--directorio', default=os.path.dirname(os.path.abspath(__file__)),
+                        help="Directorio para las bases de datos temporales")
+    args = parser.parse_args()
+
+    for perfil in args.perfiles:
+        with tempfile.TemporaryDirectory(dir=args.directorio) as directorio:
+            print(json.dumps(medir(perfil, directorio, args.estudiantes, args.capturas, args.consultas)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Mide peticiones por segundo y latencia de la API de calificaciones con clientes concurrentes.
+
+Si no se indica --url, inicia la API en un subproceso con un puerto libre.
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_api.py --clientes 32 --segundos 10
+    python benchmarks/bench_api.py --url http://127.0.0.1:8600 --profesor PROF001
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlencode, urlsplit
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def puerto_libre():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def pedir(reader, writer, host, ruta):
+    """Envía un GET por una conexión persistente y devuelve (estado, cuerpo)"""
+    writer.write(f"GET {ruta} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+
+    estado = int((await reader.readline()).split()[1])
+    longitud = 0
+    while True:
+        linea = await reader.readline()
+        if linea in (b'\r\n', b''):
+            break
+        nombre, _, valor = linea.decode('latin-1').partition(':')
+        if nombre.lower() == 'content-length':
+            longitud = int(valor)
+    return estado, await reader.readexactly(longitud)
+
+
+async def cliente(host, port, rutas, fin, latencias, errores):
+    reader, writer = await asyncio.open_connection(host, port)
+    i = 0
+    try:
+        while time.perf_counter() < fin:
+            inicio = time.perf_counter()
+            estado, _ = await pedir(reader, writer, host, rutas[i % len(rutas)])
+            latencias.append(time.perf_counter() - inicio)
+            if estado != 200:
+                errores.append(estado)
+            i += 1
+    finally:
+        writer.close()
+
+
+async def esperar_api(host, port, timeout=30):
+    limite = time.perf_counter() + timeout
+    while time.perf_counter() < limite:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            await pedir(reader, writer, host, '/api/salud')
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("La API no respondió a tiempo")
+
+
+async def rutas_de_prueba(host, port, profesor):
+    """Arma las rutas a medir a partir de las materias del profesor"""
+    reader, writer = await asyncio.open_connection(host, port)
+    estado, cuerpo = await pedir(reader, writer, host, f"/api/profesores/{profesor}/materias")
+    writer.close()
+    if estado != 200:
+        raise RuntimeError(f"No se pudieron obtener las materias de {profesor}: {cuerpo.decode()}")
+
+    rutas = [f"/api/profesores/{profesor}/materias"]
+    for materia in json.loads(cuerpo)['materias']:
+        grupo = urlencode({'profesor': profesor, 'grupo': materia['grupo'], 'semestre': materia['semestre']})
+        rutas.append(f"/api/materias/{materia['codigo']}/estudiantes?{grupo}")
+        rutas.append(f"/api/materias/{materia['codigo']}/estadisticas?{grupo}")
+    return rutas
+
+
+async def medir(host, port, profesor, clientes, segundos):
+    await esperar_api(host, port)
+    rutas = await rutas_de_prueba(host, port, profesor)
+
+    latencias = []
+    errores = []
+    inicio = time.perf_counter()
+    fin = inicio + segundos
+    await asyncio.gather(*(cliente(host, port, rutas, fin, latencias, errores) for _ in range(clientes)))
+    duracion = time.perf_counter() - inicio
+
+    latencias.sort()
+    percentil = lambda p: latencias[min(len(latencias) - 1, int(p * len(latencias)))] * 1000
+    return {
+        'clientes': clientes,
+        'peticiones': len(latencias),
+        'errores': len(errores),
+        'peticiones_por_segundo': round(len(latencias) / duracion, 1),
+        'latencia_p50_ms': round(percentil(0.50), 2),
+        'latencia_p95_ms': round(percentil(0.95), 2),
+        'latencia_p99_ms': round(percentil(0.99), 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la API de calificaciones")
+    parser.add_argument('--url', help="API ya iniciada (por defecto se inicia una en un subproceso)")
+    parser.add_argument('--profesor', default='PROF001', help="Profesor cuyas materias se consultan")
+    parser.add_argument('--clientes', type=int, nargs='+', default=[1, 8, 32], help="Clientes concurrentes")
+    parser.add_argument('--segundos', type=float, default=5, help="Duración de cada medición")
+    parser.add_argument('--workers', type=int, default=8, help="Hilos de la API iniciada por el benchmark")
+    args = parser.parse_args()
+
+    proceso = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port
+    else:
+        host, port = '127.0.0.1', puerto_libre()
+        proceso = subprocess.Popen([sys.executable, os.path.join(RAIZ, 'api.py'), '--host', host, '--port', str(port),
+                                    '--workers', str(args.workers)], cwd=RAIZ,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    try:
+        for clientes in args.clientes:
+            print(json.dumps(asyncio.run(medir(host, port, args.profesor, clientes, args.segundos))))
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            proceso.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Compara la velocidad de escritura y lectura de plantillas de calificaciones
+en los formatos soportados (xlsx, csv y tsv).
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_formatos.py --filas 5000 --repeticiones 3
+"""
+
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.excel_handler import excel_handler, FORMATOS
+
+
+def crear_plantilla(filas, seed=42):
+    """Genera una plantilla sintética con el mismo formato que create_template"""
+    rng = random.Random(seed)
+
+    def calificacion():
+        return round(rng.uniform(5.0, 10.0), 1) if rng.random() > 0.1 else ''
+
+    return pd.DataFrame({
+        'clave_estudiante': [f"EST{i:06d}" for i in range(filas)],
+        'nombre_completo': [f"Apellido{i} Materno{i} Nombre{i}" for i in range(filas)],
+        'parcial_1': [calificacion() for _ in range(filas)],
+        'parcial_2': [calificacion() for _ in range(filas)],
+        'parcial_3': [calificacion() for _ in range(filas)],
+        'ordinario': [calificacion() for _ in range(filas)],
+        'version': [1] * filas
+    })
+
+
+def medir(funcion, repeticiones):
+    """Devuelve el mejor tiempo (en segundos) de varias ejecuciones"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de formatos de intercambio de calificaciones")
+    parser.add_argument('--filas', type=int, default=5000, help="Número de estudiantes en la plantilla")
+    parser.add_argument('--repeticiones', type=int, default=3, help="Ejecuciones por medición")
+    args = parser.parse_args()
+
+    df = crear_plantilla(args.filas)
+
+    print(f"Plantilla de {args.filas} filas, mejor de {args.repeticiones} ejecuciones\n")
+    print(f"{'formato':<8}{'tamaño (KB)':>12}{'escritura (s)':>15}{'lectura (s)':>13}{'validación (s)':>16}{'filas/s lectura':>17}")
+
+    for formato in FORMATOS:
+        contenido = excel_handler.to_bytes(df, formato)
+        tiempo_escritura = medir(lambda: excel_handler.to_bytes(df, formato), args.repeticiones)
+        tiempo_lectura = medir(lambda: excel_handler.read_file(io.BytesIO(contenido), formato), args.repeticiones)
+
+        leido = excel_handler.read_file(io.BytesIO(contenido), formato)
+        tiempo_validacion = medir(lambda: excel_handler.validate_excel_format(leido), args.repeticiones)
+
+        print(f"{formato:<8}{len(contenido) / 1024:>12.1f}{tiempo_escritura:>15.4f}{tiempo_lectura:>13.4f}"
+              f"{tiempo_validacion:>16.4f}{args.filas / tiempo_lectura:>17.0f}")
+
+
+if __name__ == "__main__":
+    main()
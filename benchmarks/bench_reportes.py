@@ -0,0 +1,82 @@
+"""
+Compara los dos motores de reportes PDF (platypus y canvas) con listas de
+distintos tamaños. Los reportes se construyen sin la caché de PDFGenerator.
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_reportes.py --estudiantes 30 200 2000 --repeticiones 3
+    python benchmarks/bench_reportes.py --tipo "Parcial 1" --logo logo.png
+"""
+
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.pdf_generator import PDFGenerator, MOTORES
+
+TIPOS_REPORTE = ["Parcial 1", "Parcial 2", "Parcial 3", "Ordinario", "Calificación Final"]
+
+PROFESOR = {'nombre': 'María', 'apellido_paterno': 'González', 'apellido_materno': 'López', 'clave': 'PROF001'}
+MATERIA = {'nombre': 'Cálculo Diferencial', 'codigo': 'MAT101'}
+
+
+def crear_estudiantes(cantidad, seed=42):
+    """Genera estudiantes sintéticos con el mismo formato que get_estudiantes_materia"""
+    rng = random.Random(seed)
+
+    def calificacion():
+        return round(rng.uniform(5.0, 10.0), 1) if rng.random() > 0.1 else None
+
+    estudiantes = []
+    for i in range(cantidad):
+        parciales = [calificacion() for _ in range(4)]
+        final = round(sum(parciales) / 4, 2) if None not in parciales else None
+        estudiantes.append({'clave': f"EST{i:06d}", 'nombre': f"Nombre{i}", 'apellido_paterno': f"Apellido{i}",
+                            'apellido_materno': f"Materno{i}", 'parcial_1': parciales[0], 'parcial_2': parciales[1],
+                            'parcial_3': parciales[2], 'ordinario': parciales[3], 'calificacion_final': final})
+    return estudiantes
+
+
+def medir(generador, estudiantes, tipo, motor, repeticiones):
+    """Devuelve el mejor tiempo (en segundos) y el tamaño del PDF"""
+    tiempos = []
+    for _ in range(repeticiones):
+        buffer = io.BytesIO()
+        inicio = time.perf_counter()
+        generador.build_report(PROFESOR, MATERIA, estudiantes, tipo, buffer, motor=motor)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), len(buffer.getvalue())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de los motores de reportes PDF")
+    parser.add_argument('--estudiantes', type=int, nargs='+', default=[30, 200, 2000],
+                        help="Tamaños de lista a medir")
+    parser.add_argument('--tipo', choices=TIPOS_REPORTE, default="Calificación Final")
+    parser.add_argument('--logo', default=None, help="Logo del encabezado (sin él, no se dibuja)")
+    parser.add_argument('--repeticiones', type=int, default=3, help="Ejecuciones por medición")
+    args = parser.parse_args()
+
+    generador = PDFGenerator(logo_path=args.logo)
+
+    print(f"Reporte {args.tipo}, mejor de {args.repeticiones} ejecuciones\n")
+    print(f"{'estudiantes':>12}" + "".join(f"{motor + ' (ms)':>16}{motor + ' (KB)':>16}" for motor in MOTORES)
+          + f"{'aceleración':>13}")
+
+    for cantidad in args.estudiantes:
+        estudiantes = crear_estudiantes(cantidad)
+        resultados = {motor: medir(generador, estudiantes, args.tipo, motor, args.repeticiones) for motor in MOTORES}
+        fila = f"{cantidad:>12}"
+        for motor in MOTORES:
+            tiempo, tamano = resultados[motor]
+            fila += f"{tiempo * 1000:>16.1f}{tamano / 1024:>16.1f}"
+        fila += f"{resultados['platypus'][0] / resultados['canvas'][0]:>12.1f}x"
+        print(fila)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""
+Línea de comandos del Sistema de Calificaciones.
+
+Permite ejecutar sin la interfaz de Streamlit (por ejemplo en tareas nocturnas)
+las cargas, exportaciones, plantillas, reportes PDF y estadísticas.
+
+Ejemplos (desde la raíz del proyecto):
+    python cli.py import plantillas/ --usuario COORD01 --jobs 4
+    python cli.py export calificaciones.xlsx --profesor PROF001
+    python cli.py template plantillas.zip --formato csv --jobs 4
+    python cli.py report reports/ --tipo "Calificación Final" --jobs 4
+    python cli.py --json stats --profesor PROF001
+    python cli.py seed
+    python cli.py coordinador PROF001
+    python cli.py mantenimiento --integridad completa
+
+Con --json cada comando imprime un único objeto JSON con su resultado y su duración.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# La base de datos, pandas y Streamlit se importan dentro de cada comando: los
+# procesos trabajadores vuelven a importar este módulo y no los necesitan.
+
+TIPOS_REPORTE = ["Parcial 1", "Parcial 2", "Parcial 3", "Ordinario", "Calificación Final"]
+MOTORES_REPORTE = ["platypus", "canvas"]
+EXTENSIONES = ('.xlsx', '.xls', '.csv', '.tsv')
+
+# Nombre que genera la plantilla masiva:
+# <semestre>/<profesor>/plantilla_calificaciones_<materia>_<grupo>.<formato>
+PATRON_PLANTILLA = re.compile(r'(?P<semestre>[^/\\]+)[/\\](?P<profesor>[^/\\]+)[/\\]'
+                              r'plantilla_calificaciones_(?P<materia>.+)_(?P<grupo>[^_]+)\.\w+$')
+
+
+class ErrorCLI(Exception):
+    """Error de uso que se reporta sin traza"""
+
+
+def buscar_profesor(clave):
+    from database.database import db
+    profesor = db.get_profesor(clave)
+    if profesor is None:
+        raise ErrorCLI(f"No existe el profesor {clave}")
+    return profesor
+
+
+def buscar_materia(codigo):
+    from database.database import db
+    materia = db.get_materia(codigo)
+    if materia is None:
+        raise ErrorCLI(f"No existe la materia {codigo}")
+    return materia
+
+
+def listar_archivos(rutas):
+    """Expande directorios a los archivos de calificaciones que contienen"""
+    archivos = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            for raiz, _, nombres in os.walk(ruta):
+                archivos.extend(os.path.join(raiz, nombre) for nombre in sorted(nombres)
+                                if nombre.lower().endswith(EXTENSIONES))
+        else:
+            archivos.append(ruta)
+    return archivos
+
+
+def cmd_import(args):
+    """Carga uno o varios archivos de calificaciones"""
+    from utils.excel_handler import excel_handler
+
+    archivos = listar_archivos(args.archivos)
+    if not archivos:
+        raise ErrorCLI("No se encontraron archivos para cargar")
+
+    # Profesor, materia, grupo y semestre: de los argumentos o de la ruta que da la plantilla masiva
+    tareas = []
+    for archivo in archivos:
+        coincidencia = PATRON_PLANTILLA.search(archivo)
+        clave_profesor = args.profesor or (coincidencia and coincidencia.group('profesor'))
+        codigo_materia = args.materia or (coincidencia and coincidencia.group('materia'))
+        grupo = args.grupo or (coincidencia.group('grupo') if coincidencia and not args.materia else None)
+        semestre = args.semestre or (coincidencia.group('semestre') if coincidencia and not args.materia else None)
+        if not clave_profesor or not codigo_materia:
+            raise ErrorCLI(f"Indica --profesor y --materia para {archivo}")
+        tareas.append((archivo, buscar_materia(codigo_materia)['id'], buscar_profesor(clave_profesor)['id'], grupo,
+                       semestre))
+
+    def cargar(tarea):
+        archivo, materia_id, profesor_id, grupo, semestre = tarea
+        inicio = time.perf_counter()
+        with open(archivo, 'rb') as f:
+            exito, mensaje = excel_handler.process_excel_upload(f, materia_id, profesor_id,
+                                                                usuario=args.usuario, formato=args.formato,
+                                                                grupo=grupo, semestre=semestre,
+                                                                estricto=True)
+        return {'archivo': archivo, 'exito': exito, 'mensaje': mensaje,
+                'segundos': round(time.perf_counter() - inicio, 4)}
+
+    # Los archivos se leen en paralelo; las escrituras las agrupa el hilo escritor
+    with ThreadPoolExecutor(max_workers=args.jobs or 1) as executor:
+        resultados = list(executor.map(cargar, tareas))
+
+    return {'archivos': resultados, 'errores': sum(1 for r in resultados if not r['exito'])}
+
+
+def cmd_export(args):
+    """Exporta calificaciones a un libro de Excel o a un archivo CSV/TSV"""
+    from utils.excel_handler import excel_handler
+
+    profesor = buscar_profesor(args.profesor) if args.profesor else None
+    formato = excel_handler.detect_format(args.salida)
+
+    if formato == 'xlsx' and not args.materia:
+        hojas = excel_handler.export_workbook(args.salida, profesor_id=profesor['id'] if profesor else None,
+                                               semestre=args.semestre)
+        return {'salida': args.salida, 'hojas': hojas}
+
+    if not (args.materia and profesor):
+        raise ErrorCLI("Para exportar una sola materia indica --materia y --profesor")
+    materia = buscar_materia(args.materia)
+    exportado = excel_handler.export_grades_to_excel(materia['id'], profesor['id'], materia['nombre'], formato,
+                                                     grupo=args.grupo, semestre=args.semestre)
+    if not exportado or exportado[0] is None:
+        raise ErrorCLI(f"No hay calificaciones que exportar de {args.materia} para {args.profesor}")
+    df, _ = exportado
+    with open(args.salida, 'wb') as f:
+        f.write(excel_handler.to_bytes(df, formato))
+    return {'salida': args.salida, 'filas': len(df)}
+
+
+def cmd_template(args):
+    """Genera el ZIP de plantillas de todos los grupos"""
+    from utils.excel_handler import excel_handler
+
+    profesor_id = buscar_profesor(args.profesor)['id'] if args.profesor else None
+    plantillas = excel_handler.create_bulk_templates(args.salida, profesor_id=profesor_id, semestre=args.semestre,
+                                                     formato=args.formato, jobs=args.jobs)
+    return {'salida': args.salida, 'plantillas': plantillas}
+
+
+def cmd_report(args):
+    """Genera reportes PDF de cada profesor, materia y grupo"""
+    from database.database import db
+    from utils.pdf_generator import generar_reporte
+
+    profesor_id = buscar_profesor(args.profesor)['id'] if args.profesor else None
+    materia_id = buscar_materia(args.materia)['id'] if args.materia else None
+    tipos = args.tipo or ["Calificación Final"]
+    os.makedirs(args.directorio, exist_ok=True)
+
+    tareas = []
+    # Un reporte por grupo: cada uno lee solo las inscripciones de su grupo
+    for asignacion in db.get_asignaciones(profesor_id=profesor_id, materia_id=materia_id, semestre=args.semestre):
+        profesor, materia = asignacion['profesor'], asignacion['materia']
+        estudiantes = db.get_estudiantes_materia(materia['id'], profesor['id'], grupo=materia['grupo'],
+                                                 semestre=materia['semestre'], analitica=True)
+        if not estudiantes:
+            continue
+        for tipo in tipos:
+            filename = (f"{tipo.replace(' ', '_').lower()}_{materia['codigo']}_{materia['grupo']}_"
+                        f"{materia['semestre']}_{profesor['clave']}.pdf")
+            tareas.append((args.logo, profesor, materia, estudiantes, tipo, os.path.join(args.directorio, filename),
+                           args.motor))
+
+    if args.jobs == 1 or len(tareas) <= 1:
+        rutas = [generar_reporte(tarea) for tarea in tareas]
+    else:
+        # spawn evita heredar por fork el estado del proceso principal (conexiones, hilos)
+        with ProcessPoolExecutor(max_workers=args.jobs, mp_context=multiprocessing.get_context('spawn')) as executor:
+            rutas = list(executor.map(generar_reporte, tareas))
+
+    return {'directorio': args.directorio, 'reportes': len(rutas)}
+
+
+def cmd_stats(args):
+    """Calcula la distribución de calificaciones y el resumen de riesgo"""
+    from database.database import db
+
+    profesor_id = buscar_profesor(args.profesor)['id'] if args.profesor else None
+    materia_id = buscar_materia(args.materia)['id'] if args.materia else None
+
+    return db.get_resumen_calificaciones(profesor_id=profesor_id, materia_id=materia_id, semestre=args.semestre,
+                                         grupo=args.grupo)
+
+
+def cmd_recalcular(args):
+    """Aplica las políticas de calificación vigentes a las calificaciones guardadas"""
+    from database.database import db
+
+    materia_id = buscar_materia(args.materia)['id'] if args.materia else None
+
+    def progreso(procesados, total):
+        if not args.json:
+            print(f"\r{procesados}/{total}", end='', file=sys.stderr, flush=True)
+
+    resumen = db.recalcular_calificaciones(materia_id=materia_id, semestre=args.semestre,
+                                           tamano_lote=args.lote, progreso=progreso, usuario=args.usuario)
+    if not args.json:
+        print(file=sys.stderr)
+    return {'actualizadas': resumen['actualizadas'], 'lotes': resumen['lotes']}
+
+
+def cmd_coordinador(args):
+    """Agrega o quita a un profesor de la coordinación (quien puede cambiar las políticas)"""
+    from database.database import db
+
+    profesor = buscar_profesor(args.profesor)
+    db.set_coordinador(profesor['id'], not args.quitar)
+    return {'profesor': profesor['clave'], 'coordinador': not args.quitar}
+
+
+def cmd_seed(args):
+    """Carga los datos de muestra si la base de datos no tiene profesores"""
+    from database.database import db
+
+    return {'mensaje': db.populate_sample_data()}
+
+
+def cmd_recursos(args):
+    """Prepara los recursos compartidos y reporta su estado y su memoria"""
+    from utils.recursos import registro
+    # Importar estos módulos registra sus recursos (generador de PDF, cachés) en el registro
+    import utils.excel_handler  # noqa: F401
+    import utils.pdf_generator  # noqa: F401
+    import utils.figure_cache  # noqa: F401
+
+    tiempos = registro().calentar()
+    salud = registro().salud()
+    memoria = registro().memoria()
+    resultado = {'calentamiento': tiempos, 'proceso_rss': memoria['proceso_rss'],
+                 'memoria': memoria['recursos'], 'limites_cache': memoria['limites_cache'],
+                 'salud': salud['recursos']}
+    if not salud['ok']:
+        resultado['errores'] = [nombre for nombre, estado in salud['recursos'].items() if not estado['ok']]
+    return resultado
+
+
+def cmd_mantenimiento(args):
+    """Ejecuta el mantenimiento de la base de datos una vez"""
+    from database.database import db
+
+    resultado = db.ejecutar_mantenimiento(integridad=None if args.integridad == 'ninguna' else args.integridad)
+    resultado.pop('segundos')
+    if resultado['integridad'] not in (None, 'ok'):
+        resultado['errores'] = resultado.pop('integridad')
+    return resultado
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(description="Sistema de Calificaciones - NovaUniversitas (línea de comandos)")
+    parser.add_argument('--json', action='store_true', help="Imprimir el resultado y la duración como JSON")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    p = subparsers.add_parser('import', help="Cargar archivos de calificaciones (xlsx, csv o tsv)")
+    p.add_argument('archivos', nargs='+', help="Archivos o directorios (p. ej. el ZIP de plantillas descomprimido)")
+    p.add_argument('--profesor', help="Clave del profesor (si no, se toma de la ruta de la plantilla)")
+    p.add_argument('--materia', help="Código de la materia (si no, se toma del nombre de la plantilla)")
+    p.add_argument('--formato', choices=['xlsx', 'csv', 'tsv'], help="Formato (por defecto, según la extensión)")
+    p.add_argument('--grupo', help="Grupo (si no, se toma del nombre de la plantilla)")
+    p.add_argument('--semestre', help="Semestre de las inscripciones (si no, se toma de la ruta de la plantilla)")
+    p.add_argument('--usuario', default='cli', help="Usuario que se registra en la bitácora de cambios")
+    p.add_argument('--jobs', type=int, default=1, help="Archivos que se leen en paralelo")
+    p.set_defaults(funcion=cmd_import)
+
+    p = subparsers.add_parser('export', help="Exportar calificaciones")
+    p.add_argument('salida', help="Archivo de salida; .xlsx sin --materia exporta todas las materias por hoja")
+    p.add_argument('--profesor', help="Clave del profesor (sin ella se exporta toda la facultad)")
+    p.add_argument('--materia', help="Código de la materia para exportar una sola")
+    p.add_argument('--grupo', help="Grupo de la materia (sin él, todos los grupos del profesor)")
+    p.add_argument('--semestre', help="Semestre de la materia")
+    p.set_defaults(funcion=cmd_export)
+
+    p = subparsers.add_parser('template', help="Generar el ZIP de plantillas de todos los grupos")
+    p.add_argument('salida', help="Archivo ZIP de salida")
+    p.add_argument('--profesor', help="Clave del profesor (sin ella, todos)")
+    p.add_argument('--semestre', help="Semestre (sin él, todos)")
+    p.add_argument('--formato', choices=['xlsx', 'csv', 'tsv'], default='xlsx')
+    p.add_argument('--jobs', type=int, default=None, help="Procesos trabajadores (por defecto, automático)")
+    p.set_defaults(funcion=cmd_template)
+
+    p = subparsers.add_parser('report', help="Generar reportes PDF")
+    p.add_argument('directorio', nargs='?', default='reports', help="Directorio de salida")
+    p.add_argument('--tipo', action='append', choices=TIPOS_REPORTE, help="Tipo de reporte (se puede repetir)")
+    p.add_argument('--profesor', help="Clave del profesor (sin ella, todos)")
+    p.add_argument('--materia', help="Código de la materia (sin él, todas)")
+    p.add_argument('--semestre', help="Semestre (sin él, todos)")
+    p.add_argument('--logo', default='logo.png', help="Logo del encabezado")
+    p.add_argument('--motor', choices=MOTORES_REPORTE, default='platypus',
+                   help="Cómo se dibujan los reportes (canvas es más rápido, mismo resultado)")
+    p.add_argument('--jobs', type=int, default=1, help="Procesos trabajadores")
+    p.set_defaults(funcion=cmd_report)
+
+    p = subparsers.add_parser('stats', help="Estadísticas de calificaciones")
+    p.add_argument('--profesor', help="Clave del profesor (sin ella, toda la facultad)")
+    p.add_argument('--materia', help="Código de la materia")
+    p.add_argument('--grupo', help="Grupo")
+    p.add_argument('--semestre', help="Semestre")
+    p.set_defaults(funcion=cmd_stats)
+
+    p = subparsers.add_parser('recalcular', help="Aplicar las políticas de calificación vigentes")
+    p.add_argument('--materia', help="Código de la materia (sin él, todas)")
+    p.add_argument('--semestre', help="Semestre (sin él, todos)")
+    p.add_argument('--lote', type=int, default=5000, help="Filas por transacción")
+    p.add_argument('--usuario', default='cli', help="Usuario que se registra en la bitácora de cambios")
+    p.set_defaults(funcion=cmd_recalcular)
+
+    p = subparsers.add_parser('coordinador', help="Dar o quitar a un profesor el rol de coordinación")
+    p.add_argument('profesor', help="Clave del profesor")
+    p.add_argument('--quitar', action='store_true', help="Quitar el rol en lugar de darlo")
+    p.set_defaults(funcion=cmd_coordinador)
+
+    p = subparsers.add_parser('seed', help="Cargar los datos de muestra (solo si la base de datos está vacía)")
+    p.set_defaults(funcion=cmd_seed)
+
+    p = subparsers.add_parser('recursos', help="Estado y memoria de los recursos compartidos")
+    p.set_defaults(funcion=cmd_recursos)
+
+    p = subparsers.add_parser('mantenimiento', help="Optimizar, compactar y verificar la base de datos")
+    p.add_argument('--integridad', choices=['rapida', 'completa', 'ninguna'], default='rapida',
+                   help="Verificación de integridad a realizar")
+    p.set_defaults(funcion=cmd_mantenimiento)
+
+    return parser
+
+
+def imprimir(resultado, como_json):
+    if como_json:
+        print(json.dumps(resultado, ensure_ascii=False, default=str))
+        return
+    for clave, valor in resultado.items():
+        if isinstance(valor, list):
+            print(f"{clave}:")
+            for elemento in valor:
+                print(f"  - {elemento}")
+        else:
+            print(f"{clave}: {valor}")
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+
+    inicio = time.perf_counter()
+    try:
+        resultado = args.funcion(args)
+        codigo = 1 if resultado.get('errores') else 0
+    except (ErrorCLI, ValueError, OSError) as e:
+        resultado = {'error': str(e)}
+        codigo = 2
+
+    imprimir({'comando': args.comando, **resultado, 'segundos': round(time.perf_counter() - inicio, 4)}, args.json)
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,209 @@
 import sqlite3
 import hashlib
+import os
+import json
 import pandas as pd
 from datetime import datetime
 import random
+import time
+from database.writer import create_writer
+from database.pool import ReadOnlyPool
+from database.snapshot import SnapshotManager
+from utils.recursos import registro
+from database.storage import (PERFILES, perfil_configurado, aplicar_perfil, habilitar_vacuum_incremental,
+                              ProgramadorMantenimiento)
+
+# Columnas de calificación que pueden consultarse de forma agregada
+COLUMNAS_CALIFICACION = ('parcial_1', 'parcial_2', 'parcial_3', 'ordinario', 'calificacion_final')
+
+# Criterios de aprobación y desempeño
+CALIFICACION_APROBATORIA = 6.0
+CALIFICACION_DESTACADA = 9.0
+# Peso de los parciales en la política general (el resto corresponde al ordinario)
+PESO_PARCIALES = 0.5
+
+def _redondear_un_decimal(valor):
+    """Expresión SQL que redondea `valor` a un decimal igual que round(valor, 1) de Python.
+    
+    ROUND de SQLite no da siempre el mismo resultado que Python (por ejemplo en empates
+    como 8.25, que Python deja en 8.2), y las calificaciones guardadas antes de la
+    columna generada se calcularon con round(). Python redondea el valor exacto de
+    valor * 10 al entero más cercano, con empates al par; aquí ese producto se obtiene
+    sin error como la suma de valor * 8 y valor * 2 (productos exactos) más el residuo
+    de esa suma, y con él se decide el redondeo. Supone valores no negativos, como las
+    calificaciones.
+    """
+    por_ocho = f"({valor} * 8.0)"
+    por_dos = f"({valor} * 2.0)"
+    suma = f"({por_ocho} + {por_dos})"
+    parte_dos = f"({suma} - {por_ocho})"
+    residuo = f"(({por_ocho} - ({suma} - {parte_dos})) + ({por_dos} - {parte_dos}))"
+    entero = f"CAST({suma} AS INTEGER)"
+    # Distancia exacta (con signo) entre valor * 10 y la mitad entre entero y entero + 1
+    exceso = f"((({suma} - {entero}) - 0.5) + {residuo})"
+    return f"(({entero} + ({exceso} > 0) + ({exceso} = 0) * ({entero} % 2)) / 10.0)"
+
+
+# Calificación final: promedio de parciales (opcionalmente sin el menor) y ordinario,
+# ponderados según la política guardada en cada fila. Es la única definición de la
+# regla: la usan la columna generada y la vista previa.
+FORMULA_CALIFICACION_FINAL = f"""CASE WHEN parcial_1 IS NOT NULL AND parcial_2 IS NOT NULL
+                      AND parcial_3 IS NOT NULL AND ordinario IS NOT NULL
+                 THEN {_redondear_un_decimal(
+                     "(CASE WHEN descartar_menor "
+                     "THEN (parcial_1 + parcial_2 + parcial_3 - MIN(parcial_1, parcial_2, parcial_3)) / 2.0 "
+                     "ELSE (parcial_1 + parcial_2 + parcial_3) / 3.0 "
+                     "END * peso_parciales + ordinario * (1 - peso_parciales))")}
+            END"""
+
+# Política aplicable a una materia: la propia o, si no tiene, la general (materia_id NULL)
+SQL_POLITICA_MATERIA = """SELECT {campo} FROM politicas_calificacion
+                   WHERE materia_id = :materia_id OR materia_id IS NULL
+                   ORDER BY materia_id IS NULL LIMIT 1"""
+
+# Columnas de calificaciones que se guardan (todas excepto las generadas)
+COLUMNAS_ALMACENADAS = ('id', 'estudiante_id', 'materia_id', 'profesor_id', 'parcial_1', 'parcial_2',
+                        'parcial_3', 'ordinario', 'semestre', 'fecha_actualizacion', 'version', 'modificado_por',
+                        'peso_parciales', 'descartar_menor')
+
+# Rangos de calificación para histogramas: (rango, límite inferior, descripción)
+RANGOS_CALIFICACION = [
+    ("10.0", 10.0, "Excelente"),
+    ("9.0-9.9", 9.0, "Muy Bien"),
+    ("8.0-8.9", 8.0, "Bien"),
+    ("7.0-7.9", 7.0, "Regular"),
+    ("6.0-6.9", 6.0, "Suficiente"),
+    ("< 6.0", None, "Reprobado")
+]
 
 class DatabaseManager:
-    def __init__(self, db_path="database/calificaciones.db"):
+    def __init__(self, db_path="database/calificaciones.db", perfil=None):
         self.db_path = db_path
+        # Perfil de almacenamiento (PRAGMA) que se aplica a todas las conexiones
+        self.perfil = perfil or perfil_configurado()
         self.init_database()
+        # Todas las escrituras de calificaciones pasan por un único hilo escritor
+        self.writer = create_writer(db_path, perfil=self.perfil)
+        # Las consultas reutilizan conexiones de solo lectura
+        self.read_pool = ReadOnlyPool(db_path, perfil=self.perfil)
+        # Las consultas analíticas leen de una copia con antigüedad máxima acotada (0 la desactiva)
+        self.snapshot = SnapshotManager(db_path, max_staleness=float(os.environ.get('CALIFICACIONES_SNAPSHOT_SEGUNDOS', 30)),
+                                        perfil=self.perfil)
+        # Mantenimiento periódico (ANALYZE, vacuum incremental, verificación de integridad)
+        self.mantenimiento = ProgramadorMantenimiento(self.ejecutar_mantenimiento)
         
     def get_connection(self):
-        return sqlite3.connect(self.db_path)
+        return aplicar_perfil(sqlite3.connect(self.db_path, timeout=30), self.perfil)
+    
+    def get_read_connection(self, analitica=False):
+        """Toma una conexión de solo lectura; al cerrarla vuelve a su pool.
+        
+        Con `analitica=True` (estadísticas, reportes y exportaciones) la conexión es a
+        la copia de solo lectura, que puede tener hasta snapshot.max_staleness segundos
+        de antigüedad; las lecturas transaccionales usan la base de datos principal.
+        """
+        if analitica and self.snapshot.max_staleness > 0:
+            return self.snapshot.obtener()
+        return self.read_pool.obtener()
+    
+    def calentar(self):
+        """Abre las conexiones e inicia los hilos de fondo antes de la primera petición"""
+        self.writer.start()
+        conn = self.get_read_connection()
+        conn.execute("SELECT 1").fetchone()
+        conn.close()
+        if self.snapshot.max_staleness > 0:
+            self.snapshot.refrescar()
+            self.snapshot.iniciar_refresco()
+        self.mantenimiento.iniciar()
+    
+    def cerrar(self):
+        """Detiene los hilos de fondo y cierra las conexiones"""
+        self.mantenimiento.detener()
+        self.snapshot.cerrar()
+        self.writer.stop(5)
+        self.read_pool.cerrar()
+    
+    def salud(self):
+        """Verifica que la base de datos responda y reporta el estado de sus pools e hilos"""
+        conn = self.get_read_connection()
+        # La versión real de la base de datos: si es menor que la esperada, una migración no se aplicó
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        conn.close()
+        return {
+            # Con el esquema atrasado el recurso se reporta con falla en el registro
+            'ok': version >= len(self._migraciones()),
+            'perfil': self.perfil,
+            'version_esquema': version,
+            'version_esquema_esperada': len(self._migraciones()),
+            'escritor_activo': self.writer.activo(),
+            'pool': self.read_pool.stats(),
+            'snapshot': self.snapshot.stats(),
+            'mantenimiento': self.mantenimiento.ultimo_resultado
+        }
+    
+    def limite_memoria_cache(self):
+        """Tope (no el uso real) de la caché de páginas de SQLite de las conexiones abiertas, en bytes"""
+        snapshot = self.snapshot.stats()['pool']
+        abiertas = self.read_pool.stats()['abiertas'] + (snapshot['abiertas'] if snapshot else 0) + self.writer.activo()
+        return abiertas * abs(PERFILES[self.perfil]['cache_size']) * 1024
     
     def init_database(self):
-        """Inicializa la base de datos con todas las tablas necesarias"""
+        """Aplica las migraciones pendientes del esquema.
+        
+        La versión del esquema se guarda en PRAGMA user_version; si ya es la vigente,
+        el arranque se reduce a leerla.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+        finally:
+            conn.close()
+        if version >= len(self._migraciones()):
+            return
+        
         conn = self.get_connection()
-        cursor = conn.cursor()
+        conn.isolation_level = None
+        try:
+            for numero, migracion in enumerate(self._migraciones(), start=1):
+                # Cada migración y su número de versión se guardan en la misma transacción;
+                # la versión se vuelve a leer con el bloqueo por si otro proceso ya la aplicó
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    if conn.execute("PRAGMA user_version").fetchone()[0] < numero:
+                        migracion(conn.cursor())
+                        conn.execute(f"PRAGMA user_version = {numero}")
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            
+            # El vacuum incremental se habilita una sola vez y no puede ir en una transacción
+            habilitar_vacuum_incremental(conn)
+        finally:
+            conn.close()
+    
+    def _migraciones(self):
+        """Migraciones del esquema en orden; la versión de cada una es su posición (desde 1).
         
+        Las migraciones no hacen commit y deben poder aplicarse sobre bases de datos
+        anteriores a PRAGMA user_version (versión 0), que ya tienen parte del esquema.
+        Solo se agregan migraciones al final: si cambia FORMULA_CALIFICACION_FINAL, se
+        agrega otra vez _migracion_calificacion_final.
+        """
+        return [
+            self._migracion_tablas,
+            self._migracion_calificacion_final,
+            self._migracion_indices,
+            self._migracion_bitacora,
+            self._migracion_indices_grupo,
+            # Redondeo de la calificación final igual al de round() de Python
+            self._migracion_calificacion_final,
+            self._migracion_coordinadores
+        ]
+    
+    def _migracion_tablas(self, cursor):
+        """Tablas del sistema y política de calificación general"""
         # Tabla de profesores
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS profesores (
@@ -83,9 +270,141 @@ class DatabaseManager:
             )
         ''')
         
+        # Políticas de ponderación por materia; la de materia_id NULL es la general
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS politicas_calificacion (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                materia_id INTEGER DEFAULT NULL,
+                peso_parciales REAL NOT NULL CHECK (peso_parciales BETWEEN 0 AND 1),
+                descartar_menor INTEGER NOT NULL DEFAULT 0,
+                fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (materia_id) REFERENCES materias (id)
+            )
+        ''')
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_politicas_materia
+            ON politicas_calificacion (IFNULL(materia_id, 0))
+        ''')
+        cursor.execute('''
+            INSERT OR IGNORE INTO politicas_calificacion (materia_id, peso_parciales, descartar_menor)
+            VALUES (NULL, ?, 0)
+        ''', (PESO_PARCIALES,))
+        
         # Tabla de calificaciones
+        self._crear_tabla_calificaciones(cursor)
+        
+        # Bases de datos anteriores: agregar la columna de versión para control optimista
+        cursor.execute("PRAGMA table_info(calificaciones)")
+        columnas = [row[1] for row in cursor.fetchall()]
+        if 'version' not in columnas:
+            cursor.execute("ALTER TABLE calificaciones ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        if 'modificado_por' not in columnas:
+            cursor.execute("ALTER TABLE calificaciones ADD COLUMN modificado_por TEXT DEFAULT NULL")
+    
+    def _migracion_indices(self, cursor):
+        """Índices para consultas agregadas por materia y por profesor"""
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_calificaciones_materia
+            ON calificaciones (materia_id, profesor_id, semestre)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_calificaciones_profesor
+            ON calificaciones (profesor_id, semestre)
+        ''')
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_inscripciones_profesor
+            ON inscripciones (profesor_id, materia_id, semestre)
+        ''')
+    
+    def _migracion_indices_grupo(self, cursor):
+        """Índice para leer solo las inscripciones de un grupo (incluye estudiante_id para no leer la tabla)"""
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_inscripciones_grupo
+            ON inscripciones (materia_id, profesor_id, grupo, semestre, estudiante_id)
+        ''')
+    
+    def _migracion_coordinadores(self, cursor):
+        """Marca de coordinación en profesores: solo la coordinación cambia las políticas de calificación"""
+        cursor.execute("PRAGMA table_info(profesores)")
+        if 'coordinador' not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute("ALTER TABLE profesores ADD COLUMN coordinador INTEGER NOT NULL DEFAULT 0")
+    
+    def _migracion_bitacora(self, cursor):
+        """Bitácora de cambios y los triggers que la alimentan"""
+        # Bitácora de cambios (solo se agregan registros); seq es monótona y nunca se reutiliza
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS calificaciones_cambios (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                calificacion_id INTEGER NOT NULL,
+                estudiante_id INTEGER,
+                materia_id INTEGER,
+                profesor_id INTEGER,
+                semestre TEXT,
+                operacion TEXT NOT NULL,
+                usuario TEXT,
+                valores_anteriores TEXT,
+                valores_nuevos TEXT,
+                fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Triggers que alimentan la bitácora desde cualquier escritura sobre calificaciones
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS calificaciones (
+            CREATE TRIGGER IF NOT EXISTS trg_calificaciones_insert
+            AFTER INSERT ON calificaciones
+            BEGIN
+                INSERT INTO calificaciones_cambios
+                (calificacion_id, estudiante_id, materia_id, profesor_id, semestre, operacion, usuario, valores_nuevos)
+                VALUES (NEW.id, NEW.estudiante_id, NEW.materia_id, NEW.profesor_id, NEW.semestre, 'INSERT',
+                        NEW.modificado_por,
+                        json_object('parcial_1', NEW.parcial_1, 'parcial_2', NEW.parcial_2,
+                                    'parcial_3', NEW.parcial_3, 'ordinario', NEW.ordinario,
+                                    'calificacion_final', NEW.calificacion_final, 'version', NEW.version));
+            END
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_calificaciones_update
+            AFTER UPDATE ON calificaciones
+            BEGIN
+                INSERT INTO calificaciones_cambios
+                (calificacion_id, estudiante_id, materia_id, profesor_id, semestre, operacion, usuario,
+                 valores_anteriores, valores_nuevos)
+                VALUES (NEW.id, NEW.estudiante_id, NEW.materia_id, NEW.profesor_id, NEW.semestre, 'UPDATE',
+                        NEW.modificado_por,
+                        json_object('parcial_1', OLD.parcial_1, 'parcial_2', OLD.parcial_2,
+                                    'parcial_3', OLD.parcial_3, 'ordinario', OLD.ordinario,
+                                    'calificacion_final', OLD.calificacion_final, 'version', OLD.version),
+                        json_object('parcial_1', NEW.parcial_1, 'parcial_2', NEW.parcial_2,
+                                    'parcial_3', NEW.parcial_3, 'ordinario', NEW.ordinario,
+                                    'calificacion_final', NEW.calificacion_final, 'version', NEW.version));
+            END
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_calificaciones_delete
+            AFTER DELETE ON calificaciones
+            BEGIN
+                INSERT INTO calificaciones_cambios
+                (calificacion_id, estudiante_id, materia_id, profesor_id, semestre, operacion, usuario,
+                 valores_anteriores)
+                VALUES (OLD.id, OLD.estudiante_id, OLD.materia_id, OLD.profesor_id, OLD.semestre, 'DELETE',
+                        OLD.modificado_por,
+                        json_object('parcial_1', OLD.parcial_1, 'parcial_2', OLD.parcial_2,
+                                    'parcial_3', OLD.parcial_3, 'ordinario', OLD.ordinario,
+                                    'calificacion_final', OLD.calificacion_final, 'version', OLD.version));
+            END
+        ''')
+    
+    def _crear_tabla_calificaciones(self, cursor, nombre='calificaciones'):
+        """Crea la tabla de calificaciones; la calificación final es una columna generada.
+        
+        peso_parciales y descartar_menor copian la política de la materia en cada fila,
+        porque una columna generada no puede consultar otras tablas.
+        """
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {nombre} (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 estudiante_id INTEGER,
                 materia_id INTEGER,
@@ -94,19 +413,68 @@ class DatabaseManager:
                 parcial_2 REAL DEFAULT NULL,
                 parcial_3 REAL DEFAULT NULL,
                 ordinario REAL DEFAULT NULL,
-                calificacion_final REAL DEFAULT NULL,
+                calificacion_final REAL GENERATED ALWAYS AS ({FORMULA_CALIFICACION_FINAL}) STORED,
                 semestre TEXT NOT NULL,
                 fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                version INTEGER NOT NULL DEFAULT 1,
+                modificado_por TEXT DEFAULT NULL,
+                peso_parciales REAL NOT NULL DEFAULT {PESO_PARCIALES} CHECK (peso_parciales BETWEEN 0 AND 1),
+                descartar_menor INTEGER NOT NULL DEFAULT 0,
                 FOREIGN KEY (estudiante_id) REFERENCES estudiantes (id),
                 FOREIGN KEY (materia_id) REFERENCES materias (id),
                 FOREIGN KEY (profesor_id) REFERENCES profesores (id),
                 UNIQUE(estudiante_id, materia_id, profesor_id, semestre)
             )
         ''')
+    
+    def _migracion_calificacion_final(self, cursor):
+        """Reconstruye la tabla de calificaciones si su calificación final no usa la fórmula vigente.
         
-        conn.commit()
-        conn.close()
+        SQLite no permite agregar ni cambiar una columna generada STORED con ALTER TABLE,
+        así que los datos se copian a una tabla nueva con el esquema actual. Los índices y
+        los triggers de la bitácora se eliminan con la tabla anterior y se vuelven a crear.
+        Si la bitácora existe, cada calificación final que cambia se registra en ella como
+        una actualización del usuario 'migracion'.
+        """
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'calificaciones'")
+        if FORMULA_CALIFICACION_FINAL in cursor.fetchone()[0]:
+            return
+        
+        # Las columnas que la tabla anterior no tenía toman su valor por defecto
+        cursor.execute("PRAGMA table_info(calificaciones)")
+        existentes = {row[1] for row in cursor.fetchall()}
+        columnas = ", ".join(col for col in COLUMNAS_ALMACENADAS if col in existentes)
+        self._crear_tabla_calificaciones(cursor, 'calificaciones_nueva')
+        cursor.execute(f"INSERT INTO calificaciones_nueva ({columnas}) SELECT {columnas} FROM calificaciones")
         
+        # En bases de datos nuevas la bitácora todavía no existe; su migración crea los triggers
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'calificaciones_cambios'")
+        con_bitacora = cursor.fetchone() is not None
+        if con_bitacora:
+            # Las calificaciones finales que cambian con la fórmula nueva quedan registradas
+            cursor.execute('''
+                INSERT INTO calificaciones_cambios
+                (calificacion_id, estudiante_id, materia_id, profesor_id, semestre, operacion, usuario,
+                 valores_anteriores, valores_nuevos)
+                SELECT n.id, n.estudiante_id, n.materia_id, n.profesor_id, n.semestre, 'UPDATE', 'migracion',
+                       json_object('parcial_1', n.parcial_1, 'parcial_2', n.parcial_2,
+                                   'parcial_3', n.parcial_3, 'ordinario', n.ordinario,
+                                   'calificacion_final', a.calificacion_final, 'version', n.version),
+                       json_object('parcial_1', n.parcial_1, 'parcial_2', n.parcial_2,
+                                   'parcial_3', n.parcial_3, 'ordinario', n.ordinario,
+                                   'calificacion_final', n.calificacion_final, 'version', n.version)
+                FROM calificaciones_nueva n
+                JOIN calificaciones a ON a.id = n.id
+                WHERE a.calificacion_final IS NOT n.calificacion_final
+                ORDER BY n.id
+            ''')
+        cursor.execute("DROP TABLE calificaciones")
+        cursor.execute("ALTER TABLE calificaciones_nueva RENAME TO calificaciones")
+        
+        if con_bitacora:
+            self._migracion_bitacora(cursor)
+        self._migracion_indices(cursor)
+    
     def hash_password(self, password):
         """Hashea la contraseña usando SHA-256"""
         return hashlib.sha256(password.encode()).hexdigest()
@@ -137,6 +505,9 @@ class DatabaseManager:
                 VALUES (?, ?, ?, ?, ?)
             ''', (*prof[:4], self.hash_password(prof[4])))
         
+        # La primera profesora coordina: puede cambiar las políticas de calificación
+        cursor.execute("UPDATE profesores SET coordinador = 1 WHERE clave = 'PROF001'")
+        
         # Datos de materias
         materias = [
             ("Matemáticas I", "MAT001"),
@@ -241,16 +612,13 @@ class DatabaseManager:
             p3 = round(random.uniform(6.0, 10.0), 1)
             ordinario = round(random.uniform(6.0, 10.0), 1)
             
-            # Calcular calificación final (50% parciales + 50% ordinario)
-            promedio_parciales = (p1 + p2 + p3) / 3
-            final = round((promedio_parciales * 0.5) + (ordinario * 0.5), 1)
-            
-            calificaciones.append((est_id, mat_id, prof_id, p1, p2, p3, ordinario, final, semestre))
+            # La calificación final la calcula la base de datos (columna generada)
+            calificaciones.append((est_id, mat_id, prof_id, p1, p2, p3, ordinario, semestre))
         
         cursor.executemany('''
             INSERT OR IGNORE INTO calificaciones 
-            (estudiante_id, materia_id, profesor_id, parcial_1, parcial_2, parcial_3, ordinario, calificacion_final, semestre)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            (estudiante_id, materia_id, profesor_id, parcial_1, parcial_2, parcial_3, ordinario, semestre)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         ''', calificaciones)
         
         conn.commit()
@@ -260,12 +628,12 @@ class DatabaseManager:
     
     def authenticate_user(self, clave, password):
         """Autentica un usuario (profesor)"""
-        conn = self.get_connection()
+        conn = self.get_read_connection()
         cursor = conn.cursor()
         
         hashed_password = self.hash_password(password)
         cursor.execute('''
-            SELECT id, nombre, apellido_paterno, apellido_materno, clave
+            SELECT id, nombre, apellido_paterno, apellido_materno, clave, coordinador
             FROM profesores 
             WHERE clave = ? AND password = ?
         ''', (clave, hashed_password))
@@ -279,13 +647,14 @@ class DatabaseManager:
                 'nombre': result[1],
                 'apellido_paterno': result[2],
                 'apellido_materno': result[3],
-                'clave': result[4]
+                'clave': result[4],
+                'coordinador': bool(result[5])
             }
         return None
     
     def get_profesor_materias(self, profesor_id):
         """Obtiene las materias asignadas a un profesor"""
-        conn = self.get_connection()
+        conn = self.get_read_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -301,20 +670,96 @@ class DatabaseManager:
         return [{'id': row[0], 'nombre': row[1], 'codigo': row[2], 'grupo': row[3], 'semestre': row[4]} 
                 for row in result]
     
-    def get_estudiantes_materia(self, materia_id, profesor_id):
-        """Obtiene los estudiantes inscritos en una materia específica"""
-        conn = self.get_connection()
+    def get_profesor(self, clave):
+        """Obtiene un profesor por su clave"""
+        conn = self.get_read_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
+            SELECT id, nombre, apellido_paterno, apellido_materno, clave, coordinador
+            FROM profesores WHERE clave = ?
+        ''', (clave,))
+        
+        result = cursor.fetchone()
+        conn.close()
+        
+        if result:
+            return {'id': result[0], 'nombre': result[1], 'apellido_paterno': result[2],
+                    'apellido_materno': result[3], 'clave': result[4], 'coordinador': bool(result[5])}
+        return None
+    
+    def get_materia(self, codigo):
+        """Obtiene una materia por su código"""
+        conn = self.get_read_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT id, nombre, codigo FROM materias WHERE codigo = ?", (codigo,))
+        
+        result = cursor.fetchone()
+        conn.close()
+        
+        if result:
+            return {'id': result[0], 'nombre': result[1], 'codigo': result[2]}
+        return None
+    
+    def get_asignaciones(self, profesor_id=None, materia_id=None, semestre=None):
+        """Obtiene las asignaciones profesor-materia-grupo con los datos del profesor y de la materia"""
+        conn = self.get_read_connection()
+        cursor = conn.cursor()
+        
+        query = '''
+            SELECT p.id, p.nombre, p.apellido_paterno, p.apellido_materno, p.clave,
+                   m.id, m.nombre, m.codigo, pm.grupo, pm.semestre
+            FROM profesor_materia pm
+            JOIN profesores p ON p.id = pm.profesor_id
+            JOIN materias m ON m.id = pm.materia_id
+        '''
+        condiciones = []
+        params = []
+        for campo, valor in (('pm.profesor_id', profesor_id), ('pm.materia_id', materia_id), ('pm.semestre', semestre)):
+            if valor is not None:
+                condiciones.append(f"{campo} = ?")
+                params.append(valor)
+        if condiciones:
+            query += " WHERE " + " AND ".join(condiciones)
+        query += " ORDER BY p.clave, m.codigo, pm.grupo"
+        
+        cursor.execute(query, params)
+        result = cursor.fetchall()
+        conn.close()
+        
+        return [{'profesor': {'id': row[0], 'nombre': row[1], 'apellido_paterno': row[2],
+                              'apellido_materno': row[3], 'clave': row[4]},
+                 'materia': {'id': row[5], 'nombre': row[6], 'codigo': row[7], 'grupo': row[8], 'semestre': row[9]}}
+                for row in result]
+    
+    def get_estudiantes_materia(self, materia_id, profesor_id, grupo=None, semestre=None, analitica=False):
+        """Obtiene los estudiantes inscritos en una materia específica.
+        
+        Con `grupo` y `semestre` la lista se limita a un grupo (lo que usan las páginas);
+        sin ellos incluye todos los grupos del profesor en la materia.
+        """
+        conn = self.get_read_connection(analitica)
+        cursor = conn.cursor()
+        
+        query = '''
             SELECT e.id, e.nombre, e.apellido_paterno, e.apellido_materno, e.clave,
-                   c.parcial_1, c.parcial_2, c.parcial_3, c.ordinario, c.calificacion_final
-            FROM estudiantes e
-            JOIN inscripciones i ON e.id = i.estudiante_id
-            LEFT JOIN calificaciones c ON e.id = c.estudiante_id AND c.materia_id = i.materia_id
+                   c.parcial_1, c.parcial_2, c.parcial_3, c.ordinario, c.calificacion_final,
+                   COALESCE(c.version, 0)
+            FROM inscripciones i
+            JOIN estudiantes e ON e.id = i.estudiante_id
+            LEFT JOIN calificaciones c ON c.estudiante_id = i.estudiante_id AND c.materia_id = i.materia_id
+                                      AND c.profesor_id = i.profesor_id AND c.semestre = i.semestre
             WHERE i.materia_id = ? AND i.profesor_id = ?
-            ORDER BY e.apellido_paterno, e.apellido_materno, e.nombre
-        ''', (materia_id, profesor_id))
+        '''
+        params = [materia_id, profesor_id]
+        for campo, valor in (('i.grupo', grupo), ('i.semestre', semestre)):
+            if valor is not None:
+                query += f" AND {campo} = ?"
+                params.append(valor)
+        query += " ORDER BY e.apellido_paterno, e.apellido_materno, e.nombre"
+        
+        cursor.execute(query, params)
         
         result = cursor.fetchall()
         conn.close()
@@ -322,7 +767,519 @@ class DatabaseManager:
         return [{'id': row[0], 'nombre': row[1], 'apellido_paterno': row[2], 
                 'apellido_materno': row[3], 'clave': row[4],
                 'parcial_1': row[5], 'parcial_2': row[6], 'parcial_3': row[7],
-                'ordinario': row[8], 'calificacion_final': row[9]} for row in result]
+                'ordinario': row[8], 'calificacion_final': row[9], 'version': row[10]} for row in result]
+    
+    def get_distribucion_calificaciones(self, columna='calificacion_final', materia_id=None,
+                                        profesor_id=None, semestre=None, grupo=None, analitica=True):
+        """Cuenta las calificaciones por rango con una sola consulta agrupada.
+        
+        El alcance se define con los filtros: grupo (materia_id, profesor_id, grupo y
+        semestre), materia, profesor, semestre o toda la institución (sin filtros). Devuelve un
+        diccionario ordenado según RANGOS_CALIFICACION con el conteo de cada rango.
+        Con `analitica=False` se lee la base de datos principal en lugar de la copia.
+        """
+        if columna not in COLUMNAS_CALIFICACION:
+            raise ValueError(f"Columna de calificación inválida: {columna}")
+        
+        condiciones = [f"c.{columna} >= ? THEN ?" for _, minimo, _ in RANGOS_CALIFICACION if minimo is not None]
+        case_sql = "CASE WHEN " + " WHEN ".join(condiciones) + " ELSE ? END"
+        params = []
+        for rango, minimo, _ in RANGOS_CALIFICACION:
+            if minimo is not None:
+                params.extend([minimo, rango])
+            else:
+                params.append(rango)
+        
+        query = f"SELECT {case_sql} AS rango, COUNT(*) FROM calificaciones c"
+        if grupo is not None:
+            # calificaciones no guarda el grupo: se toma de la inscripción
+            query += '''
+                JOIN inscripciones i ON i.estudiante_id = c.estudiante_id AND i.materia_id = c.materia_id
+                                    AND i.profesor_id = c.profesor_id AND i.semestre = c.semestre
+                                    AND i.grupo = ?'''
+            params.append(grupo)
+        query += f" WHERE c.{columna} IS NOT NULL"
+        if materia_id is not None:
+            query += " AND c.materia_id = ?"
+            params.append(materia_id)
+        if profesor_id is not None:
+            query += " AND c.profesor_id = ?"
+            params.append(profesor_id)
+        if semestre is not None:
+            query += " AND c.semestre = ?"
+            params.append(semestre)
+        query += " GROUP BY rango"
+        
+        conn = self.get_read_connection(analitica)
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        result = cursor.fetchall()
+        conn.close()
+        
+        rangos = {rango: 0 for rango, _, _ in RANGOS_CALIFICACION}
+        for rango, cantidad in result:
+            rangos[rango] = cantidad
+        return rangos
+    
+    def get_evaluacion_rendimiento(self, profesor_id=None, materia_id=None, semestre=None, grupo=None):
+        """Evalúa riesgo y desempeño de cada inscripción en una sola consulta.
+        
+        El alcance se define con los filtros (un grupo, una materia, todos los grupos de un
+        profesor o toda la facultad sin filtros). Para cada inscripción devuelve el
+        promedio de parciales, si está en riesgo y por qué, si es destacado y el
+        ordinario mínimo que necesita para aprobar mientras no lo haya presentado
+        (con la política de ponderación guardada en su calificación).
+        """
+        params = {
+            'profesor_id': profesor_id,
+            'materia_id': materia_id,
+            'semestre': semestre,
+            'grupo': grupo,
+            'aprobatoria': CALIFICACION_APROBATORIA,
+            'destacada': CALIFICACION_DESTACADA,
+            'peso_parciales': PESO_PARCIALES
+        }
+        condiciones = [f"i.{campo} = :{campo}" for campo in ('profesor_id', 'materia_id', 'grupo', 'semestre')
+                       if params[campo] is not None]
+        where_sql = ("WHERE " + " AND ".join(condiciones)) if condiciones else ""
+        
+        query = f'''
+            WITH base AS (
+                SELECT i.materia_id, m.nombre AS materia, m.codigo, i.grupo, i.semestre,
+                       e.id AS estudiante_id, e.clave, e.nombre, e.apellido_paterno, e.apellido_materno,
+                       c.parcial_1, c.parcial_2, c.parcial_3, c.ordinario, c.calificacion_final,
+                       COALESCE(c.peso_parciales, :peso_parciales) AS peso_parciales, c.descartar_menor,
+                       (COALESCE(c.parcial_1, 0) + COALESCE(c.parcial_2, 0) + COALESCE(c.parcial_3, 0)) AS suma_parciales,
+                       ((c.parcial_1 IS NOT NULL) + (c.parcial_2 IS NOT NULL) + (c.parcial_3 IS NOT NULL)) AS num_parciales
+                FROM inscripciones i
+                JOIN estudiantes e ON e.id = i.estudiante_id
+                JOIN materias m ON m.id = i.materia_id
+                LEFT JOIN calificaciones c ON c.estudiante_id = i.estudiante_id AND c.materia_id = i.materia_id
+                                          AND c.profesor_id = i.profesor_id AND c.semestre = i.semestre
+                {where_sql}
+            ),
+            promedios AS (
+                SELECT *,
+                       CASE WHEN num_parciales > 0 THEN suma_parciales * 1.0 / num_parciales END AS promedio_parciales,
+                       CASE WHEN descartar_menor AND num_parciales = 3
+                            THEN (suma_parciales - MIN(parcial_1, parcial_2, parcial_3)) / 2.0
+                            WHEN num_parciales > 0 THEN suma_parciales * 1.0 / num_parciales
+                       END AS promedio_ponderable
+                FROM base
+            ),
+            criterios AS (
+                SELECT *,
+                       COALESCE(promedio_parciales < :aprobatoria, 0) AS riesgo_parciales,
+                       COALESCE(promedio_parciales IS NOT NULL AND calificacion_final < :aprobatoria, 0) AS riesgo_final
+                FROM promedios
+            )
+            SELECT materia_id, materia, codigo, grupo, semestre, estudiante_id, clave, nombre,
+                   apellido_paterno, apellido_materno, parcial_1, parcial_2, parcial_3, ordinario,
+                   calificacion_final, promedio_parciales,
+                   (riesgo_parciales OR riesgo_final) AS en_riesgo,
+                   CASE WHEN riesgo_parciales THEN printf('Promedio parciales: %.1f', promedio_parciales) ELSE '' END ||
+                   CASE WHEN riesgo_parciales AND riesgo_final THEN '; ' ELSE '' END ||
+                   CASE WHEN riesgo_final THEN printf('Calificación final: %.1f', calificacion_final) ELSE '' END AS razon,
+                   COALESCE(calificacion_final >= :destacada, 0) AS destacado,
+                   CASE WHEN ordinario IS NULL AND promedio_parciales IS NOT NULL AND peso_parciales < 1
+                        THEN MAX(0.0, (:aprobatoria - promedio_ponderable * peso_parciales) / (1 - peso_parciales))
+                   END AS ordinario_minimo
+            FROM criterios
+            ORDER BY materia, grupo, apellido_paterno, apellido_materno, nombre
+        '''
+        
+        conn = self.get_read_connection(analitica=True)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        result = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        
+        return result
+    
+    def get_resumen_grupos(self, profesor_id):
+        """Inscritos, calificaciones finales, promedio y aprobados de cada grupo de un profesor.
+        
+        Una sola consulta agregada para todos los grupos; devuelve un diccionario con
+        llave (materia_id, grupo, semestre).
+        """
+        conn = self.get_read_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT i.materia_id, i.grupo, i.semestre, COUNT(*), COUNT(c.calificacion_final),
+                   AVG(c.calificacion_final), COALESCE(SUM(c.calificacion_final >= ?), 0)
+            FROM inscripciones i
+            LEFT JOIN calificaciones c ON c.estudiante_id = i.estudiante_id AND c.materia_id = i.materia_id
+                                      AND c.profesor_id = i.profesor_id AND c.semestre = i.semestre
+            WHERE i.profesor_id = ?
+            GROUP BY i.materia_id, i.grupo, i.semestre
+        ''', (CALIFICACION_APROBATORIA, profesor_id))
+        
+        result = cursor.fetchall()
+        conn.close()
+        
+        return {(row[0], row[1], row[2]): {'inscritos': row[3], 'con_calificacion_final': row[4],
+                                           'promedio': row[5], 'aprobados': row[6]}
+                for row in result}
+    
+    def get_resumen_calificaciones(self, profesor_id=None, materia_id=None, semestre=None, grupo=None):
+        """Resume inscritos, promedio, aprobados, riesgo y distribución de un alcance (grupo, materia, profesor o facultad)"""
+        evaluacion = self.get_evaluacion_rendimiento(profesor_id=profesor_id, materia_id=materia_id, semestre=semestre,
+                                                     grupo=grupo)
+        finales = [e['calificacion_final'] for e in evaluacion if e['calificacion_final'] is not None]
+        
+        return {
+            'inscritos': len(evaluacion),
+            'con_calificacion_final': len(finales),
+            'promedio': round(sum(finales) / len(finales), 2) if finales else None,
+            'aprobados': sum(1 for cal in finales if cal >= CALIFICACION_APROBATORIA),
+            'reprobados': sum(1 for cal in finales if cal < CALIFICACION_APROBATORIA),
+            'en_riesgo': sum(1 for e in evaluacion if e['en_riesgo']),
+            'destacados': sum(1 for e in evaluacion if e['destacado']),
+            'distribucion': self.get_distribucion_calificaciones(materia_id=materia_id, profesor_id=profesor_id,
+                                                                 semestre=semestre, grupo=grupo)
+        }
+    
+    def save_calificaciones(self, registros, usuario=None):
+        """Encola la escritura de calificaciones y devuelve un Future con el resumen de cambios.
+        
+        Cada registro es un diccionario con estudiante_id, materia_id, profesor_id,
+        parcial_1, parcial_2, parcial_3, ordinario y semestre; la calificación final
+        la calcula la base de datos.
+        Si el registro incluye 'version' (la versión leída por el usuario, 0 si la fila
+        aún no existía), la escritura solo se aplica cuando la fila sigue en esa versión;
+        si otra sesión la modificó antes, se reporta en 'conflictos' y no se toca (salvo
+        que ya tenga los valores enviados: entonces cuenta como sin cambios).
+        `usuario` (clave de quien captura) queda registrado en la bitácora de cambios.
+        El resultado indica cuántos registros cambiaron realmente, cuántos se omitieron
+        por no tener diferencias y los conflictos encontrados.
+        """
+        rows = [{'estudiante_id': r['estudiante_id'], 'materia_id': r['materia_id'],
+                 'profesor_id': r['profesor_id'], 'parcial_1': r['parcial_1'],
+                 'parcial_2': r['parcial_2'], 'parcial_3': r['parcial_3'],
+                 'ordinario': r['ordinario'],
+                 'semestre': r.get('semestre', "2025-2026A"), 'version': r.get('version'),
+                 'usuario': usuario, 'peso_defecto': PESO_PARCIALES}
+                for r in registros]
+        
+        # Las filas nuevas toman la política vigente de su materia
+        politica_peso = SQL_POLITICA_MATERIA.format(campo='peso_parciales')
+        politica_descartar = SQL_POLITICA_MATERIA.format(campo='descartar_menor')
+        
+        def escribir(conn):
+            cambiados = 0
+            sin_cambios = 0
+            conflictos = []
+            
+            for row in rows:
+                # UPSERT real: actualiza la fila existente en su lugar (mismo id, sin
+                # borrar ni reinsertar) y omite por completo las filas sin cambios
+                cursor = conn.execute(f'''
+                    INSERT INTO calificaciones 
+                    (estudiante_id, materia_id, profesor_id, parcial_1, parcial_2, parcial_3, 
+                     ordinario, semestre, fecha_actualizacion, modificado_por, peso_parciales, descartar_menor)
+                    VALUES (:estudiante_id, :materia_id, :profesor_id, :parcial_1, :parcial_2, :parcial_3,
+                            :ordinario, :semestre, CURRENT_TIMESTAMP, :usuario,
+                            COALESCE(({politica_peso}), :peso_defecto),
+                            COALESCE(({politica_descartar}), 0))
+                    ON CONFLICT (estudiante_id, materia_id, profesor_id, semestre) DO UPDATE SET
+                        parcial_1 = excluded.parcial_1,
+                        parcial_2 = excluded.parcial_2,
+                        parcial_3 = excluded.parcial_3,
+                        ordinario = excluded.ordinario,
+                        fecha_actualizacion = CURRENT_TIMESTAMP,
+                        modificado_por = excluded.modificado_por,
+                        version = calificaciones.version + 1
+                    WHERE (:version IS NULL OR calificaciones.version = :version)
+                      AND (calificaciones.parcial_1 IS NOT excluded.parcial_1
+                           OR calificaciones.parcial_2 IS NOT excluded.parcial_2
+                           OR calificaciones.parcial_3 IS NOT excluded.parcial_3
+                           OR calificaciones.ordinario IS NOT excluded.ordinario)
+                ''', row)
+                
+                if cursor.rowcount:
+                    cambiados += 1
+                    continue
+                
+                # No se escribió: distinguir entre "sin cambios" y "versión obsoleta"
+                if row['version'] is not None:
+                    actual = conn.execute('''
+                        SELECT version, parcial_1, parcial_2, parcial_3, ordinario, calificacion_final
+                        FROM calificaciones
+                        WHERE estudiante_id = ? AND materia_id = ? AND profesor_id = ? AND semestre = ?
+                    ''', (row['estudiante_id'], row['materia_id'], row['profesor_id'], row['semestre'])).fetchone()
+                    
+                    # Con los mismos valores (p. ej. una plantilla que ya se cargó) no hay conflicto
+                    enviados = (row['parcial_1'], row['parcial_2'], row['parcial_3'], row['ordinario'])
+                    if actual and actual[0] != row['version'] and tuple(actual[1:5]) != enviados:
+                        conflictos.append({
+                            'estudiante_id': row['estudiante_id'],
+                            'materia_id': row['materia_id'],
+                            'version_esperada': row['version'],
+                            'version_actual': actual[0],
+                            'parcial_1': actual[1],
+                            'parcial_2': actual[2],
+                            'parcial_3': actual[3],
+                            'ordinario': actual[4],
+                            'calificacion_final': actual[5]
+                        })
+                        continue
+                
+                sin_cambios += 1
+            
+            return {'cambiados': cambiados, 'sin_cambios': sin_cambios, 'conflictos': conflictos}
+        
+        return self.writer.submit(escribir)
+    
+    def calcular_calificacion_final(self, parcial_1, parcial_2, parcial_3, ordinario, materia_id=None):
+        """Evalúa la fórmula de la calificación final con la política de la materia, sin guardar nada"""
+        conn = self.get_read_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(f'''
+            SELECT {FORMULA_CALIFICACION_FINAL}
+            FROM (SELECT :parcial_1 AS parcial_1, :parcial_2 AS parcial_2, :parcial_3 AS parcial_3,
+                         :ordinario AS ordinario,
+                         COALESCE(({SQL_POLITICA_MATERIA.format(campo='peso_parciales')}), :peso_defecto) AS peso_parciales,
+                         COALESCE(({SQL_POLITICA_MATERIA.format(campo='descartar_menor')}), 0) AS descartar_menor)
+        ''', {'parcial_1': parcial_1, 'parcial_2': parcial_2, 'parcial_3': parcial_3, 'ordinario': ordinario,
+              'materia_id': materia_id, 'peso_defecto': PESO_PARCIALES})
+        result = cursor.fetchone()[0]
+        conn.close()
+        
+        return result
+    
+    def get_politica_calificacion(self, materia_id=None):
+        """Obtiene la política vigente de una materia (o la general si materia_id es None)"""
+        conn = self.get_read_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT peso_parciales, descartar_menor, materia_id IS NOT NULL FROM politicas_calificacion
+            WHERE materia_id = :materia_id OR materia_id IS NULL
+            ORDER BY materia_id IS NULL LIMIT 1
+        ''', {'materia_id': materia_id})
+        row = cursor.fetchone()
+        conn.close()
+        
+        if row is None:
+            return {'peso_parciales': PESO_PARCIALES, 'descartar_menor': False, 'propia': False}
+        return {'peso_parciales': row[0], 'descartar_menor': bool(row[1]), 'propia': bool(row[2])}
+    
+    def es_coordinador(self, profesor_id):
+        """Indica si el profesor pertenece a la coordinación (puede cambiar políticas de calificación)"""
+        conn = self.get_read_connection()
+        row = conn.execute("SELECT coordinador FROM profesores WHERE id = ?", (profesor_id,)).fetchone()
+        conn.close()
+        return bool(row and row[0])
+    
+    def set_coordinador(self, profesor_id, coordinador=True):
+        """Agrega o quita a un profesor de la coordinación"""
+        def escribir(conn):
+            conn.execute("UPDATE profesores SET coordinador = ? WHERE id = ?", (int(bool(coordinador)), profesor_id))
+        
+        self.writer.execute(escribir)
+    
+    def set_politica_calificacion(self, materia_id, peso_parciales, descartar_menor=False):
+        """Guarda la política de una materia (o la general con materia_id None).
+        
+        Solo cambia la política; las calificaciones existentes se actualizan con
+        recalcular_calificaciones. La política y el recálculo abarcan a todos los
+        profesores de la materia, así que en la interfaz solo la coordinación puede
+        cambiarla (es_coordinador).
+        """
+        if not 0 <= peso_parciales <= 1:
+            raise ValueError("El peso de los parciales debe estar entre 0 y 1")
+        
+        def escribir(conn):
+            conn.execute('''
+                INSERT INTO politicas_calificacion (materia_id, peso_parciales, descartar_menor)
+                VALUES (?, ?, ?)
+                ON CONFLICT (IFNULL(materia_id, 0)) DO UPDATE SET
+                    peso_parciales = excluded.peso_parciales,
+                    descartar_menor = excluded.descartar_menor,
+                    fecha_actualizacion = CURRENT_TIMESTAMP
+            ''', (materia_id, peso_parciales, int(bool(descartar_menor))))
+        
+        self.writer.execute(escribir)
+    
+    def eliminar_politica_calificacion(self, materia_id):
+        """Elimina la política propia de una materia para que use la general"""
+        def escribir(conn):
+            conn.execute("DELETE FROM politicas_calificacion WHERE materia_id = ?", (materia_id,))
+        
+        self.writer.execute(escribir)
+    
+    def recalcular_calificaciones(self, materia_id=None, semestre=None, tamano_lote=5000,
+                                  progreso=None, usuario=None):
+        """Aplica la política vigente a las calificaciones guardadas y recalcula su calificación final.
+        
+        Solo se tocan las filas cuya política guardada difiere de la vigente. Cada lote
+        es un UPDATE de hasta `tamano_lote` filas en su propia transacción del hilo
+        escritor, así que las capturas de otros usuarios pueden intercalarse entre lotes.
+        `progreso(procesados, total)` se llama después de cada lote. Devuelve un
+        resumen con las filas actualizadas, los lotes y la duración.
+        """
+        inicio = time.perf_counter()
+        conn = self.get_read_connection()
+        cursor = conn.cursor()
+        
+        # Política vigente de cada materia y filas que no la tienen aplicada
+        filtro_materia = "WHERE m.id = :materia_id" if materia_id is not None else ""
+        filtro_semestre = "AND c.semestre = :semestre" if semestre is not None else ""
+        cursor.execute(f'''
+            WITH vigentes AS (
+                SELECT m.id AS materia_id,
+                       COALESCE(pm.peso_parciales, pg.peso_parciales, :peso_defecto) AS peso_parciales,
+                       COALESCE(pm.descartar_menor, pg.descartar_menor, 0) AS descartar_menor
+                FROM materias m
+                LEFT JOIN politicas_calificacion pm ON pm.materia_id = m.id
+                LEFT JOIN politicas_calificacion pg ON pg.materia_id IS NULL
+                {filtro_materia}
+            )
+            SELECT v.materia_id, v.peso_parciales, v.descartar_menor, COUNT(c.id)
+            FROM vigentes v
+            JOIN calificaciones c ON c.materia_id = v.materia_id {filtro_semestre}
+                                 AND (c.peso_parciales IS NOT v.peso_parciales
+                                      OR c.descartar_menor IS NOT v.descartar_menor)
+            GROUP BY v.materia_id
+        ''', {'materia_id': materia_id, 'semestre': semestre, 'peso_defecto': PESO_PARCIALES})
+        pendientes = cursor.fetchall()
+        conn.close()
+        
+        total = sum(row[3] for row in pendientes)
+        procesados = 0
+        lotes = 0
+        if progreso:
+            progreso(procesados, total)
+        
+        for mat_id, peso, descartar, _ in pendientes:
+            params = {'materia_id': mat_id, 'semestre': semestre, 'peso': peso,
+                      'descartar': descartar, 'lote': tamano_lote, 'usuario': usuario}
+            
+            def actualizar_lote(conn):
+                cursor = conn.execute(f'''
+                    UPDATE calificaciones
+                    SET peso_parciales = :peso, descartar_menor = :descartar,
+                        fecha_actualizacion = CURRENT_TIMESTAMP, modificado_por = :usuario
+                    WHERE id IN (
+                        SELECT id FROM calificaciones c
+                        WHERE c.materia_id = :materia_id {filtro_semestre}
+                          AND (c.peso_parciales IS NOT :peso OR c.descartar_menor IS NOT :descartar)
+                        LIMIT :lote
+                    )
+                ''', params)
+                return cursor.rowcount
+            
+            while True:
+                actualizadas = self.writer.execute(actualizar_lote)
+                if not actualizadas:
+                    break
+                procesados += actualizadas
+                lotes += 1
+                if progreso:
+                    progreso(min(procesados, total), total)
+        
+        return {'actualizadas': procesados, 'lotes': lotes, 'segundos': time.perf_counter() - inicio}
+    
+    def get_ultima_secuencia(self):
+        """Obtiene la secuencia del cambio más reciente registrado en la bitácora"""
+        conn = self.get_read_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM calificaciones_cambios")
+        result = cursor.fetchone()[0]
+        conn.close()
+        
+        return result
+    
+    def get_cambios_desde(self, seq, materia_id=None, profesor_id=None, limite=1000):
+        """Obtiene los cambios de calificaciones posteriores a la secuencia indicada, en orden.
+        
+        Permite que cachés, estadísticas y exportaciones se actualicen de forma
+        incremental: se guarda la última secuencia procesada y se piden solo los
+        cambios siguientes. Si se devuelven `limite` cambios puede haber más.
+        """
+        conn = self.get_read_connection()
+        cursor = conn.cursor()
+        
+        query = '''
+            SELECT seq, calificacion_id, estudiante_id, materia_id, profesor_id, semestre,
+                   operacion, usuario, valores_anteriores, valores_nuevos, fecha
+            FROM calificaciones_cambios
+            WHERE seq > ?
+        '''
+        params = [seq]
+        if materia_id is not None:
+            query += " AND materia_id = ?"
+            params.append(materia_id)
+        if profesor_id is not None:
+            query += " AND profesor_id = ?"
+            params.append(profesor_id)
+        query += " ORDER BY seq LIMIT ?"
+        params.append(limite)
+        
+        cursor.execute(query, params)
+        result = cursor.fetchall()
+        conn.close()
+        
+        return [{'seq': row[0], 'calificacion_id': row[1], 'estudiante_id': row[2],
+                 'materia_id': row[3], 'profesor_id': row[4], 'semestre': row[5],
+                 'operacion': row[6], 'usuario': row[7],
+                 'valores_anteriores': json.loads(row[8]) if row[8] else None,
+                 'valores_nuevos': json.loads(row[9]) if row[9] else None,
+                 'fecha': row[10]} for row in result]
+    
+    def ejecutar_mantenimiento(self, integridad='rapida'):
+        """Actualiza las estadísticas del planificador, libera páginas vacías y verifica la integridad.
+        
+        `integridad` puede ser 'rapida' (quick_check), 'completa' (integrity_check) o None.
+        Devuelve un resumen con lo que se hizo y el tiempo que tomó.
+        """
+        inicio = time.perf_counter()
+        
+        def optimizar(conn):
+            # La primera vez se analiza todo; después optimize solo reanaliza las tablas que cambiaron
+            analizada = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+            conn.execute("PRAGMA optimize" if analizada else "ANALYZE")
+            libres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            # incremental_vacuum libera una página por paso y sqlite3 da un solo paso a los
+            # PRAGMA que no devuelven columnas, así que se ejecuta una vez por página libre
+            for _ in range(libres):
+                conn.execute("PRAGMA incremental_vacuum(1)")
+            return ('optimize' if analizada else 'ANALYZE',
+                    libres - conn.execute("PRAGMA freelist_count").fetchone()[0])
+        
+        analisis, paginas_liberadas = self.writer.execute(optimizar)
+        
+        # El checkpoint no puede ir dentro de una transacción; si hay lectores activos se completa después
+        conn = self.get_connection()
+        try:
+            ocupado, paginas_wal, _ = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        finally:
+            conn.close()
+        
+        resultado = {
+            'perfil': self.perfil,
+            'analisis': analisis,
+            'paginas_liberadas': paginas_liberadas,
+            'checkpoint_completo': not ocupado,
+            'paginas_wal': paginas_wal,
+            'integridad': None
+        }
+        
+        if integridad:
+            conn = self.get_read_connection()
+            try:
+                pragma = "integrity_check" if integridad == 'completa' else "quick_check"
+                filas = [row[0] for row in conn.execute(f"PRAGMA {pragma}").fetchall()]
+            finally:
+                conn.close()
+            resultado['integridad'] = 'ok' if filas == ['ok'] else filas
+        
+        resultado['segundos'] = round(time.perf_counter() - inicio, 3)
+        return resultado
 
-# Crear instancia de la base de datos
-db = DatabaseManager()
\ No newline at end of file
+# Instancia de la base de datos (una por proceso, compartida por todas las sesiones)
+db = registro().registrar('db', DatabaseManager)
\ No newline at end of file
@@ -0,0 +1,119 @@
+import queue
+import sqlite3
+import threading
+
+from database.storage import aplicar_perfil
+
+
+class ConexionPrestada:
+    """Conexión tomada del pool; close() la devuelve al pool en lugar de cerrarla"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, nombre):
+        return getattr(self._conn, nombre)
+
+    def __setattr__(self, nombre, valor):
+        # row_factory y demás atributos se asignan a la conexión real
+        if nombre.startswith('_'):
+            object.__setattr__(self, nombre, valor)
+        else:
+            setattr(self._conn, nombre, valor)
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.devolver(conn)
+
+    def __del__(self):
+        # Si la consulta falló antes de close(), la conexión no se pierde para el pool
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReadOnlyPool:
+    """Pool de conexiones de solo lectura a una base de datos SQLite.
+
+    Abrir una conexión por consulta cuesta más que muchas de las consultas de la
+    aplicación; las conexiones del pool se reutilizan entre hilos (una a la vez) y
+    se abren con mode=ro y query_only, así que nunca compiten con el escritor.
+    Si todas están ocupadas se espera hasta `timeout` segundos.
+    """
+
+    def __init__(self, db_path, size=4, timeout=30, perfil=None):
+        self.db_path = db_path
+        self.perfil = perfil
+        self.size = size
+        self.timeout = timeout
+        self._libres = queue.LifoQueue()
+        self._abiertas = 0
+        self._cerrado = False
+        self._lock = threading.Lock()
+
+    def _abrir(self):
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, timeout=self.timeout,
+                               check_same_thread=False)
+        conn.execute("PRAGMA query_only=1")
+        if self.perfil:
+            aplicar_perfil(conn, self.perfil, solo_lectura=True)
+        return conn
+
+    def obtener(self):
+        """Toma una conexión libre (o abre una nueva si aún no se llega al tamaño del pool)"""
+        try:
+            conn = self._libres.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._cerrado:
+                    raise sqlite3.ProgrammingError("El pool de conexiones está cerrado")
+                abrir = self._abiertas < self.size
+                if abrir:
+                    self._abiertas += 1
+            if abrir:
+                try:
+                    conn = self._abrir()
+                except Exception:
+                    with self._lock:
+                        self._abiertas -= 1
+                    raise
+            else:
+                conn = self._libres.get(timeout=self.timeout)
+        return ConexionPrestada(self, conn)
+
+    def devolver(self, conn):
+        """Regresa una conexión al pool dejando su estado como al abrirla"""
+        if self._cerrado:
+            conn.close()
+            with self._lock:
+                self._abiertas -= 1
+            return
+        conn.row_factory = None
+        if conn.in_transaction:
+            conn.rollback()
+        self._libres.put(conn)
+
+    def cerrar(self):
+        """Cierra las conexiones libres; las prestadas se cierran al devolverse y ya no se prestan más"""
+        self._cerrado = True
+        while True:
+            try:
+                conn = self._libres.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._abiertas -= 1
+
+    def stats(self):
+        """Devuelve cuántas conexiones hay abiertas y cuántas están libres"""
+        return {'tamano': self.size, 'abiertas': self._abiertas, 'libres': self._libres.qsize()}
@@ -0,0 +1,164 @@
+import os
+import sqlite3
+import threading
+import time
+
+from database.pool import ReadOnlyPool
+
+
+class SnapshotManager:
+    """Copia de solo lectura de la base de datos para estadísticas, reportes y exportaciones.
+
+    La copia se hace con la API de respaldo en línea de SQLite, así que las consultas
+    largas nunca retienen la base de datos principal (ni retrasan sus checkpoints)
+    mientras los profesores capturan. Los datos servidos tienen como máximo
+    `max_staleness` segundos de antigüedad: pasado ese tiempo se consulta PRAGMA
+    data_version en una conexión que permanece abierta, que cambia con cualquier
+    escritura confirmada en cualquier tabla (calificaciones, inscripciones, catálogos,
+    políticas), y solo se vuelve a copiar si la base de datos principal cambió.
+
+    Cada copia se escribe en su propio archivo (con el PID y un número de versión) y se
+    publica con un pool nuevo; nunca se reemplaza un archivo que otras conexiones tienen
+    abierto, lo que en Windows no está permitido. El archivo de una copia anterior se
+    borra cuando su pool ya no tiene conexiones prestadas.
+    """
+
+    def __init__(self, db_path, snapshot_path=None, max_staleness=30, pool_size=4, perfil=None):
+        self.db_path = db_path
+        # Base de los nombres de las copias: <base>.<pid>.<versión>.db
+        self.snapshot_path = snapshot_path or os.path.splitext(db_path)[0] + "_snapshot.db"
+        self.max_staleness = max_staleness
+        self.pool_size = pool_size
+        self.perfil = perfil
+        self.refrescos = 0
+        self._pool = None
+        self._retirados = []
+        self._vigilante = None
+        self._version = None
+        self._verificado = 0.0
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def _version_primaria(self):
+        """PRAGMA data_version de la base principal (cambia con cada escritura de otra conexión)"""
+        # El valor solo es comparable dentro de una misma conexión, así que esta no se cierra
+        if self._vigilante is None:
+            self._vigilante = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        return self._vigilante.execute("PRAGMA data_version").fetchone()[0]
+
+    def refrescar(self, forzar=False):
+        """Vuelve a copiar la base de datos si cambió desde la última copia (o siempre con `forzar`).
+
+        Devuelve True si se creó una copia nueva.
+        """
+        with self._lock:
+            version = self._version_primaria()
+            if not forzar and self._pool is not None and version == self._version:
+                self._verificado = time.monotonic()
+                self._borrar_retirados()
+                return False
+
+            base, extension = os.path.splitext(self.snapshot_path)
+            archivo = f"{base}.{os.getpid()}.{self.refrescos + 1}{extension}"
+            destino = sqlite3.connect(archivo)
+            try:
+                # Un solo paso: la copia corresponde a una misma transacción de lectura. La
+                # versión se leyó antes, así que una escritura durante la copia provoca
+                # otra copia en la siguiente verificación y nunca se pierde
+                self._vigilante.backup(destino)
+                destino.execute("PRAGMA journal_mode=DELETE")
+            except Exception:
+                destino.close()
+                self._borrar(archivo)
+                raise
+            finally:
+                destino.close()
+
+            # Las conexiones prestadas siguen leyendo la copia anterior hasta devolverse
+            anterior, self._pool = self._pool, ReadOnlyPool(archivo, size=self.pool_size, perfil=self.perfil)
+            if anterior is not None:
+                anterior.cerrar()
+                self._retirados.append(anterior)
+            self._borrar_retirados()
+            self._version = version
+            self._verificado = time.monotonic()
+            self.refrescos += 1
+            return True
+
+    def _borrar(self, archivo):
+        """Borra un archivo de copia; devuelve False si sigue en uso y no se pudo borrar"""
+        try:
+            os.remove(archivo)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            return False
+        return True
+
+    def _borrar_retirados(self):
+        """Borra los archivos de las copias anteriores cuyos pools ya no tienen conexiones abiertas"""
+        self._retirados = [pool for pool in self._retirados
+                           if pool.stats()['abiertas'] > 0 or not self._borrar(pool.db_path)]
+
+    def obtener(self):
+        """Toma una conexión a la copia, refrescándola antes si superó el límite de antigüedad"""
+        if self._pool is None or time.monotonic() - self._verificado > self.max_staleness:
+            self.refrescar()
+        while True:
+            pool = self._pool
+            try:
+                return pool.obtener()
+            except sqlite3.ProgrammingError:
+                # Se publicó otra copia y este pool ya se cerró; se toma del pool vigente
+                if pool is self._pool:
+                    raise
+
+    def iniciar_refresco(self, intervalo=None):
+        """Refresca la copia en segundo plano para que las consultas no esperen la copia"""
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        intervalo = intervalo or max(self.max_staleness / 2, 1)
+        self._detener.clear()
+
+        def refrescar_periodicamente():
+            while not self._detener.wait(intervalo):
+                try:
+                    self.refrescar()
+                except (sqlite3.Error, OSError):
+                    # Un fallo (base bloqueada, disco lleno...) no detiene el refresco
+                    pass
+
+        self._hilo = threading.Thread(target=refrescar_periodicamente, name="snapshot-refresh", daemon=True)
+        self._hilo.start()
+
+    def detener_refresco(self):
+        """Detiene el refresco en segundo plano"""
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+
+    def cerrar(self):
+        """Detiene el refresco, cierra las conexiones a la copia y borra los archivos que ya no se usan"""
+        self.detener_refresco()
+        with self._lock:
+            if self._pool is not None:
+                self._pool.cerrar()
+                self._retirados.append(self._pool)
+                self._pool = None
+            self._borrar_retirados()
+            if self._vigilante is not None:
+                self._vigilante.close()
+                self._vigilante = None
+            self._version = None
+
+    def stats(self):
+        """Devuelve la versión copiada, la antigüedad de la verificación y los refrescos realizados"""
+        return {
+            'version_datos': self._version,
+            'antiguedad': time.monotonic() - self._verificado if self._pool is not None else None,
+            'max_staleness': self.max_staleness,
+            'refrescos': self.refrescos,
+            'pool': self._pool.stats() if self._pool is not None else None
+        }
@@ -0,0 +1,117 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Perfiles de almacenamiento: PRAGMA que se aplican a cada conexión.
+# cache_size negativo está en KiB (por conexión); mmap_size en bytes.
+PERFILES = {
+    # Valores por defecto de SQLite salvo WAL, que la aplicación necesita para leer mientras se escribe
+    'basico': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -2000,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT'
+    },
+    # En WAL, synchronous=NORMAL no puede corromper la base de datos: ante un corte de
+    # energía solo se pierden las últimas transacciones sin checkpoint
+    'rendimiento': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY'
+    },
+    # Para equipos donde perder la última transacción tras un corte no es aceptable
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -16000,
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY'
+    }
+}
+
+PERFIL_DEFECTO = 'rendimiento'
+
+# Cada cuánto corre el mantenimiento programado (segundos)
+INTERVALO_MANTENIMIENTO = 6 * 60 * 60
+
+
+def perfil_configurado():
+    """Nombre del perfil indicado en CALIFICACIONES_PERFIL (o el perfil por defecto)"""
+    nombre = os.environ.get('CALIFICACIONES_PERFIL', PERFIL_DEFECTO)
+    if nombre not in PERFILES:
+        raise ValueError(f"Perfil de almacenamiento desconocido: {nombre} (disponibles: {', '.join(PERFILES)})")
+    return nombre
+
+
+def aplicar_perfil(conn, perfil, solo_lectura=False):
+    """Aplica los PRAGMA del perfil a una conexión.
+
+    journal_mode es persistente y requiere escribir en el archivo, así que las
+    conexiones de solo lectura lo omiten.
+    """
+    valores = PERFILES[perfil]
+    if not solo_lectura:
+        conn.execute(f"PRAGMA journal_mode={valores['journal_mode']}")
+    conn.execute(f"PRAGMA synchronous={valores['synchronous']}")
+    conn.execute(f"PRAGMA cache_size={int(valores['cache_size'])}")
+    conn.execute(f"PRAGMA mmap_size={int(valores['mmap_size'])}")
+    conn.execute(f"PRAGMA temp_store={valores['temp_store']}")
+    return conn
+
+
+def habilitar_vacuum_incremental(conn):
+    """Cambia auto_vacuum a INCREMENTAL si aún no lo está (una sola vez, requiere VACUUM).
+
+    Con INCREMENTAL las páginas libres se pueden devolver al sistema con
+    `PRAGMA incremental_vacuum` sin reescribir todo el archivo. Devuelve True si
+    se hizo la conversión.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return False
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+    return True
+
+
+class ProgramadorMantenimiento:
+    """Ejecuta una tarea de mantenimiento periódicamente en un hilo de fondo"""
+
+    def __init__(self, tarea, intervalo=INTERVALO_MANTENIMIENTO):
+        self.tarea = tarea
+        self.intervalo = intervalo
+        self.ultimo_resultado = None
+        self.ultima_ejecucion = None
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        """Inicia el hilo si aún no está corriendo; la primera ejecución es tras un intervalo"""
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        self._detener.clear()
+
+        def ejecutar_periodicamente():
+            while not self._detener.wait(self.intervalo):
+                try:
+                    self.ultimo_resultado = self.tarea()
+                except Exception as e:
+                    # Cualquier fallo (también del hilo escritor) queda registrado y el hilo sigue
+                    logger.exception("Error en el mantenimiento de la base de datos")
+                    self.ultimo_resultado = {'error': str(e)}
+                self.ultima_ejecucion = time.time()
+
+        self._hilo = threading.Thread(target=ejecutar_periodicamente, name="db-maintenance", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        """Detiene el hilo de mantenimiento"""
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
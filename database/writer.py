@@ -0,0 +1,177 @@
+import atexit
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+
+from database.storage import aplicar_perfil
+
+# Marca para detener el hilo escritor
+_STOP = object()
+
+
+class GradeWriter:
+    """Hilo escritor único que serializa todas las escrituras de calificaciones.
+
+    SQLite solo admite un escritor a la vez; en lugar de que cada sesión abra su
+    propia transacción (y compita por el bloqueo), las operaciones se encolan y
+    un solo hilo las aplica agrupando varias en una misma transacción.
+    """
+
+    def __init__(self, db_path, max_queue=256, max_batch=64, busy_timeout_ms=30000, perfil=None):
+        self.db_path = db_path
+        self.perfil = perfil
+        self.max_batch = max_batch
+        self.busy_timeout_ms = busy_timeout_ms
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        # Error de conexión del último hilo escritor; mientras exista no se encola nada
+        self._error = None
+
+    def start(self):
+        """Inicia el hilo escritor si aún no está corriendo (reintenta si antes no pudo conectarse)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._error = None
+                self._thread = threading.Thread(target=self._run, name="grade-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        """Detiene el hilo escritor después de vaciar la cola"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def activo(self):
+        """Indica si el hilo escritor está corriendo"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(self, operation, timeout=None):
+        """Encola una operación de escritura y devuelve un Future con su resultado.
+
+        `operation` recibe la conexión de escritura y no debe hacer commit ni rollback:
+        el hilo escritor controla la transacción. Si la cola está llena se espera
+        hasta `timeout` segundos y después se lanza `queue.Full`. Si el hilo escritor
+        no pudo abrir la base de datos, se lanza RuntimeError sin encolar nada.
+        """
+        self._verificar()
+        self.start()
+        future = Future()
+        self._queue.put((operation, future), timeout=timeout)
+        # Si la conexión falló mientras tanto, la operación no debe quedarse esperando
+        if self._error is not None:
+            self._fallar_pendientes(self._error)
+        return future
+
+    def execute(self, operation, timeout=None):
+        """Encola una operación y espera su resultado"""
+        return self.submit(operation, timeout=timeout).result()
+
+    def _verificar(self):
+        error = self._error
+        if error is not None:
+            raise RuntimeError(f"El hilo escritor no pudo abrir la base de datos: {error}") from error
+
+    def _fallar_pendientes(self, error):
+        """Termina con `error` todas las operaciones que esperan en la cola"""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                continue
+            _, future = item
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        if self.perfil:
+            aplicar_perfil(conn, self.perfil)
+        else:
+            conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        return conn
+
+    def _run(self):
+        try:
+            conn = self._connect()
+        except Exception as e:
+            # Base de datos bloqueada, sin permisos o PRAGMA inválido: el escritor queda
+            # marcado como caído y las operaciones encoladas fallan en lugar de esperar
+            self._error = e
+            self._fallar_pendientes(e)
+            return
+        try:
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+
+                # Agrupar las solicitudes que ya esperan en la cola (group commit)
+                batch = [item]
+                while len(batch) < self.max_batch:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+
+                self._commit_batch(conn, batch)
+        finally:
+            conn.close()
+
+    def _commit_batch(self, conn, batch):
+        """Aplica un lote de operaciones en una sola transacción"""
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for operation, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+                # Cada operación va en su propio savepoint para que un error
+                # no invalide las demás solicitudes del lote
+                conn.execute("SAVEPOINT operacion")
+                try:
+                    result = operation(conn)
+                    conn.execute("RELEASE operacion")
+                    results.append((future, result, None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO operacion")
+                    conn.execute("RELEASE operacion")
+                    results.append((future, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, future in batch:
+                if not future.done():
+                    if future.running():
+                        future.set_exception(e)
+                    elif future.set_running_or_notify_cancel():
+                        future.set_exception(e)
+            return
+
+        # Los resultados se publican solo después del commit
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+def create_writer(db_path, **kwargs):
+    """Crea un escritor y registra su cierre al terminar el proceso"""
+    writer = GradeWriter(db_path, **kwargs)
+    atexit.register(writer.stop, 5)
+    return writer
@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
+import io
+from datetime import datetime
 from utils.auth import require_auth, get_current_user
-from utils.excel_handler import excel_handler
+from utils.excel_handler import excel_handler, FORMATOS
 from database.database import db
 import sqlite3
 
@@ -19,21 +21,21 @@ def show_calificaciones_page():
         st.warning("No tienes materias asignadas.")
         return
     
-    # Selector de materia
-    materia_options = {f"{m['nombre']} ({m['codigo']})": m for m in materias}
+    # Selector de materia y grupo (un profesor puede tener varios grupos de la misma materia)
+    materia_options = {f"{m['nombre']} ({m['codigo']}) - Grupo {m['grupo']} - {m['semestre']}": m for m in materias}
     
-    # Si hay una materia seleccionada desde el dashboard, usarla
-    selected_materia_id = st.session_state.get('selected_materia', None)
+    # Si hay un grupo seleccionado desde el dashboard, usarlo
+    selected_grupo = st.session_state.get('selected_materia', None)
     default_index = 0
     
-    if selected_materia_id:
+    if selected_grupo:
         for i, materia in enumerate(materias):
-            if materia['id'] == selected_materia_id:
+            if (materia['id'], materia['grupo'], materia['semestre']) == selected_grupo:
                 default_index = i
                 break
     
     selected_materia_name = st.selectbox(
-        "Selecciona una materia:",
+        "Selecciona una materia y grupo:",
         options=list(materia_options.keys()),
         index=default_index
     )
@@ -66,7 +68,8 @@ def show_grades_table(materia, profesor_id):
     """Muestra la tabla de calificaciones"""
     st.subheader("📊 Calificaciones Actuales")
     
-    estudiantes = db.get_estudiantes_materia(materia['id'], profesor_id)
+    estudiantes = db.get_estudiantes_materia(materia['id'], profesor_id, grupo=materia['grupo'],
+                                             semestre=materia['semestre'])
     
     if not estudiantes:
         st.info("No hay estudiantes inscritos en esta materia.")
@@ -115,52 +118,119 @@ def show_grades_table(materia, profesor_id):
     st.dataframe(df, use_container_width=True, hide_index=True)
     
     # Botón para exportar
-    if st.button("📥 Exportar a Excel"):
-        df_export, filename = excel_handler.export_grades_to_excel(materia['id'], profesor_id, materia['nombre'])
+    formato = st.radio("Formato de exportación", list(FORMATOS.keys()), horizontal=True, key="formato_exportacion")
+    if st.button("📥 Exportar calificaciones"):
+        df_export, filename = excel_handler.export_grades_to_excel(materia['id'], profesor_id, materia['nombre'], formato,
+                                                                   grupo=materia['grupo'], semestre=materia['semestre'])
         if df_export is not None:
-            csv = df_export.to_csv(index=False)
             st.download_button(
-                label="Descargar archivo Excel",
-                data=csv,
-                file_name=filename.replace('.xlsx', '.csv'),
-                mime='text/csv'
+                label=f"Descargar archivo {formato.upper()}",
+                data=excel_handler.to_bytes(df_export, formato),
+                file_name=filename,
+                mime=FORMATOS[formato][1]
             )
+    
+    # Botón para exportar todas las materias del profesor en un solo libro
+    if st.button("📚 Exportar todas mis materias"):
+        output = io.BytesIO()
+        try:
+            hojas = excel_handler.export_workbook(output, profesor_id=profesor_id)
+            st.download_button(
+                label=f"Descargar libro de Excel ({hojas} hojas)",
+                data=output.getvalue(),
+                file_name=f"calificaciones_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            )
+        except Exception as e:
+            st.error(f"Error al exportar las calificaciones: {str(e)}")
+    
+    show_grading_policy(materia)
+
+def show_grading_policy(materia):
+    """Muestra y permite cambiar la política de ponderación de la materia"""
+    if 'politica_message' in st.session_state:
+        st.success(st.session_state.pop('politica_message'))
+    
+    politica = db.get_politica_calificacion(materia['id'])
+    
+    with st.expander("⚖️ Política de calificación"):
+        origen = "propia de la materia" if politica['propia'] else "general"
+        descripcion = (f"**Política {origen}:** parciales {politica['peso_parciales'] * 100:.0f}% + "
+                       f"ordinario {(1 - politica['peso_parciales']) * 100:.0f}%")
+        if politica['descartar_menor']:
+            descripcion += " (se descarta el parcial más bajo)"
+        st.write(descripcion)
+        st.caption("La política se aplica a todos los grupos de la materia.")
+        
+        # Cambiarla recalcula los grupos de todos los profesores de la materia
+        if not db.es_coordinador(get_current_user()['id']):
+            st.info("Solo la coordinación académica puede cambiar la política de calificación.")
+            return
+        
+        with st.form(f"politica_{materia['id']}"):
+            peso = st.slider("Peso de los parciales (%)", min_value=0, max_value=100,
+                             value=int(round(politica['peso_parciales'] * 100)), step=5)
+            descartar = st.checkbox("Descartar el parcial más bajo", value=politica['descartar_menor'])
+            
+            if st.form_submit_button("💾 Guardar y recalcular"):
+                try:
+                    db.set_politica_calificacion(materia['id'], peso / 100, descartar)
+                    
+                    barra = st.progress(0.0, text="Recalculando calificaciones...")
+                    def actualizar_barra(procesados, total):
+                        barra.progress(procesados / total if total else 1.0,
+                                       text=f"Recalculando calificaciones... {procesados}/{total}")
+                    
+                    resumen = db.recalcular_calificaciones(materia_id=materia['id'], progreso=actualizar_barra,
+                                                           usuario=get_current_user()['clave'])
+                    st.session_state.politica_message = (f"Se recalcularon {resumen['actualizadas']} calificaciones "
+                                                         f"en {resumen['segundos']:.2f} s.")
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Error al guardar la política: {str(e)}")
 
 def show_excel_upload(materia, profesor_id):
     """Muestra la sección de carga desde Excel"""
     st.subheader("📤 Cargar Calificaciones desde Excel")
     
+    if 'upload_message' in st.session_state:
+        st.success(st.session_state.pop('upload_message'))
+    
     st.info("""
     **Instrucciones:**
     1. Descarga la plantilla desde la pestaña "Descargar Plantilla"
     2. Llena las calificaciones en el archivo Excel
-    3. Sube el archivo completado aquí
+    3. Sube el archivo completado aquí (Excel, CSV o TSV)
     
     **Formato requerido:**
     - Las calificaciones deben estar entre 0 y 10
     - Puedes dejar celdas vacías para calificaciones no capturadas
-    - No modifiques las columnas de clave_estudiante y nombre_completo
+    - No modifiques las columnas de clave_estudiante, nombre_completo y version
     """)
     
     uploaded_file = st.file_uploader(
-        "Selecciona el archivo Excel con las calificaciones",
-        type=['xlsx', 'xls'],
-        help="Archivo Excel con el formato de la plantilla"
+        "Selecciona el archivo con las calificaciones",
+        type=['xlsx', 'xls', 'csv', 'tsv'],
+        help="Archivo Excel, CSV o TSV con el formato de la plantilla"
     )
     
     if uploaded_file is not None:
         try:
             # Mostrar preview del archivo
-            df_preview = pd.read_excel(uploaded_file)
+            df_preview = excel_handler.read_file(uploaded_file)
             st.subheader("Vista previa del archivo:")
             st.dataframe(df_preview.head(), use_container_width=True)
             
             if st.button("🚀 Procesar y Actualizar Calificaciones", type="primary"):
                 with st.spinner("Procesando archivo..."):
-                    success, message = excel_handler.process_excel_upload(uploaded_file, materia['id'], profesor_id)
+                    success, message = excel_handler.process_excel_upload(uploaded_file, materia['id'], profesor_id,
+                                                                          usuario=get_current_user()['clave'],
+                                                                          grupo=materia['grupo'],
+                                                                          semestre=materia['semestre'])
                     
                     if success:
-                        st.success(message)
+                        # Conservar el resultado (incluidos los conflictos) para mostrarlo tras recargar
+                        st.session_state.upload_message = message
                         st.balloons()
                         # Recargar la página para mostrar los cambios
                         st.rerun()
@@ -176,27 +246,29 @@ def show_template_download(materia, profesor_id):
     
     st.info("""
     **La plantilla incluye:**
-    - Lista de todos los estudiantes inscritos en la materia
+    - Lista de todos los estudiantes inscritos en el grupo
     - Columnas para cada parcial y ordinario
     - Calificaciones actuales (si las hay)
     - Formato correcto para la carga masiva
     """)
     
+    formato = st.radio("Formato de la plantilla", list(FORMATOS.keys()), index=1, horizontal=True, key="formato_plantilla")
+    
     if st.button("📋 Generar Plantilla", type="primary"):
         with st.spinner("Generando plantilla..."):
-            df_template = excel_handler.create_template(materia['id'], profesor_id)
+            df_template = excel_handler.create_template(materia['id'], profesor_id, grupo=materia['grupo'],
+                                                        semestre=materia['semestre'])
             
             if df_template is not None:
-                # Convertir a CSV para descarga
-                csv = df_template.to_csv(index=False)
-                filename = f"plantilla_calificaciones_{materia['codigo']}.csv"
+                # Convertir al formato elegido para descarga
+                filename = f"plantilla_calificaciones_{materia['codigo']}_{materia['grupo']}.{formato}"
                 
                 st.success("¡Plantilla generada exitosamente!")
                 st.download_button(
                     label="📥 Descargar Plantilla",
-                    data=csv,
+                    data=excel_handler.to_bytes(df_template, formato),
                     file_name=filename,
-                    mime='text/csv',
+                    mime=FORMATOS[formato][1],
                     help="Descarga la plantilla y ábrela en Excel para llenar las calificaciones"
                 )
                 
@@ -206,12 +278,31 @@ def show_template_download(materia, profesor_id):
                 
             else:
                 st.error("No se pudo generar la plantilla. Verifica que haya estudiantes inscritos.")
+    
+    st.markdown("---")
+    st.write("**Plantillas de todos tus grupos**")
+    
+    if st.button("🗂️ Generar plantillas de todos mis grupos (ZIP)"):
+        with st.spinner("Generando plantillas..."):
+            output = io.BytesIO()
+            try:
+                total = excel_handler.create_bulk_templates(output, profesor_id=profesor_id, formato=formato)
+                st.success(f"¡Se generaron {total} plantillas!")
+                st.download_button(
+                    label="📥 Descargar ZIP de plantillas",
+                    data=output.getvalue(),
+                    file_name=f"plantillas_calificaciones_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+                    mime='application/zip'
+                )
+            except Exception as e:
+                st.error(f"Error al generar las plantillas: {str(e)}")
 
 def show_individual_edit(materia, profesor_id):
     """Muestra la sección de edición individual"""
     st.subheader("✏️ Editar Calificaciones Individuales")
     
-    estudiantes = db.get_estudiantes_materia(materia['id'], profesor_id)
+    estudiantes = db.get_estudiantes_materia(materia['id'], profesor_id, grupo=materia['grupo'],
+                                             semestre=materia['semestre'])
     
     if not estudiantes:
         st.info("No hay estudiantes inscritos en esta materia.")
@@ -227,6 +318,14 @@ def show_individual_edit(materia, profesor_id):
     
     selected_estudiante = estudiante_options[selected_estudiante_name]
     
+    # Cada ejecución vuelve a leer la fila; al guardar, los valores que el usuario vio son
+    # los de la ejecución anterior, así que se guarda contra la versión de esa misma lectura
+    # y se recuerda la de la lectura actual para la siguiente
+    version_key = f"version_{materia['id']}_{selected_estudiante['id']}"
+    conflicto_key = f"conflicto_{materia['id']}_{selected_estudiante['id']}"
+    version_mostrada = st.session_state.get(version_key, selected_estudiante['version'])
+    st.session_state[version_key] = selected_estudiante['version']
+    
     # Formulario de edición
     with st.form("edit_grades_form"):
         st.write(f"**Editando calificaciones de:** {selected_estudiante['nombre']} {selected_estudiante['apellido_paterno']} {selected_estudiante['apellido_materno']}")
@@ -271,33 +370,53 @@ def show_individual_edit(materia, profesor_id):
                 format="%.1f"
             )
         
-        # Calcular calificación final automáticamente
-        promedio_parciales = (parcial_1 + parcial_2 + parcial_3) / 3
-        calificacion_final = (promedio_parciales * 0.5) + (ordinario * 0.5)
+        # Vista previa con la misma fórmula que usa la base de datos al guardar
+        calificacion_final = db.calcular_calificacion_final(parcial_1, parcial_2, parcial_3, ordinario,
+                                                            materia_id=materia['id'])
         
         st.info(f"**Calificación Final Calculada:** {calificacion_final:.1f}")
         
         if st.form_submit_button("💾 Guardar Calificaciones", type="primary"):
             try:
-                conn = db.get_connection()
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    INSERT OR REPLACE INTO calificaciones 
-                    (estudiante_id, materia_id, profesor_id, parcial_1, parcial_2, parcial_3, 
-                     ordinario, calificacion_final, semestre, fecha_actualizacion)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, "2025-2026A", CURRENT_TIMESTAMP)
-                ''', (selected_estudiante['id'], materia['id'], profesor_id, 
-                      parcial_1, parcial_2, parcial_3, ordinario, round(calificacion_final, 1)))
+                resumen = db.save_calificaciones([{
+                    'estudiante_id': selected_estudiante['id'],
+                    'materia_id': materia['id'],
+                    'profesor_id': profesor_id,
+                    'parcial_1': parcial_1,
+                    'parcial_2': parcial_2,
+                    'parcial_3': parcial_3,
+                    'ordinario': ordinario,
+                    'semestre': materia['semestre'],
+                    'version': version_mostrada
+                }], usuario=get_current_user()['clave']).result()
                 
-                conn.commit()
-                conn.close()
-                
-                st.success("¡Calificaciones guardadas exitosamente!")
-                st.rerun()
+                if resumen['conflictos']:
+                    st.session_state[conflicto_key] = resumen['conflictos'][0]
+                elif resumen['cambiados']:
+                    st.success("¡Calificaciones guardadas exitosamente!")
+                    st.rerun()
+                else:
+                    st.info("No hubo cambios en las calificaciones.")
                 
             except Exception as e:
                 st.error(f"Error al guardar calificaciones: {str(e)}")
+    
+    # Conflicto de concurrencia: otra sesión guardó antes que nosotros
+    if conflicto_key in st.session_state:
+        conflicto = st.session_state[conflicto_key]
+        st.error("⚠️ Otra sesión modificó las calificaciones de este estudiante mientras las editabas. "
+                 "Tus cambios no se guardaron; revisa los valores actuales y vuelve a capturarlos.")
+        st.dataframe(pd.DataFrame([{
+            'Parcial 1': conflicto['parcial_1'] if conflicto['parcial_1'] is not None else '-',
+            'Parcial 2': conflicto['parcial_2'] if conflicto['parcial_2'] is not None else '-',
+            'Parcial 3': conflicto['parcial_3'] if conflicto['parcial_3'] is not None else '-',
+            'Ordinario': conflicto['ordinario'] if conflicto['ordinario'] is not None else '-',
+            'Final': conflicto['calificacion_final'] if conflicto['calificacion_final'] is not None else '-'
+        }]), use_container_width=True, hide_index=True)
+        
+        if st.button("🔄 Cargar calificaciones actuales"):
+            del st.session_state[conflicto_key]
+            st.rerun()
 
 if __name__ == "__main__":
     show_calificaciones_page()
\ No newline at end of file
@@ -2,6 +2,30 @@ import streamlit as st
 from utils.auth import require_auth, get_current_user
 from database.database import db
 
+# Con st.fragment, mostrar u ocultar el detalle de un grupo vuelve a ejecutar solo ese
+# fragmento y no todo el dashboard (versiones anteriores de Streamlit ejecutan la página)
+fragmento = getattr(st, 'fragment', None) or (lambda funcion: funcion)
+
+@fragmento
+def show_distribucion_grupo(materia, profesor_id):
+    """Muestra la distribución de calificaciones de un grupo cuando el profesor la solicita"""
+    clave = f"detalle_{materia['id']}_{materia['grupo']}_{materia['semestre']}"
+    if not st.toggle("Ver distribución de calificaciones", key=clave):
+        return
+    
+    st.markdown("**Distribución de Calificaciones:**")
+    
+    # Misma fuente que el resumen del grupo (la base principal), para que ambos coincidan
+    rangos = db.get_distribucion_calificaciones(materia_id=materia['id'], profesor_id=profesor_id,
+                                                grupo=materia['grupo'], semestre=materia['semestre'],
+                                                analitica=False)
+    
+    # Mostrar en columnas
+    cols = st.columns(6)
+    for i, (rango, cantidad) in enumerate(rangos.items()):
+        with cols[i]:
+            st.metric(rango, cantidad)
+
 def show_dashboard():
     """Muestra el dashboard principal del profesor"""
     require_auth()
@@ -23,16 +47,11 @@ def show_dashboard():
     with col1:
         st.metric("Materias Asignadas", len(materias))
     
-    # Calcular estadísticas generales
-    total_estudiantes = 0
-    total_calificaciones = 0
-    
-    for materia in materias:
-        estudiantes = db.get_estudiantes_materia(materia['id'], user['id'])
-        total_estudiantes += len(estudiantes)
-        for est in estudiantes:
-            if est['calificacion_final'] is not None:
-                total_calificaciones += 1
+    # Resumen de todos los grupos con una sola consulta agregada; el detalle de cada
+    # grupo se consulta solo cuando el profesor lo pide
+    resumen = db.get_resumen_grupos(user['id'])
+    total_estudiantes = sum(r['inscritos'] for r in resumen.values())
+    total_calificaciones = sum(r['con_calificacion_final'] for r in resumen.values())
     
     with col2:
         st.metric("Total Estudiantes", total_estudiantes)
@@ -50,82 +69,49 @@ def show_dashboard():
     st.subheader("📚 Resumen por Materia")
     
     for materia in materias:
+        seleccion = (materia['id'], materia['grupo'], materia['semestre'])
+        datos = resumen.get(seleccion)
+        
         with st.expander(f"{materia['nombre']} ({materia['codigo']}) - Grupo {materia['grupo']}"):
-            estudiantes = db.get_estudiantes_materia(materia['id'], user['id'])
-            
-            if estudiantes:
+            if datos:
                 col1, col2, col3 = st.columns(3)
                 
                 with col1:
-                    st.metric("Estudiantes Inscritos", len(estudiantes))
-                
-                # Calcular estadísticas de la materia
-                calificaciones_finales = [est['calificacion_final'] for est in estudiantes if est['calificacion_final'] is not None]
+                    st.metric("Estudiantes Inscritos", datos['inscritos'])
                 
                 with col2:
-                    if calificaciones_finales:
-                        promedio = sum(calificaciones_finales) / len(calificaciones_finales)
-                        st.metric("Promedio General", f"{promedio:.2f}")
+                    if datos['promedio'] is not None:
+                        st.metric("Promedio General", f"{datos['promedio']:.2f}")
                     else:
                         st.metric("Promedio General", "N/A")
                 
                 with col3:
-                    aprobados = len([cal for cal in calificaciones_finales if cal >= 6.0])
-                    st.metric("Estudiantes Aprobados", aprobados)
+                    st.metric("Estudiantes Aprobados", datos['aprobados'])
                 
-                # Mostrar distribución de calificaciones
-                if calificaciones_finales:
-                    st.markdown("**Distribución de Calificaciones:**")
-                    
-                    # Crear rangos de calificaciones
-                    rangos = {
-                        "10.0": 0,
-                        "9.0-9.9": 0,
-                        "8.0-8.9": 0,
-                        "7.0-7.9": 0,
-                        "6.0-6.9": 0,
-                        "< 6.0": 0
-                    }
-                    
-                    for cal in calificaciones_finales:
-                        if cal == 10.0:
-                            rangos["10.0"] += 1
-                        elif cal >= 9.0:
-                            rangos["9.0-9.9"] += 1
-                        elif cal >= 8.0:
-                            rangos["8.0-8.9"] += 1
-                        elif cal >= 7.0:
-                            rangos["7.0-7.9"] += 1
-                        elif cal >= 6.0:
-                            rangos["6.0-6.9"] += 1
-                        else:
-                            rangos["< 6.0"] += 1
-                    
-                    # Mostrar en columnas
-                    cols = st.columns(6)
-                    for i, (rango, cantidad) in enumerate(rangos.items()):
-                        with cols[i]:
-                            st.metric(rango, cantidad)
+                # La distribución se consulta solo al pedirla
+                if datos['con_calificacion_final']:
+                    show_distribucion_grupo(materia, user['id'])
                 
-                # Botones de acción rápida
+                # Botones de acción rápida (la selección identifica materia, grupo y semestre)
                 st.markdown("**Acciones Rápidas:**")
                 col1, col2, col3 = st.columns(3)
+                sufijo = f"{materia['id']}_{materia['grupo']}_{materia['semestre']}"
                 
                 with col1:
-                    if st.button(f"📝 Gestionar Calificaciones", key=f"manage_{materia['id']}"):
-                        st.session_state.selected_materia = materia['id']
+                    if st.button(f"📝 Gestionar Calificaciones", key=f"manage_{sufijo}"):
+                        st.session_state.selected_materia = seleccion
                         st.session_state.page = "calificaciones"
                         st.rerun()
                 
                 with col2:
-                    if st.button(f"📊 Ver Estadísticas", key=f"stats_{materia['id']}"):
-                        st.session_state.selected_materia = materia['id']
+                    if st.button(f"📊 Ver Estadísticas", key=f"stats_{sufijo}"):
+                        st.session_state.selected_materia = seleccion
                         st.session_state.page = "estadisticas"
                         st.rerun()
                 
                 with col3:
-                    if st.button(f"📄 Generar Reportes", key=f"reports_{materia['id']}"):
-                        st.session_state.selected_materia = materia['id']
+                    if st.button(f"📄 Generar Reportes", key=f"reports_{sufijo}"):
+                        st.session_state.selected_materia = seleccion
                         st.session_state.page = "reportes"
                         st.rerun()
             else:
@@ -1,10 +1,31 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import os
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from utils.auth import require_auth, get_current_user
-from database.database import db
+from database.database import db, RANGOS_CALIFICACION
+from utils.figure_cache import figure_cache
+
+# Bordes de los histogramas: 10 intervalos de un punto entre 0 y 10
+BORDES_HISTOGRAMA = np.arange(0, 11)
+
+# Número de estudiantes a partir del cual las gráficas usan el modo para grupos grandes
+UMBRAL_COHORTE_GRANDE = int(os.environ.get('CALIFICACIONES_UMBRAL_COHORTE', 200))
+
+# Tamaño inicial de la muestra de estudiantes en el modo para grupos grandes
+TAMANO_MUESTRA = 50
+
+# Columnas usadas en el análisis comparativo y su nombre para mostrar
+COLUMNAS_COMPARATIVO = {
+    'parcial_1': 'Parcial 1',
+    'parcial_2': 'Parcial 2',
+    'parcial_3': 'Parcial 3',
+    'ordinario': 'Ordinario',
+    'calificacion_final': 'Final'
+}
 
 def show_estadisticas_page():
     """Muestra la página de estadísticas"""
@@ -20,21 +41,21 @@ def show_estadisticas_page():
         st.warning("No tienes materias asignadas.")
         return
     
-    # Selector de materia
-    materia_options = {f"{m['nombre']} ({m['codigo']})": m for m in materias}
+    # Selector de materia y grupo (un profesor puede tener varios grupos de la misma materia)
+    materia_options = {f"{m['nombre']} ({m['codigo']}) - Grupo {m['grupo']} - {m['semestre']}": m for m in materias}
     
-    # Si hay una materia seleccionada desde el dashboard, usarla
-    selected_materia_id = st.session_state.get('selected_materia', None)
+    # Si hay un grupo seleccionado desde el dashboard, usarlo
+    selected_grupo = st.session_state.get('selected_materia', None)
     default_index = 0
     
-    if selected_materia_id:
+    if selected_grupo:
         for i, materia in enumerate(materias):
-            if materia['id'] == selected_materia_id:
+            if (materia['id'], materia['grupo'], materia['semestre']) == selected_grupo:
                 default_index = i
                 break
     
     selected_materia_name = st.selectbox(
-        "Selecciona una materia:",
+        "Selecciona una materia y grupo:",
         options=list(materia_options.keys()),
         index=default_index
     )
@@ -49,7 +70,8 @@ def show_estadisticas_page():
     st.write(f"**Código:** {selected_materia['codigo']} | **Grupo:** {selected_materia['grupo']}")
     
     # Obtener datos de estudiantes
-    estudiantes = db.get_estudiantes_materia(selected_materia['id'], user['id'])
+    estudiantes = db.get_estudiantes_materia(selected_materia['id'], user['id'], grupo=selected_materia['grupo'],
+                                             semestre=selected_materia['semestre'], analitica=True)
     
     if not estudiantes:
         st.warning("No hay estudiantes inscritos en esta materia.")
@@ -62,13 +84,15 @@ def show_estadisticas_page():
         show_general_summary(estudiantes)
     
     with tab2:
-        show_distributions(estudiantes)
+        show_distributions(estudiantes, selected_materia['id'], user['id'], grupo=selected_materia['grupo'],
+                           semestre=selected_materia['semestre'])
     
     with tab3:
         show_comparative_analysis(estudiantes)
     
     with tab4:
-        show_performance_analysis(estudiantes)
+        show_performance_analysis(selected_materia['id'], user['id'], grupo=selected_materia['grupo'],
+                                  semestre=selected_materia['semestre'])
 
 def show_general_summary(estudiantes):
     """Muestra el resumen general de estadísticas"""
@@ -135,7 +159,7 @@ def show_general_summary(estudiantes):
     df_stats = pd.DataFrame(stats_data)
     st.dataframe(df_stats, use_container_width=True, hide_index=True)
 
-def show_distributions(estudiantes):
+def show_distributions(estudiantes, materia_id, profesor_id, grupo=None, semestre=None):
     """Muestra las distribuciones de calificaciones"""
     st.subheader("📊 Distribución de Calificaciones")
     
@@ -143,252 +167,428 @@ def show_distributions(estudiantes):
     evaluaciones = ['parcial_1', 'parcial_2', 'parcial_3', 'ordinario', 'calificacion_final']
     nombres_eval = ['Parcial 1', 'Parcial 2', 'Parcial 3', 'Ordinario', 'Calificación Final']
     
-    # Gráfico de histogramas
-    fig = make_subplots(
-        rows=2, cols=3,
-        subplot_titles=nombres_eval,
-        specs=[[{"type": "histogram"}, {"type": "histogram"}, {"type": "histogram"}],
-               [{"type": "histogram"}, {"type": "histogram"}, None]]
-    )
-    
-    positions = [(1, 1), (1, 2), (1, 3), (2, 1), (2, 2)]
+    # Se envían al navegador solo los conteos por intervalo, no cada calificación
+    df = pd.DataFrame(estudiantes, columns=evaluaciones).astype(float)
     
-    for i, (eval_key, eval_name) in enumerate(zip(evaluaciones, nombres_eval)):
-        calificaciones = [est[eval_key] for est in estudiantes if est[eval_key] is not None]
+    # Gráfico de histogramas (se reutiliza mientras los datos no cambien)
+    def crear_histogramas():
+        fig = make_subplots(
+            rows=2, cols=3,
+            subplot_titles=nombres_eval,
+            specs=[[{"type": "bar"}, {"type": "bar"}, {"type": "bar"}],
+                   [{"type": "bar"}, {"type": "bar"}, None]]
+        )
         
-        if calificaciones:
-            row, col = positions[i]
-            fig.add_trace(
-                go.Histogram(
-                    x=calificaciones,
-                    nbinsx=10,
-                    name=eval_name,
-                    showlegend=False
-                ),
-                row=row, col=col
-            )
-    
-    fig.update_layout(
-        height=600,
-        title_text="Distribución de Calificaciones por Evaluación",
-        showlegend=False
-    )
-    
-    fig.update_xaxes(title_text="Calificación", range=[0, 10])
-    fig.update_yaxes(title_text="Frecuencia")
+        positions = [(1, 1), (1, 2), (1, 3), (2, 1), (2, 2)]
+        
+        for i, (eval_key, eval_name) in enumerate(zip(evaluaciones, nombres_eval)):
+            calificaciones = df[eval_key].dropna().to_numpy()
+            
+            if len(calificaciones):
+                conteos, bordes = np.histogram(calificaciones, bins=BORDES_HISTOGRAMA)
+                row, col = positions[i]
+                fig.add_trace(
+                    go.Bar(
+                        x=bordes[:-1] + 0.5,
+                        y=conteos,
+                        width=1.0,
+                        name=eval_name,
+                        showlegend=False
+                    ),
+                    row=row, col=col
+                )
+        
+        fig.update_layout(
+            height=600,
+            title_text="Distribución de Calificaciones por Evaluación",
+            showlegend=False,
+            bargap=0.05
+        )
+        
+        fig.update_xaxes(title_text="Calificación", range=[0, 10])
+        fig.update_yaxes(title_text="Frecuencia")
+        
+        return fig
     
+    fig = figure_cache.get_or_build('histogramas', df, crear_histogramas)
     st.plotly_chart(fig, use_container_width=True)
     
     # Gráfico de barras por rangos
     st.subheader("📈 Distribución por Rangos de Calificación")
     
-    calificaciones_finales = [est['calificacion_final'] for est in estudiantes if est['calificacion_final'] is not None]
+    # Conteo por rangos calculado con una sola consulta agregada
+    conteos = db.get_distribucion_calificaciones(materia_id=materia_id, profesor_id=profesor_id, grupo=grupo,
+                                                 semestre=semestre)
     
-    if calificaciones_finales:
-        rangos = {
-            "Excelente (10.0)": 0,
-            "Muy Bien (9.0-9.9)": 0,
-            "Bien (8.0-8.9)": 0,
-            "Regular (7.0-7.9)": 0,
-            "Suficiente (6.0-6.9)": 0,
-            "Reprobado (< 6.0)": 0
-        }
-        
-        for cal in calificaciones_finales:
-            if cal == 10.0:
-                rangos["Excelente (10.0)"] += 1
-            elif cal >= 9.0:
-                rangos["Muy Bien (9.0-9.9)"] += 1
-            elif cal >= 8.0:
-                rangos["Bien (8.0-8.9)"] += 1
-            elif cal >= 7.0:
-                rangos["Regular (7.0-7.9)"] += 1
-            elif cal >= 6.0:
-                rangos["Suficiente (6.0-6.9)"] += 1
-            else:
-                rangos["Reprobado (< 6.0)"] += 1
+    if sum(conteos.values()) > 0:
+        rangos = {f"{descripcion} ({rango})": conteos[rango] for rango, _, descripcion in RANGOS_CALIFICACION}
         
         # Crear gráfico de barras
-        fig_bar = px.bar(
-            x=list(rangos.keys()),
-            y=list(rangos.values()),
-            title="Distribución por Rangos de Calificación Final",
-            labels={'x': 'Rango de Calificación', 'y': 'Número de Estudiantes'},
-            color=list(rangos.values()),
-            color_continuous_scale='RdYlGn'
-        )
+        def crear_barras_rangos():
+            fig_bar = px.bar(
+                x=list(rangos.keys()),
+                y=list(rangos.values()),
+                title="Distribución por Rangos de Calificación Final",
+                labels={'x': 'Rango de Calificación', 'y': 'Número de Estudiantes'},
+                color=list(rangos.values()),
+                color_continuous_scale='RdYlGn'
+            )
+            
+            fig_bar.update_layout(showlegend=False)
+            return fig_bar
         
-        fig_bar.update_layout(showlegend=False)
+        fig_bar = figure_cache.get_or_build('barras_rangos', rangos, crear_barras_rangos)
         st.plotly_chart(fig_bar, use_container_width=True)
 
 def show_comparative_analysis(estudiantes):
     """Muestra análisis comparativo entre evaluaciones"""
     st.subheader("📉 Análisis Comparativo")
     
-    # Crear DataFrame para análisis
-    data_for_comparison = []
-    for est in estudiantes:
-        if all(est[key] is not None for key in ['parcial_1', 'parcial_2', 'parcial_3', 'ordinario']):
-            data_for_comparison.append({
-                'Estudiante': f"{est['apellido_paterno']} {est['nombre']}",
-                'Parcial 1': est['parcial_1'],
-                'Parcial 2': est['parcial_2'],
-                'Parcial 3': est['parcial_3'],
-                'Ordinario': est['ordinario'],
-                'Final': est['calificacion_final']
-            })
+    # Crear DataFrame para análisis: solo estudiantes con todas las evaluaciones
+    df = pd.DataFrame(estudiantes)
+    df[list(COLUMNAS_COMPARATIVO)] = df[list(COLUMNAS_COMPARATIVO)].astype(float)
+    df = df.dropna(subset=['parcial_1', 'parcial_2', 'parcial_3', 'ordinario'])
     
-    if not data_for_comparison:
+    if df.empty:
         st.warning("No hay suficientes datos para realizar el análisis comparativo.")
         return
     
-    df_comparison = pd.DataFrame(data_for_comparison)
+    df_comparison = df.rename(columns=COLUMNAS_COMPARATIVO)[list(COLUMNAS_COMPARATIVO.values())]
+    df_comparison.insert(0, 'Estudiante', df['apellido_paterno'] + ' ' + df['nombre'])
+    df_comparison.insert(0, 'Clave', df['clave'])
+    
+    evaluaciones = ['Parcial 1', 'Parcial 2', 'Parcial 3', 'Ordinario']
+    cohorte_grande = len(df_comparison) > UMBRAL_COHORTE_GRANDE
     
     # Gráfico de líneas para mostrar evolución
     st.subheader("📈 Evolución de Calificaciones por Estudiante")
     
+    if cohorte_grande:
+        show_large_cohort_evolution(df_comparison, evaluaciones)
+    else:
+        show_student_evolution(df_comparison)
+    
+    # Gráfico de caja (box plot) para comparar distribuciones
+    st.subheader("📦 Comparación de Distribuciones")
+    
+    # Cuartiles, bigotes y valores atípicos precalculados: la gráfica no recibe cada punto
+    df_box = df_comparison.melt(value_vars=evaluaciones, var_name='Evaluación', value_name='Calificación')
+    
+    def crear_cajas():
+        resumen, atipicos = calcular_resumen_caja(df_box, 'Evaluación', 'Calificación', evaluaciones)
+        
+        fig_box = go.Figure()
+        fig_box.add_trace(go.Box(
+            x=resumen.index,
+            q1=resumen['q1'],
+            median=resumen['mediana'],
+            q3=resumen['q3'],
+            lowerfence=resumen['bigote_inf'],
+            upperfence=resumen['bigote_sup'],
+            mean=resumen['media'],
+            name='Calificación',
+            showlegend=False
+        ))
+        
+        if not atipicos.empty:
+            # Con muchos estudiantes los valores atípicos se dibujan con WebGL
+            trazo = go.Scattergl if cohorte_grande else go.Scatter
+            fig_box.add_trace(trazo(
+                x=atipicos['Evaluación'],
+                y=atipicos['Calificación'],
+                mode='markers',
+                name='Valores atípicos',
+                showlegend=False
+            ))
+        
+        fig_box.update_layout(
+            title="Distribución de Calificaciones por Evaluación",
+            xaxis_title="Evaluación",
+            yaxis_title="Calificación"
+        )
+        
+        fig_box.update_layout(height=400)
+        
+        return fig_box
+    
+    fig_box = figure_cache.get_or_build('cajas', df_box, crear_cajas, params={'cohorte_grande': cohorte_grande})
+    st.plotly_chart(fig_box, use_container_width=True)
+    
+    # Correlaciones entre evaluaciones
+    st.subheader("🔗 Correlaciones entre Evaluaciones")
+    
+    correlation_data = df_comparison[['Parcial 1', 'Parcial 2', 'Parcial 3', 'Ordinario', 'Final']].corr()
+    
+    def crear_correlaciones():
+        return px.imshow(
+            correlation_data,
+            title="Matriz de Correlación entre Evaluaciones",
+            color_continuous_scale='RdBu',
+            aspect="auto"
+        )
+    
+    fig_corr = figure_cache.get_or_build('correlaciones', correlation_data, crear_correlaciones)
+    
+    st.plotly_chart(fig_corr, use_container_width=True)
+
+def show_student_evolution(df_comparison):
+    """Muestra la evolución individual de los primeros estudiantes"""
     # Seleccionar algunos estudiantes para mostrar (máximo 10)
     estudiantes_muestra = df_comparison.head(10)
     
-    fig_lines = go.Figure()
+    def crear_evolucion():
+        fig_lines = go.Figure()
+        
+        for _, row in estudiantes_muestra.iterrows():
+            fig_lines.add_trace(go.Scatter(
+                x=['Parcial 1', 'Parcial 2', 'Parcial 3', 'Ordinario'],
+                y=[row['Parcial 1'], row['Parcial 2'], row['Parcial 3'], row['Ordinario']],
+                mode='lines+markers',
+                name=row['Estudiante'],
+                line=dict(width=2),
+                marker=dict(size=6)
+            ))
+        
+        fig_lines.update_layout(
+            title="Evolución de Calificaciones (Primeros 10 estudiantes)",
+            xaxis_title="Evaluación",
+            yaxis_title="Calificación",
+            yaxis=dict(range=[0, 10]),
+            height=500
+        )
+        
+        return fig_lines
     
-    for _, row in estudiantes_muestra.iterrows():
-        fig_lines.add_trace(go.Scatter(
-            x=['Parcial 1', 'Parcial 2', 'Parcial 3', 'Ordinario'],
-            y=[row['Parcial 1'], row['Parcial 2'], row['Parcial 3'], row['Ordinario']],
+    fig_lines = figure_cache.get_or_build('evolucion', estudiantes_muestra, crear_evolucion)
+    st.plotly_chart(fig_lines, use_container_width=True)
+
+def show_large_cohort_evolution(df_comparison, evaluaciones):
+    """Muestra la evolución de un grupo grande: tendencia agregada y muestra estratificada"""
+    st.info(f"Grupo de {len(df_comparison)} estudiantes: se muestra la mediana con bandas de percentiles "
+            f"y una muestra representativa en lugar de una línea por estudiante.")
+    
+    def crear_evolucion_agregada():
+        percentiles = df_comparison[evaluaciones].quantile([0.1, 0.25, 0.5, 0.75, 0.9])
+        
+        fig = go.Figure()
+        
+        # Bandas de percentiles como polígonos cerrados (ida por el límite superior, regreso por el inferior)
+        for inferior, superior, nombre, opacidad in [(0.1, 0.9, "Percentiles 10-90", 0.15),
+                                                     (0.25, 0.75, "Percentiles 25-75", 0.3)]:
+            fig.add_trace(go.Scatter(
+                x=evaluaciones + evaluaciones[::-1],
+                y=list(percentiles.loc[superior]) + list(percentiles.loc[inferior])[::-1],
+                fill='toself',
+                fillcolor=f"rgba(42, 82, 152, {opacidad})",
+                line=dict(width=0),
+                hoverinfo='skip',
+                name=nombre
+            ))
+        
+        fig.add_trace(go.Scattergl(
+            x=evaluaciones,
+            y=percentiles.loc[0.5],
             mode='lines+markers',
-            name=row['Estudiante'],
-            line=dict(width=2),
-            marker=dict(size=6)
+            name="Mediana",
+            line=dict(width=3, color="#1e3c72"),
+            marker=dict(size=8)
         ))
+        
+        fig.update_layout(
+            title=f"Evolución de Calificaciones ({len(df_comparison)} estudiantes)",
+            xaxis_title="Evaluación",
+            yaxis_title="Calificación",
+            yaxis=dict(range=[0, 10]),
+            height=500
+        )
+        
+        return fig
     
-    fig_lines.update_layout(
-        title="Evolución de Calificaciones (Primeros 10 estudiantes)",
-        xaxis_title="Evaluación",
-        yaxis_title="Calificación",
-        yaxis=dict(range=[0, 10]),
-        height=500
-    )
+    fig = figure_cache.get_or_build('evolucion_agregada', df_comparison[evaluaciones], crear_evolucion_agregada)
+    st.plotly_chart(fig, use_container_width=True)
     
-    st.plotly_chart(fig_lines, use_container_width=True)
+    # Exploración de estudiantes con una muestra estratificada por rango de calificación final
+    df_rangos = df_comparison.assign(Rango=asignar_rango(df_comparison['Final']))
     
-    # Gráfico de caja (box plot) para comparar distribuciones
-    st.subheader("📦 Comparación de Distribuciones")
+    col1, col2 = st.columns(2)
     
-    # Preparar datos para box plot
-    box_data = []
-    evaluaciones = ['Parcial 1', 'Parcial 2', 'Parcial 3', 'Ordinario']
+    with col1:
+        rango = st.selectbox(
+            "Rango de calificación final a explorar:",
+            options=["Todos"] + [r for r, _, _ in RANGOS_CALIFICACION]
+        )
     
-    for eval_name in evaluaciones:
-        for _, row in df_comparison.iterrows():
-            box_data.append({
-                'Evaluación': eval_name,
-                'Calificación': row[eval_name]
-            })
+    with col2:
+        tamano = st.slider("Estudiantes en la muestra", min_value=10, max_value=200, value=TAMANO_MUESTRA, step=10)
     
-    df_box = pd.DataFrame(box_data)
+    if rango != "Todos":
+        df_rangos = df_rangos[df_rangos['Rango'] == rango]
     
-    fig_box = px.box(
-        df_box,
-        x='Evaluación',
-        y='Calificación',
-        title="Distribución de Calificaciones por Evaluación",
-        points="outliers"
-    )
+    if df_rangos.empty:
+        st.info("No hay estudiantes en el rango seleccionado.")
+        return
     
-    fig_box.update_layout(height=400)
-    st.plotly_chart(fig_box, use_container_width=True)
+    muestra = muestra_estratificada(df_rangos, tamano, 'Rango')
     
-    # Correlaciones entre evaluaciones
-    st.subheader("🔗 Correlaciones entre Evaluaciones")
+    def crear_evolucion_muestra():
+        # Todas las líneas van en una sola traza WebGL; un valor nulo separa a cada estudiante
+        n = len(muestra)
+        x = np.tile(evaluaciones + evaluaciones[-1:], n)
+        y = np.column_stack([muestra[evaluaciones].to_numpy(), np.full(n, np.nan)]).ravel()
+        texto = np.repeat(muestra['Estudiante'].to_numpy(), len(evaluaciones) + 1)
+        
+        fig = go.Figure(go.Scattergl(
+            x=x,
+            y=y,
+            text=texto,
+            mode='lines+markers',
+            hovertemplate="%{text}<br>%{x}: %{y}<extra></extra>",
+            line=dict(width=1),
+            marker=dict(size=4),
+            opacity=0.6,
+            connectgaps=False,
+            name="Muestra"
+        ))
+        
+        fig.update_layout(
+            title=f"Muestra representativa ({n} de {len(df_rangos)} estudiantes)",
+            xaxis_title="Evaluación",
+            yaxis_title="Calificación",
+            yaxis=dict(range=[0, 10]),
+            height=500
+        )
+        
+        return fig
     
-    correlation_data = df_comparison[['Parcial 1', 'Parcial 2', 'Parcial 3', 'Ordinario', 'Final']].corr()
+    fig_muestra = figure_cache.get_or_build('evolucion_muestra', muestra[['Clave'] + evaluaciones],
+                                            crear_evolucion_muestra, params={'total': len(df_rangos)})
+    st.plotly_chart(fig_muestra, use_container_width=True)
+
+def asignar_rango(calificaciones):
+    """Asigna a cada calificación su rango de RANGOS_CALIFICACION"""
+    rangos = list(reversed(RANGOS_CALIFICACION))
+    bordes = [-np.inf] + [minimo for _, minimo, _ in rangos if minimo is not None] + [np.inf]
+    etiquetas = [rango for rango, _, _ in rangos]
+    return pd.cut(calificaciones, bins=bordes, labels=etiquetas, right=False).astype(object).fillna("Sin final")
+
+def muestra_estratificada(df, tamano, columna):
+    """Toma una muestra determinista con una cuota proporcional de cada estrato.
     
-    fig_corr = px.imshow(
-        correlation_data,
-        title="Matriz de Correlación entre Evaluaciones",
-        color_continuous_scale='RdBu',
-        aspect="auto"
-    )
+    El orden se basa en un hash de la clave del estudiante, así que la misma
+    muestra se obtiene en cada rerun y no cambia al agregar otros estudiantes.
+    """
+    if len(df) <= tamano:
+        return df
     
-    st.plotly_chart(fig_corr, use_container_width=True)
+    orden = pd.util.hash_pandas_object(df['Clave'], index=False).to_numpy()
+    df_ordenado = df.iloc[np.argsort(orden, kind='stable')]
+    
+    # Cuota proporcional al tamaño de cada estrato (al menos un estudiante por estrato)
+    tamanos = df_ordenado[columna].value_counts()
+    cuotas = np.maximum(1, np.round(tamanos * tamano / len(df_ordenado))).astype(int)
+    
+    posicion = df_ordenado.groupby(columna, sort=False).cumcount()
+    return df_ordenado[posicion < df_ordenado[columna].map(cuotas)]
+
+def calcular_resumen_caja(df_largo, grupo, valor, orden):
+    """Calcula cuartiles, bigotes (1.5 IQR) y valores atípicos por grupo sin iterar filas"""
+    agrupado = df_largo.groupby(grupo)[valor]
+    
+    resumen = agrupado.quantile([0.25, 0.5, 0.75]).unstack().reindex(orden)
+    resumen.columns = ['q1', 'mediana', 'q3']
+    resumen['media'] = agrupado.mean()
+    
+    # Límites de Tukey para cada fila según su grupo
+    iqr = resumen['q3'] - resumen['q1']
+    limite_inf = df_largo[grupo].map(resumen['q1'] - 1.5 * iqr)
+    limite_sup = df_largo[grupo].map(resumen['q3'] + 1.5 * iqr)
+    dentro = df_largo[valor].between(limite_inf, limite_sup)
+    
+    # Los bigotes llegan al valor más extremo que sigue dentro de los límites
+    normales = df_largo[dentro].groupby(grupo)[valor]
+    resumen['bigote_inf'] = normales.min()
+    resumen['bigote_sup'] = normales.max()
+    
+    return resumen, df_largo[~dentro]
 
-def show_performance_analysis(estudiantes):
+def show_performance_analysis(materia_id, profesor_id, grupo=None, semestre=None):
     """Muestra análisis de rendimiento"""
     st.subheader("🎯 Análisis de Rendimiento")
     
+    # Alcance del análisis: el grupo seleccionado o todos los grupos del profesor
+    todos_los_grupos = st.checkbox("Incluir todas mis materias y grupos", key="rendimiento_todos_los_grupos")
+    
+    # Riesgo, destacados y ordinario mínimo calculados en una sola consulta
+    if todos_los_grupos:
+        evaluacion = db.get_evaluacion_rendimiento(profesor_id=profesor_id)
+    else:
+        evaluacion = db.get_evaluacion_rendimiento(profesor_id=profesor_id, materia_id=materia_id, grupo=grupo,
+                                                   semestre=semestre)
+    
+    if not evaluacion:
+        st.info("No hay estudiantes inscritos para analizar.")
+        return
+    
+    df_eval = pd.DataFrame(evaluacion)
+    columnas_num = ['parcial_1', 'parcial_2', 'parcial_3', 'ordinario', 'calificacion_final',
+                    'promedio_parciales', 'ordinario_minimo']
+    df_eval[columnas_num] = df_eval[columnas_num].astype(float)
+    df_eval['nombre_completo'] = df_eval['apellido_paterno'] + ' ' + df_eval['apellido_materno'] + ' ' + df_eval['nombre']
+    df_eval['materia_grupo'] = df_eval['materia'] + ' (Grupo ' + df_eval['grupo'] + ')'
+    
     # Análisis de estudiantes en riesgo
     st.subheader("⚠️ Estudiantes en Riesgo")
     
-    estudiantes_riesgo = []
-    for est in estudiantes:
-        # Criterios de riesgo: promedio de parciales < 6.0 o calificación final < 6.0
-        parciales = [est['parcial_1'], est['parcial_2'], est['parcial_3']]
-        parciales_validos = [p for p in parciales if p is not None]
+    df_riesgo = df_eval[df_eval['en_riesgo'] == 1]
+    
+    if not df_riesgo.empty:
+        tabla_riesgo = pd.DataFrame({
+            'Clave': df_riesgo['clave'],
+            'Nombre': df_riesgo['nombre_completo'],
+            'Promedio Parciales': df_riesgo['promedio_parciales'].map('{:.1f}'.format),
+            'Calificación Final': formatear_calificaciones(df_riesgo['calificacion_final'], 'N/A'),
+            'Ordinario Mínimo': formatear_ordinario_minimo(df_riesgo['ordinario_minimo']),
+            'Razón': df_riesgo['razon']
+        })
+        if todos_los_grupos:
+            tabla_riesgo.insert(0, 'Materia', df_riesgo['materia_grupo'])
         
-        if parciales_validos:
-            promedio_parciales = sum(parciales_validos) / len(parciales_validos)
-            
-            en_riesgo = False
-            razon = []
-            
-            if promedio_parciales < 6.0:
-                en_riesgo = True
-                razon.append(f"Promedio parciales: {promedio_parciales:.1f}")
-            
-            if est['calificacion_final'] is not None and est['calificacion_final'] < 6.0:
-                en_riesgo = True
-                razon.append(f"Calificación final: {est['calificacion_final']:.1f}")
-            
-            if en_riesgo:
-                estudiantes_riesgo.append({
-                    'Clave': est['clave'],
-                    'Nombre': f"{est['apellido_paterno']} {est['apellido_materno']} {est['nombre']}",
-                    'Promedio Parciales': f"{promedio_parciales:.1f}",
-                    'Calificación Final': est['calificacion_final'] if est['calificacion_final'] is not None else 'N/A',
-                    'Razón': '; '.join(razon)
-                })
-    
-    if estudiantes_riesgo:
-        df_riesgo = pd.DataFrame(estudiantes_riesgo)
-        st.dataframe(df_riesgo, use_container_width=True, hide_index=True)
-        st.warning(f"Se identificaron {len(estudiantes_riesgo)} estudiantes en riesgo de reprobar.")
+        st.dataframe(tabla_riesgo, use_container_width=True, hide_index=True)
+        st.warning(f"Se identificaron {len(df_riesgo)} estudiantes en riesgo de reprobar.")
     else:
         st.success("No se identificaron estudiantes en riesgo inmediato.")
     
     # Análisis de mejores estudiantes
     st.subheader("🏆 Estudiantes Destacados")
     
-    estudiantes_destacados = []
-    for est in estudiantes:
-        if est['calificacion_final'] is not None and est['calificacion_final'] >= 9.0:
-            estudiantes_destacados.append({
-                'Clave': est['clave'],
-                'Nombre': f"{est['apellido_paterno']} {est['apellido_materno']} {est['nombre']}",
-                'Parcial 1': est['parcial_1'] if est['parcial_1'] is not None else 'N/A',
-                'Parcial 2': est['parcial_2'] if est['parcial_2'] is not None else 'N/A',
-                'Parcial 3': est['parcial_3'] if est['parcial_3'] is not None else 'N/A',
-                'Ordinario': est['ordinario'] if est['ordinario'] is not None else 'N/A',
-                'Calificación Final': est['calificacion_final']
-            })
-    
-    if estudiantes_destacados:
-        # Ordenar por calificación final descendente
-        estudiantes_destacados.sort(key=lambda x: x['Calificación Final'], reverse=True)
-        df_destacados = pd.DataFrame(estudiantes_destacados)
-        st.dataframe(df_destacados, use_container_width=True, hide_index=True)
-        st.success(f"¡{len(estudiantes_destacados)} estudiantes han obtenido calificaciones excelentes (≥9.0)!")
+    df_destacados = df_eval[df_eval['destacado'] == 1].sort_values('calificacion_final', ascending=False)
+    
+    if not df_destacados.empty:
+        tabla_destacados = pd.DataFrame({
+            'Clave': df_destacados['clave'],
+            'Nombre': df_destacados['nombre_completo'],
+            'Parcial 1': formatear_calificaciones(df_destacados['parcial_1'], 'N/A'),
+            'Parcial 2': formatear_calificaciones(df_destacados['parcial_2'], 'N/A'),
+            'Parcial 3': formatear_calificaciones(df_destacados['parcial_3'], 'N/A'),
+            'Ordinario': formatear_calificaciones(df_destacados['ordinario'], 'N/A'),
+            'Calificación Final': df_destacados['calificacion_final']
+        })
+        if todos_los_grupos:
+            tabla_destacados.insert(0, 'Materia', df_destacados['materia_grupo'])
+        
+        st.dataframe(tabla_destacados, use_container_width=True, hide_index=True)
+        st.success(f"¡{len(df_destacados)} estudiantes han obtenido calificaciones excelentes (≥9.0)!")
     else:
         st.info("No hay estudiantes con calificaciones excelentes (≥9.0) aún.")
     
     # Recomendaciones
     st.subheader("💡 Recomendaciones")
     
-    calificaciones_finales = [est['calificacion_final'] for est in estudiantes if est['calificacion_final'] is not None]
+    calificaciones_finales = df_eval['calificacion_final'].dropna()
     
-    if calificaciones_finales:
-        promedio_general = sum(calificaciones_finales) / len(calificaciones_finales)
-        porcentaje_aprobados = (len([cal for cal in calificaciones_finales if cal >= 6.0]) / len(calificaciones_finales)) * 100
+    if not calificaciones_finales.empty:
+        promedio_general = calificaciones_finales.mean()
+        porcentaje_aprobados = (calificaciones_finales >= 6.0).mean() * 100
         
         recomendaciones = []
         
@@ -398,10 +598,10 @@ def show_performance_analysis(estudiantes):
         if porcentaje_aprobados < 70:
             recomendaciones.append("⚠️ El porcentaje de aprobación es bajo, revisar metodología de enseñanza")
         
-        if len(estudiantes_riesgo) > len(estudiantes) * 0.3:
+        if len(df_riesgo) > len(df_eval) * 0.3:
             recomendaciones.append("🆘 Más del 30% de estudiantes están en riesgo, implementar estrategias de apoyo")
         
-        if not estudiantes_destacados:
+        if df_destacados.empty:
             recomendaciones.append("🎯 Implementar actividades para motivar la excelencia académica")
         
         if promedio_general >= 8.0 and porcentaje_aprobados >= 80:
@@ -413,5 +613,15 @@ def show_performance_analysis(estudiantes):
         else:
             st.success("El rendimiento del grupo está dentro de los parámetros normales.")
 
+def formatear_calificaciones(calificaciones, vacio):
+    """Convierte una serie de calificaciones a texto para mostrar, usando `vacio` en los faltantes"""
+    return calificaciones.map('{:.1f}'.format).where(calificaciones.notna(), vacio)
+
+def formatear_ordinario_minimo(minimos):
+    """Muestra el ordinario mínimo para aprobar, indicando cuando ya no es alcanzable"""
+    texto = minimos.map('{:.1f}'.format)
+    texto = texto.where(minimos <= 10.0, "No alcanzable")
+    return texto.where(minimos.notna(), "-")
+
 if __name__ == "__main__":
     show_estadisticas_page()
\ No newline at end of file
@@ -1,12 +1,8 @@
 import streamlit as st
 import os
 from utils.auth import require_auth, get_current_user
-from utils.pdf_generator import PDFGenerator
-from database.database import db
-
-# Crear instancia del generador de PDF con el logo
-# El logo debe estar en la carpeta raíz o especifica la ruta completa
-pdf_generator = PDFGenerator(logo_path='logo.png')
+from utils.pdf_generator import pdf_generator
+from database.database import db, RANGOS_CALIFICACION
 
 def show_reportes_page():
     """Muestra la página de generación de reportes"""
@@ -22,21 +18,21 @@ def show_reportes_page():
         st.warning("No tienes materias asignadas.")
         return
     
-    # Selector de materia
-    materia_options = {f"{m['nombre']} ({m['codigo']})": m for m in materias}
+    # Selector de materia y grupo (un profesor puede tener varios grupos de la misma materia)
+    materia_options = {f"{m['nombre']} ({m['codigo']}) - Grupo {m['grupo']} - {m['semestre']}": m for m in materias}
     
-    # Si hay una materia seleccionada desde el dashboard, usarla
-    selected_materia_id = st.session_state.get('selected_materia', None)
+    # Si hay un grupo seleccionado desde el dashboard, usarlo
+    selected_grupo = st.session_state.get('selected_materia', None)
     default_index = 0
     
-    if selected_materia_id:
+    if selected_grupo:
         for i, materia in enumerate(materias):
-            if materia['id'] == selected_materia_id:
+            if (materia['id'], materia['grupo'], materia['semestre']) == selected_grupo:
                 default_index = i
                 break
     
     selected_materia_name = st.selectbox(
-        "Selecciona una materia:",
+        "Selecciona una materia y grupo:",
         options=list(materia_options.keys()),
         index=default_index
     )
@@ -51,7 +47,8 @@ def show_reportes_page():
     st.write(f"**Código:** {selected_materia['codigo']} | **Grupo:** {selected_materia['grupo']}")
     
     # Obtener estudiantes para verificar que hay datos
-    estudiantes = db.get_estudiantes_materia(selected_materia['id'], user['id'])
+    estudiantes = db.get_estudiantes_materia(selected_materia['id'], user['id'], grupo=selected_materia['grupo'],
+                                             semestre=selected_materia['semestre'], analitica=True)
     
     if not estudiantes:
         st.warning("No hay estudiantes inscritos en esta materia.")
@@ -98,7 +95,8 @@ def show_reportes_page():
     st.markdown("---")
     st.subheader("📈 Estadísticas de la Materia")
     
-    show_materia_statistics(estudiantes)
+    show_materia_statistics(estudiantes, selected_materia['id'], user['id'], grupo=selected_materia['grupo'],
+                            semestre=selected_materia['semestre'])
     
     # Información sobre fechas del calendario académico
     st.markdown("---")
@@ -132,23 +130,21 @@ def generate_report(profesor_info, materia_info, estudiantes_data, tipo_reporte)
             os.makedirs(reports_dir, exist_ok=True)
             
             # Generar nombre del archivo
-            filename = f"{tipo_reporte.replace(' ', '_').lower()}_{materia_info['codigo']}_{profesor_info['clave']}.pdf"
+            filename = f"{tipo_reporte.replace(' ', '_').lower()}_{materia_info['codigo']}_{materia_info['grupo']}_{profesor_info['clave']}.pdf"
             output_path = os.path.join(reports_dir, filename)
             
-            # Generar el PDF
-            pdf_path = pdf_generator.generate_report(
+            # Generar el PDF (un reporte idéntico ya generado se toma de la caché)
+            pdf_data = pdf_generator.render_report(
                 profesor_info, 
                 materia_info, 
                 estudiantes_data, 
-                tipo_reporte, 
-                output_path
+                tipo_reporte
             )
             
-            st.success(f"¡Reporte {tipo_reporte} generado exitosamente!")
+            with open(output_path, "wb") as pdf_file:
+                pdf_file.write(pdf_data)
             
-            # Leer el archivo PDF para descarga
-            with open(pdf_path, "rb") as pdf_file:
-                pdf_data = pdf_file.read()
+            st.success(f"¡Reporte {tipo_reporte} generado exitosamente!")
             
             st.download_button(
                 label=f"📥 Descargar Reporte {tipo_reporte}",
@@ -164,7 +160,7 @@ def generate_report(profesor_info, materia_info, estudiantes_data, tipo_reporte)
     except Exception as e:
         st.error(f"Error al generar el reporte: {str(e)}")
 
-def show_materia_statistics(estudiantes):
+def show_materia_statistics(estudiantes, materia_id, profesor_id, grupo=None, semestre=None):
     """Muestra estadísticas detalladas de la materia"""
     
     # Métricas generales
@@ -198,29 +194,10 @@ def show_materia_statistics(estudiantes):
     if calificaciones_finales:
         st.subheader("📊 Distribución de Calificaciones Finales")
         
-        # Crear rangos
-        rangos = {
-            "Excelente (10.0)": 0,
-            "Muy Bien (9.0-9.9)": 0,
-            "Bien (8.0-8.9)": 0,
-            "Regular (7.0-7.9)": 0,
-            "Suficiente (6.0-6.9)": 0,
-            "Reprobado (< 6.0)": 0
-        }
-        
-        for cal in calificaciones_finales:
-            if cal == 10.0:
-                rangos["Excelente (10.0)"] += 1
-            elif cal >= 9.0:
-                rangos["Muy Bien (9.0-9.9)"] += 1
-            elif cal >= 8.0:
-                rangos["Bien (8.0-8.9)"] += 1
-            elif cal >= 7.0:
-                rangos["Regular (7.0-7.9)"] += 1
-            elif cal >= 6.0:
-                rangos["Suficiente (6.0-6.9)"] += 1
-            else:
-                rangos["Reprobado (< 6.0)"] += 1
+        # Conteo por rangos calculado con una sola consulta agregada
+        conteos = db.get_distribucion_calificaciones(materia_id=materia_id, profesor_id=profesor_id, grupo=grupo,
+                                                     semestre=semestre)
+        rangos = {f"{descripcion} ({rango})": conteos[rango] for rango, _, descripcion in RANGOS_CALIFICACION}
         
         # Mostrar en columnas
         cols = st.columns(3)
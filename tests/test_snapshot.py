@@ -0,0 +1,67 @@
+"""
+Pruebas de la copia de solo lectura (SnapshotManager).
+
+Uso (desde la raíz del proyecto):
+    python -m pytest tests
+"""
+
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.snapshot import SnapshotManager
+
+
+def crear_base(ruta):
+    conn = sqlite3.connect(ruta)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE inscripciones (estudiante_id INTEGER, materia_id INTEGER, grupo TEXT)")
+    conn.execute("INSERT INTO inscripciones VALUES (1, 1, 'A')")
+    conn.commit()
+    conn.close()
+
+
+def contar_inscripciones(snapshot):
+    conn = snapshot.obtener()
+    try:
+        return conn.execute("SELECT COUNT(*) FROM inscripciones").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_cambio_fuera_de_la_bitacora_llega_a_la_copia(tmp_path):
+    """Una tabla sin bitácora (inscripciones) se refleja en la copia pasado el límite de antigüedad"""
+    ruta = str(tmp_path / "calificaciones.db")
+    crear_base(ruta)
+    snapshot = SnapshotManager(ruta, max_staleness=0.2)
+    try:
+        assert contar_inscripciones(snapshot) == 1
+
+        conn = sqlite3.connect(ruta)
+        conn.execute("INSERT INTO inscripciones VALUES (2, 1, 'A')")
+        conn.commit()
+        conn.close()
+
+        time.sleep(0.3)
+        assert contar_inscripciones(snapshot) == 2
+        assert snapshot.refrescos == 2
+    finally:
+        snapshot.cerrar()
+
+
+def test_sin_cambios_no_se_vuelve_a_copiar(tmp_path):
+    """Si la base principal no cambió, la verificación no crea otra copia"""
+    ruta = str(tmp_path / "calificaciones.db")
+    crear_base(ruta)
+    snapshot = SnapshotManager(ruta, max_staleness=0.1)
+    try:
+        assert contar_inscripciones(snapshot) == 1
+        time.sleep(0.2)
+        assert contar_inscripciones(snapshot) == 1
+        assert snapshot.refrescos == 1
+    finally:
+        snapshot.cerrar()
+    assert not [nombre for nombre in os.listdir(tmp_path) if "_snapshot." in nombre]
@@ -1,17 +1,73 @@
 import pandas as pd
 import streamlit as st
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
 from database.database import db
+from utils.template_renderer import render_template
+from utils.recursos import registro
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+import multiprocessing
+import os
 import sqlite3
+import threading
+import re
+import io
+import zipfile
+
+# Encabezados de las hojas de exportación de calificaciones
+EXPORT_HEADERS = ['Clave', 'Nombre Completo', 'Parcial 1', 'Parcial 2', 'Parcial 3', 'Ordinario', 'Calificación Final']
+
+# Columnas con calificaciones en las plantillas de carga
+GRADE_COLUMNS = ['parcial_1', 'parcial_2', 'parcial_3', 'ordinario']
+
+# Formatos de intercambio soportados: extensión -> (separador, tipo MIME)
+FORMATOS = {
+    'xlsx': (None, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': (',', 'text/csv'),
+    'tsv': ('\t', 'text/tab-separated-values')
+}
+
+# Filas a partir de las cuales conviene generar las plantillas en procesos trabajadores
+# (por debajo, el arranque de los procesos cuesta más que generar todo en serie)
+MIN_FILAS_PARALELO = 5000
 
 class ExcelHandler:
     def __init__(self):
-        pass
+        # Procesos trabajadores para las plantillas masivas; se crean al primer uso y se
+        # reutilizan, así el arranque de los procesos solo se paga una vez por servidor
+        self._procesos = None
+        self._num_procesos = 0
+        self._lock = threading.Lock()
+    
+    def _pool_procesos(self, workers):
+        """Devuelve el pool de procesos trabajadores (lo crea con `workers` procesos la primera vez)"""
+        with self._lock:
+            if self._procesos is None:
+                # spawn evita heredar por fork los hilos del proceso (escritor, Streamlit)
+                self._procesos = ProcessPoolExecutor(max_workers=workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+                self._num_procesos = workers
+            return self._procesos
+    
+    def cerrar(self):
+        """Termina los procesos trabajadores"""
+        with self._lock:
+            procesos, self._procesos = self._procesos, None
+            self._num_procesos = 0
+        if procesos is not None:
+            procesos.shutdown()
+    
+    def salud(self):
+        """Estado para el registro de recursos"""
+        return {'procesos_trabajadores': self._num_procesos}
     
-    def create_template(self, materia_id, profesor_id):
-        """Crea una plantilla de Excel para cargar calificaciones"""
+    def create_template(self, materia_id, profesor_id, grupo=None, semestre=None):
+        """Crea una plantilla de Excel para cargar calificaciones (de un grupo si se indica)"""
         try:
             # Obtener estudiantes de la materia
-            estudiantes = db.get_estudiantes_materia(materia_id, profesor_id)
+            estudiantes = db.get_estudiantes_materia(materia_id, profesor_id, grupo=grupo, semestre=semestre)
             
             if not estudiantes:
                 return None
@@ -25,7 +81,8 @@ class ExcelHandler:
                     'parcial_1': est['parcial_1'] if est['parcial_1'] is not None else '',
                     'parcial_2': est['parcial_2'] if est['parcial_2'] is not None else '',
                     'parcial_3': est['parcial_3'] if est['parcial_3'] is not None else '',
-                    'ordinario': est['ordinario'] if est['ordinario'] is not None else ''
+                    'ordinario': est['ordinario'] if est['ordinario'] is not None else '',
+                    'version': est['version']
                 })
             
             df = pd.DataFrame(data)
@@ -45,97 +102,163 @@ class ExcelHandler:
             return False, f"Faltan las siguientes columnas: {', '.join(missing_columns)}"
         
         # Verificar que las calificaciones estén en el rango válido (0-10) o vacías
-        grade_columns = ['parcial_1', 'parcial_2', 'parcial_3', 'ordinario']
-        for col in grade_columns:
-            for idx, value in df[col].items():
-                if pd.notna(value) and value != '':
-                    try:
-                        grade = float(value)
-                        if grade < 0 or grade > 10:
-                            return False, f"Calificación inválida en fila {idx+2}, columna {col}: {grade}. Debe estar entre 0 y 10."
-                    except ValueError:
-                        return False, f"Valor no numérico en fila {idx+2}, columna {col}: {value}"
+        for col in GRADE_COLUMNS:
+            valores = df[col]
+            presentes = valores.notna() & (valores.astype(str) != '')
+            grades = pd.to_numeric(valores.where(presentes), errors='coerce')
+            
+            no_numericos = presentes & grades.isna()
+            if no_numericos.any():
+                idx = no_numericos.idxmax()
+                return False, f"Valor no numérico en fila {idx+2}, columna {col}: {valores[idx]}"
+            
+            fuera_de_rango = (grades < 0) | (grades > 10)
+            if fuera_de_rango.any():
+                idx = fuera_de_rango.idxmax()
+                return False, f"Calificación inválida en fila {idx+2}, columna {col}: {grades[idx]}. Debe estar entre 0 y 10."
         
         return True, "Formato válido"
     
-    def process_excel_upload(self, uploaded_file, materia_id, profesor_id):
-        """Procesa el archivo Excel subido y actualiza las calificaciones"""
+    def detect_format(self, filename):
+        """Obtiene el formato (xlsx, csv o tsv) a partir de la extensión del archivo"""
+        extension = str(filename).rsplit('.', 1)[-1].lower()
+        if extension == 'xls':
+            return 'xlsx'
+        if extension not in FORMATOS:
+            raise ValueError(f"Formato de archivo no soportado: .{extension}")
+        return extension
+    
+    def read_file(self, uploaded_file, formato=None):
+        """Lee un archivo de calificaciones en formato Excel, CSV o TSV"""
+        if formato is None:
+            formato = self.detect_format(getattr(uploaded_file, 'name', uploaded_file))
+        
+        # El mismo archivo subido se lee para la vista previa y para procesarlo
+        if hasattr(uploaded_file, 'seek'):
+            uploaded_file.seek(0)
+        
+        separador = FORMATOS[formato][0]
+        if separador is None:
+            return pd.read_excel(uploaded_file)
+        # utf-8-sig acepta también los CSV guardados desde Excel (con BOM)
+        return pd.read_csv(uploaded_file, sep=separador, dtype={'clave_estudiante': str}, encoding='utf-8-sig')
+    
+    def to_bytes(self, df, formato):
+        """Convierte un DataFrame al contenido de un archivo del formato indicado"""
+        separador = FORMATOS[formato][0]
+        if separador is None:
+            output = io.BytesIO()
+            df.to_excel(output, index=False)
+            return output.getvalue()
+        return df.to_csv(index=False, sep=separador).encode('utf-8-sig')
+    
+    def process_excel_upload(self, uploaded_file, materia_id, profesor_id, usuario=None, formato=None,
+                             grupo=None, semestre=None, estricto=False):
+        """Procesa el archivo (Excel, CSV o TSV) subido y actualiza las calificaciones.
+        
+        Con `estricto`, los conflictos de versión (plantillas desactualizadas) hacen que la
+        carga se reporte como fallida, aunque el resto de los registros sí se guarda.
+        """
         try:
-            # Leer el archivo Excel
-            df = pd.read_excel(uploaded_file)
+            # Leer el archivo según su formato
+            df = self.read_file(uploaded_file, formato)
             
             # Validar formato
             is_valid, message = self.validate_excel_format(df)
             if not is_valid:
                 return False, message
             
-            # Obtener conexión a la base de datos
-            conn = db.get_connection()
+            # Obtener de una sola vez los estudiantes inscritos en la materia (o en el grupo)
+            conn = db.get_read_connection()
             cursor = conn.cursor()
+            query = '''
+                SELECT e.clave, e.id, i.semestre FROM inscripciones i
+                JOIN estudiantes e ON e.id = i.estudiante_id
+                WHERE i.materia_id = ? AND i.profesor_id = ?
+            '''
+            params = [materia_id, profesor_id]
+            for campo, valor in (('i.grupo', grupo), ('i.semestre', semestre)):
+                if valor is not None:
+                    query += f" AND {campo} = ?"
+                    params.append(valor)
+            cursor.execute(query, params)
+            # Sin semestre, un estudiante puede estar inscrito en la materia en varios semestres
+            inscritos = {}
+            for clave, estudiante_id, sem in cursor.fetchall():
+                inscritos.setdefault(clave, {})[sem] = estudiante_id
+            conn.close()
+            
+            # La columna 'version' es opcional (plantillas anteriores no la incluyen)
+            tiene_version = 'version' in df.columns
+            claves_por_id = {estudiante_id: clave for clave, semestres in inscritos.items()
+                             for estudiante_id in semestres.values()}
             
-            updated_count = 0
+            # Convertir de una vez las columnas de calificaciones (las celdas vacías quedan como None)
+            notas = df[GRADE_COLUMNS].apply(pd.to_numeric, errors='coerce')
+            notas = notas.astype(object).where(notas.notna(), None)
+            versiones = df['version'] if tiene_version else [None] * len(df)
+            
+            registros = []
             errors = []
             
-            for idx, row in df.iterrows():
+            for idx, clave_estudiante, grades, version in zip(df.index, df['clave_estudiante'],
+                                                              notas.itertuples(index=False, name=None), versiones):
                 try:
-                    clave_estudiante = row['clave_estudiante']
-                    
-                    # Verificar que el estudiante existe y está inscrito en la materia
-                    cursor.execute('''
-                        SELECT e.id FROM estudiantes e
-                        JOIN inscripciones i ON e.id = i.estudiante_id
-                        WHERE e.clave = ? AND i.materia_id = ? AND i.profesor_id = ?
-                    ''', (clave_estudiante, materia_id, profesor_id))
-                    
-                    result = cursor.fetchone()
-                    if not result:
-                        errors.append(f"Estudiante {clave_estudiante} no encontrado o no inscrito en esta materia")
+                    # Verificar que el estudiante existe y está inscrito en la materia (o en el grupo)
+                    if clave_estudiante not in inscritos:
+                        errors.append(f"Estudiante {clave_estudiante} no encontrado o no inscrito en "
+                                      f"{'el grupo ' + grupo if grupo else 'esta materia'}")
                         continue
+                    if len(inscritos[clave_estudiante]) > 1:
+                        errors.append(f"Estudiante {clave_estudiante} inscrito en varios semestres "
+                                      f"({', '.join(sorted(inscritos[clave_estudiante]))}); indica el semestre")
+                        continue
+                    (semestre_inscripcion, estudiante_id), = inscritos[clave_estudiante].items()
                     
-                    estudiante_id = result[0]
-                    
-                    # Preparar calificaciones (convertir valores vacíos a None)
-                    parcial_1 = float(row['parcial_1']) if pd.notna(row['parcial_1']) and row['parcial_1'] != '' else None
-                    parcial_2 = float(row['parcial_2']) if pd.notna(row['parcial_2']) and row['parcial_2'] != '' else None
-                    parcial_3 = float(row['parcial_3']) if pd.notna(row['parcial_3']) and row['parcial_3'] != '' else None
-                    ordinario = float(row['ordinario']) if pd.notna(row['ordinario']) and row['ordinario'] != '' else None
-                    
-                    # Calcular calificación final si todas las calificaciones están presentes
-                    calificacion_final = None
-                    if all(cal is not None for cal in [parcial_1, parcial_2, parcial_3, ordinario]):
-                        promedio_parciales = (parcial_1 + parcial_2 + parcial_3) / 3
-                        calificacion_final = round((promedio_parciales * 0.5) + (ordinario * 0.5), 1)
-                    
-                    # Actualizar o insertar calificaciones
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO calificaciones 
-                        (estudiante_id, materia_id, profesor_id, parcial_1, parcial_2, parcial_3, 
-                         ordinario, calificacion_final, semestre, fecha_actualizacion)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, "2025-2026A", CURRENT_TIMESTAMP)
-                    ''', (estudiante_id, materia_id, profesor_id, parcial_1, parcial_2, parcial_3, 
-                          ordinario, calificacion_final))
+                    # La calificación final la calcula la base de datos
+                    parcial_1, parcial_2, parcial_3, ordinario = grades
                     
-                    updated_count += 1
+                    registros.append({
+                        'estudiante_id': estudiante_id,
+                        'materia_id': materia_id,
+                        'profesor_id': profesor_id,
+                        'parcial_1': parcial_1,
+                        'parcial_2': parcial_2,
+                        'parcial_3': parcial_3,
+                        'ordinario': ordinario,
+                        'semestre': semestre_inscripcion,
+                        'version': int(version) if pd.notna(version) else None
+                    })
                     
                 except Exception as e:
                     errors.append(f"Error en fila {idx+2}: {str(e)}")
             
-            conn.commit()
-            conn.close()
+            # Actualizar o insertar calificaciones a través del hilo escritor
+            resumen = {'cambiados': 0, 'sin_cambios': 0, 'conflictos': []}
+            if registros:
+                resumen = db.save_calificaciones(registros, usuario=usuario).result()
+            
+            # Filas que otra sesión modificó después de generar la plantilla
+            for conflicto in resumen['conflictos']:
+                errors.append(f"Estudiante {claves_por_id[conflicto['estudiante_id']]}: sus calificaciones fueron "
+                              f"modificadas por otra sesión después de generar la plantilla; descarga una plantilla nueva")
             
+            mensaje = f"Se actualizaron {resumen['cambiados']} registros ({resumen['sin_cambios']} sin cambios)."
+            if estricto and resumen['conflictos']:
+                return False, mensaje + " Errores encontrados:\n" + "\n".join(errors)
             if errors:
-                error_message = f"Se actualizaron {updated_count} registros. Errores encontrados:\n" + "\n".join(errors)
+                error_message = mensaje + " Errores encontrados:\n" + "\n".join(errors)
                 return True, error_message
             else:
-                return True, f"Se actualizaron exitosamente {updated_count} registros de calificaciones."
+                return True, f"Se procesó el archivo exitosamente. {mensaje}"
                 
         except Exception as e:
             return False, f"Error al procesar archivo: {str(e)}"
     
-    def export_grades_to_excel(self, materia_id, profesor_id, materia_nombre):
-        """Exporta las calificaciones actuales a un archivo Excel"""
+    def export_grades_to_excel(self, materia_id, profesor_id, materia_nombre, formato='xlsx', grupo=None, semestre=None):
+        """Exporta las calificaciones actuales (de un grupo si se indica) a un archivo Excel, CSV o TSV"""
         try:
-            estudiantes = db.get_estudiantes_materia(materia_id, profesor_id)
+            estudiantes = db.get_estudiantes_materia(materia_id, profesor_id, grupo=grupo, semestre=semestre)
             
             if not estudiantes:
                 return None
@@ -155,13 +278,169 @@ class ExcelHandler:
             
             df = pd.DataFrame(data)
             
-            # Crear archivo Excel en memoria
-            output_filename = f"calificaciones_{materia_nombre.replace(' ', '_')}.xlsx"
+            # El nombre del archivo lleva la extensión del formato elegido
+            sufijo = f"_{grupo}" if grupo else ""
+            output_filename = f"calificaciones_{materia_nombre.replace(' ', '_')}{sufijo}.{formato}"
             return df, output_filename
             
         except Exception as e:
             st.error(f"Error al exportar calificaciones: {str(e)}")
             return None, None
 
+    def export_workbook(self, output, profesor_id=None, semestre=None, lote=500):
+        """Exporta en un libro de Excel todas las materias de un profesor (o de toda la facultad).
+        
+        Cada combinación de materia, grupo, semestre y profesor va en su propia hoja;
+        con `semestre` solo se exporta ese semestre. Las filas
+        se leen del cursor por lotes y se escriben con el modo de solo escritura de
+        openpyxl, así que la memoria usada no depende del número de estudiantes.
+        `output` puede ser una ruta o un objeto tipo archivo. Devuelve el número de hojas.
+        """
+        wb = Workbook(write_only=True)
+        conn = db.get_read_connection(analitica=True)
+        cursor = conn.cursor()
+        
+        query = '''
+            SELECT m.codigo, i.grupo, i.semestre, p.clave, e.clave,
+                   e.apellido_paterno || ' ' || e.apellido_materno || ' ' || e.nombre,
+                   c.parcial_1, c.parcial_2, c.parcial_3, c.ordinario, c.calificacion_final
+            FROM inscripciones i
+            JOIN estudiantes e ON e.id = i.estudiante_id
+            JOIN materias m ON m.id = i.materia_id
+            JOIN profesores p ON p.id = i.profesor_id
+            LEFT JOIN calificaciones c ON c.estudiante_id = i.estudiante_id AND c.materia_id = i.materia_id
+                                      AND c.profesor_id = i.profesor_id AND c.semestre = i.semestre
+        '''
+        condiciones = []
+        params = []
+        if profesor_id is not None:
+            condiciones.append("i.profesor_id = ?")
+            params.append(profesor_id)
+        if semestre is not None:
+            condiciones.append("i.semestre = ?")
+            params.append(semestre)
+        if condiciones:
+            query += " WHERE " + " AND ".join(condiciones)
+        query += " ORDER BY m.codigo, i.grupo, i.semestre, p.clave, e.apellido_paterno, e.apellido_materno, e.nombre"
+        
+        try:
+            cursor.execute(query, params)
+            
+            hoja_actual = None
+            ws = None
+            titulos = set()
+            
+            while True:
+                filas = cursor.fetchmany(lote)
+                if not filas:
+                    break
+                
+                for codigo, grupo, semestre_fila, clave_profesor, *valores in filas:
+                    # Nueva hoja al cambiar de materia, grupo, semestre o profesor
+                    if (codigo, grupo, semestre_fila, clave_profesor) != hoja_actual:
+                        hoja_actual = (codigo, grupo, semestre_fila, clave_profesor)
+                        partes = [codigo, grupo, semestre_fila]
+                        if profesor_id is None:
+                            partes.append(clave_profesor)
+                        ws = wb.create_sheet(title=self._sheet_title(" ".join(partes), titulos))
+                        ws.append([self._header_cell(ws, header) for header in EXPORT_HEADERS])
+                    
+                    ws.append(valores)
+            
+            if ws is None:
+                # Un libro de Excel necesita al menos una hoja
+                ws = wb.create_sheet(title="Sin datos")
+                ws.append([self._header_cell(ws, header) for header in EXPORT_HEADERS])
+            
+            wb.save(output)
+            return len(titulos) or 1
+        finally:
+            conn.close()
+    
+    def create_bulk_templates(self, output, profesor_id=None, semestre=None, formato='xlsx', jobs=None):
+        """Genera en un solo ZIP las plantillas de todas las combinaciones de profesor, materia y grupo.
+        
+        Los estudiantes de todos los grupos se obtienen con una sola consulta; cada
+        plantilla se genera en un proceso trabajador y se escribe en el ZIP en cuanto
+        está lista. Con `jobs=1` todo se genera en el proceso actual. `output` puede
+        ser una ruta o un objeto tipo archivo; sin `jobs` solo se usan procesos para
+        rosters grandes en xlsx. Devuelve el número de plantillas.
+        """
+        conn = db.get_read_connection()
+        cursor = conn.cursor()
+        
+        query = '''
+            SELECT p.clave, m.codigo, i.grupo, i.semestre, e.clave,
+                   e.apellido_paterno || ' ' || e.apellido_materno || ' ' || e.nombre,
+                   c.parcial_1, c.parcial_2, c.parcial_3, c.ordinario, COALESCE(c.version, 0)
+            FROM inscripciones i
+            JOIN estudiantes e ON e.id = i.estudiante_id
+            JOIN materias m ON m.id = i.materia_id
+            JOIN profesores p ON p.id = i.profesor_id
+            LEFT JOIN calificaciones c ON c.estudiante_id = i.estudiante_id AND c.materia_id = i.materia_id
+                                      AND c.profesor_id = i.profesor_id AND c.semestre = i.semestre
+        '''
+        condiciones = []
+        params = []
+        if profesor_id is not None:
+            condiciones.append("i.profesor_id = ?")
+            params.append(profesor_id)
+        if semestre is not None:
+            condiciones.append("i.semestre = ?")
+            params.append(semestre)
+        if condiciones:
+            query += " WHERE " + " AND ".join(condiciones)
+        query += " ORDER BY p.clave, m.codigo, i.grupo, i.semestre, e.apellido_paterno, e.apellido_materno, e.nombre"
+        
+        try:
+            cursor.execute(query, params)
+            
+            # Una tarea por grupo: (nombre del archivo dentro del ZIP, formato, filas)
+            tareas = []
+            for (clave_profesor, codigo, grupo, sem), filas in groupby(cursor, key=lambda fila: fila[:4]):
+                nombre_archivo = f"{sem}/{clave_profesor}/plantilla_calificaciones_{codigo}_{grupo}.{formato}"
+                tareas.append((nombre_archivo, formato, [fila[4:] for fila in filas]))
+        finally:
+            conn.close()
+        
+        if jobs is None:
+            total_filas = sum(len(tarea[2]) for tarea in tareas)
+            paralelo = formato == 'xlsx' and total_filas >= MIN_FILAS_PARALELO
+        else:
+            paralelo = jobs > 1
+        
+        if paralelo and len(tareas) > 1:
+            executor = self._pool_procesos(jobs or os.cpu_count() or 1)
+            workers = min(self._num_procesos, len(tareas))
+            resultados = executor.map(render_template, tareas, chunksize=max(1, len(tareas) // (workers * 4)))
+        else:
+            resultados = map(render_template, tareas)
+        
+        # Los xlsx ya vienen comprimidos; volver a comprimirlos solo gasta tiempo
+        compresion = zipfile.ZIP_STORED if formato == 'xlsx' else zipfile.ZIP_DEFLATED
+        with zipfile.ZipFile(output, 'w', compression=compresion) as zf:
+            for nombre_archivo, contenido in resultados:
+                zf.writestr(nombre_archivo, contenido)
+        
+        return len(tareas)
+    
+    def _header_cell(self, ws, value):
+        """Crea una celda de encabezado en negritas para hojas de solo escritura"""
+        cell = WriteOnlyCell(ws, value=value)
+        cell.font = Font(bold=True)
+        return cell
+    
+    def _sheet_title(self, title, usados):
+        """Genera un nombre de hoja válido (máximo 31 caracteres) y único dentro del libro"""
+        base = re.sub(r'[\[\]:*?/\\]', '-', title)[:31]
+        candidato = base
+        n = 2
+        while candidato in usados:
+            sufijo = f" ({n})"
+            candidato = base[:31 - len(sufijo)] + sufijo
+            n += 1
+        usados.add(candidato)
+        return candidato
+
 # Instancia global del manejador de Excel
-excel_handler = ExcelHandler()
\ No newline at end of file
+excel_handler = registro().registrar('excel_handler', ExcelHandler)
\ No newline at end of file
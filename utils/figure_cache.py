@@ -0,0 +1,92 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from utils.recursos import registro
+
+
+class FigureCache:
+    """Caché LRU de figuras de Plotly compartida entre sesiones.
+
+    La llave es un hash del contenido de los datos y de los parámetros de la
+    gráfica, así que una figura solo se reconstruye cuando los datos cambian.
+    Se guardan las figuras ya construidas: st.plotly_chart vuelve a validar
+    cualquier figura recibida como diccionario, por lo que guardar solo el JSON
+    casi no ahorraría tiempo. Las figuras en caché no deben modificarse.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, nombre, data, params=None):
+        """Calcula la llave de una gráfica a partir de su nombre, datos y parámetros"""
+        digest = hashlib.sha256(nombre.encode())
+        digest.update(hash_datos(data))
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def get_or_build(self, nombre, data, builder, params=None):
+        """Devuelve la figura en caché para estos datos o la construye con `builder`"""
+        key = self.make_key(nombre, data, params)
+
+        with self._lock:
+            fig = self._entries.get(key)
+            if fig is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return fig
+            self.misses += 1
+
+        fig = builder()
+
+        with self._lock:
+            self._entries[key] = fig
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return fig
+
+    def clear(self):
+        """Vacía la caché"""
+        with self._lock:
+            self._entries.clear()
+
+    def salud(self):
+        """Estado para el registro de recursos"""
+        return self.stats()
+
+    def cerrar(self):
+        self.clear()
+
+    def stats(self):
+        """Devuelve el número de entradas y la tasa de aciertos"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entradas': len(self._entries),
+                'aciertos': self.hits,
+                'fallos': self.misses,
+                'tasa_aciertos': self.hits / total if total else 0.0
+            }
+
+
+def hash_datos(data):
+    """Obtiene un hash estable del contenido de un DataFrame, Series o estructura serializable"""
+    if isinstance(data, (pd.DataFrame, pd.Series)):
+        digest = hashlib.sha256(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+        columnas = list(data.columns) if isinstance(data, pd.DataFrame) else [data.name]
+        digest.update(json.dumps(columnas, default=str).encode())
+        return digest.digest()
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).digest()
+
+
+# Instancia global de la caché de figuras (compartida por todas las sesiones)
+figure_cache = registro().registrar('figure_cache', FigureCache)
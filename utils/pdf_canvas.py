@@ -0,0 +1,223 @@
+import os
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+from utils.pdf_generator import (ANCHOS_FIRMAS, ANCHOS_INFORMACION, COLORES_FILAS, SIN_ESTUDIANTES,
+                                 TITULO_REPORTE)
+
+# Geometría del documento de PDFGenerator.build_report: A4, márgenes de 50 (lados) y
+# 40 (arriba y abajo) puntos y el relleno de 6 puntos del marco de platypus
+X_CONTENIDO = 50 + 6
+ANCHO_CONTENIDO = A4[0] - 2 * 50 - 2 * 6
+Y_SUPERIOR = A4[1] - 40 - 6
+Y_INFERIOR = 40 + 6
+
+# Las celdas de platypus tienen un interlineado de 12 puntos; la altura de una fila es
+# ese interlineado más los rellenos superior e inferior de su estilo
+INTERLINEADO = 12
+ALTO_INFORMACION = INTERLINEADO + 3 + 3
+ALTO_ENCABEZADO_TABLA = INTERLINEADO + 6 + 6
+ALTO_FILA_TABLA = INTERLINEADO + 3 + 3
+ALTOS_FIRMAS = [INTERLINEADO + 5 + 3, INTERLINEADO + 3 + 3, INTERLINEADO + 3 + 3]
+
+# Columna de la tabla de calificaciones alineada a la izquierda (nombre completo)
+COLUMNA_NOMBRE = 2
+
+
+class CanvasReportRenderer:
+    """Dibuja los reportes de PDFGenerator directamente sobre un canvas de ReportLab.
+
+    Produce el mismo encabezado, tabla de calificaciones y sección de firmas que la
+    versión con platypus, pero con coordenadas calculadas de antemano: no se crean
+    flowables ni tablas con estilos, la cuadrícula de la tabla se traza con una sola
+    ruta y el texto de cada página se escribe en un solo objeto de texto. Los anchos de
+    los textos que se repiten en todas las filas (calificaciones, "N/A", encabezados) se
+    miden una sola vez. Los datos (filas, anchos y logo) los toma del generador, así que
+    ambos reportes siempre coinciden.
+    """
+
+    def __init__(self, generador):
+        self.generador = generador
+        self._anchos = {}
+
+    def _escribir(self, texto, x, y):
+        """Texto con la fuente y el color actuales y su línea base en (x, y)"""
+        self._texto.setTextOrigin(x, y)
+        self._texto.textOut(texto)
+
+    def _centrado(self, texto, x, y):
+        """Texto centrado en x"""
+        llave = (texto, self._fuente)
+        ancho = self._anchos.get(llave)
+        if ancho is None:
+            ancho = self._anchos[llave] = stringWidth(texto, *self._fuente)
+        self._escribir(texto, x - ancho / 2.0, y)
+
+    def _nueva_pagina(self):
+        self._terminar_texto()
+        self.canv.showPage()
+        self._iniciar_texto()
+        self.y = Y_SUPERIOR
+
+    def _iniciar_texto(self):
+        self._texto = self.canv.beginText()
+        self._fuente = None
+        self._color = None
+
+    def _terminar_texto(self):
+        # Todo el texto de la página va en un objeto de texto, encima de fondos y líneas
+        self.canv.drawText(self._texto)
+
+    def _estilo_texto(self, fuente, tamano, color=colors.black):
+        if self._fuente != (fuente, tamano):
+            self._texto.setFont(fuente, tamano, INTERLINEADO)
+            self._fuente = (fuente, tamano)
+        if self._color != color:
+            self._texto.setFillColor(color)
+            self._color = color
+
+    def _disponible(self):
+        return self.y - Y_INFERIOR
+
+    def render(self, profesor_info, materia_info, estudiantes_data, tipo_reporte, destino):
+        """Genera el reporte en `destino` (ruta o archivo binario)"""
+        self.canv = canvas.Canvas(destino, pagesize=A4)
+        self.y = Y_SUPERIOR
+        self._iniciar_texto()
+
+        self.draw_header(profesor_info, materia_info, tipo_reporte)
+        if estudiantes_data:
+            data, col_widths = self.generador.grades_table_data(estudiantes_data, tipo_reporte)
+            self.draw_grades_table(data, col_widths)
+        else:
+            self._estilo_texto('Helvetica', 8)
+            self._escribir(SIN_ESTUDIANTES, X_CONTENIDO, self.y - 8)
+            # Interlineado del párrafo y su espacio posterior
+            self.y -= INTERLINEADO + 4
+        self.draw_signature_section(profesor_info)
+
+        self._terminar_texto()
+        self.canv.save()
+
+    def draw_header(self, profesor_info, materia_info, tipo_reporte):
+        """Logo, título y tabla de información del profesor y la materia"""
+        logo_path = self.generador.logo_path
+        if logo_path and os.path.exists(logo_path):
+            try:
+                logo_width, logo_height = self.generador.logo_size()
+                self.canv.drawImage(logo_path, X_CONTENIDO, self.y - logo_height, logo_width, logo_height,
+                                    mask='auto')
+                self.y -= logo_height + 6
+            except Exception as e:
+                print(f"Error al cargar el logo: {e}")
+
+        # Título: Helvetica-Bold de 14 puntos con interlineado de 22, seguido de 8 + 8 puntos
+        self._estilo_texto('Helvetica-Bold', 14, colors.darkblue)
+        self._centrado(TITULO_REPORTE, X_CONTENIDO + ANCHO_CONTENIDO / 2.0, self.y - 14)
+        self.y -= 22 + 8 + 8
+
+        # Tabla de información: columnas de etiqueta en negritas, texto alineado abajo
+        x = X_CONTENIDO + (ANCHO_CONTENIDO - sum(ANCHOS_INFORMACION)) / 2.0
+        for fila in self.generador.header_data(profesor_info, materia_info, tipo_reporte):
+            self.y -= ALTO_INFORMACION
+            columna = x
+            for i, valor in enumerate(fila):
+                fuente = 'Helvetica-Bold' if i % 2 == 0 else 'Helvetica'
+                self._estilo_texto(fuente, 8)
+                self._escribir(str(valor), columna + 6, self.y + 3 + INTERLINEADO - 8)
+                columna += ANCHOS_INFORMACION[i]
+        self.y -= 10
+
+    def draw_grades_table(self, data, col_widths):
+        """Tabla de calificaciones, partida por página con el encabezado repetido"""
+        encabezado, filas = data[0], data[1:]
+        x = X_CONTENIDO + (ANCHO_CONTENIDO - sum(col_widths)) / 2.0
+        posiciones = [x]
+        for ancho in col_widths:
+            posiciones.append(posiciones[-1] + ancho)
+        centros = [x + ancho / 2.0 for x, ancho in zip(posiciones, col_widths)]
+
+        inicio = 0
+        while inicio < len(filas):
+            caben = int((self._disponible() - ALTO_ENCABEZADO_TABLA + 1e-6) // ALTO_FILA_TABLA)
+            if caben <= 0:
+                self._nueva_pagina()
+                continue
+            fin = min(inicio + caben, len(filas))
+            self._draw_table_page(encabezado, filas, inicio, fin, posiciones, centros)
+            inicio = fin
+            if inicio < len(filas):
+                self._nueva_pagina()
+
+    def _draw_table_page(self, encabezado, filas, inicio, fin, posiciones, centros):
+        canv = self.canv
+        arriba = self.y
+        abajo = arriba - ALTO_ENCABEZADO_TABLA - (fin - inicio) * ALTO_FILA_TABLA
+        ancho = posiciones[-1] - posiciones[0]
+
+        # Fondos: encabezado gris y filas alternadas (las blancas no necesitan dibujarse)
+        canv.setFillColor(colors.grey)
+        canv.rect(posiciones[0], arriba - ALTO_ENCABEZADO_TABLA, ancho, ALTO_ENCABEZADO_TABLA, stroke=0, fill=1)
+        actual = colors.grey
+        y = arriba - ALTO_ENCABEZADO_TABLA
+        for i in range(inicio, fin):
+            y -= ALTO_FILA_TABLA
+            color = COLORES_FILAS[i % len(COLORES_FILAS)]
+            if color == colors.white:
+                continue
+            if color != actual:
+                canv.setFillColor(color)
+                actual = color
+            canv.rect(posiciones[0], y, ancho, ALTO_FILA_TABLA, stroke=0, fill=1)
+
+        # Encabezado: texto centrado verticalmente (VALIGN MIDDLE de la tabla de platypus)
+        self._estilo_texto('Helvetica-Bold', 8, colors.whitesmoke)
+        y = arriba - ALTO_ENCABEZADO_TABLA + (6 + ALTO_ENCABEZADO_TABLA - 6 + INTERLINEADO) / 2.0 - 8
+        for titulo, centro in zip(encabezado, centros):
+            self._centrado(titulo, centro, y)
+
+        self._estilo_texto('Helvetica', 7)
+        y = arriba - ALTO_ENCABEZADO_TABLA + (3 + ALTO_FILA_TABLA - 3 + INTERLINEADO) / 2.0 - 7
+        for i in range(inicio, fin):
+            y -= ALTO_FILA_TABLA
+            for columna, valor in enumerate(filas[i]):
+                if not valor:
+                    continue
+                if columna == COLUMNA_NOMBRE:
+                    self._escribir(valor, posiciones[columna] + 6, y)
+                else:
+                    self._centrado(valor, centros[columna], y)
+
+        # Cuadrícula completa en una sola ruta
+        canv.setStrokeColor(colors.black)
+        canv.setLineWidth(0.5)
+        canv.setLineCap(1)
+        canv.setLineJoin(1)
+        alturas = [arriba, arriba - ALTO_ENCABEZADO_TABLA]
+        alturas.extend(arriba - ALTO_ENCABEZADO_TABLA - k * ALTO_FILA_TABLA for k in range(1, fin - inicio + 1))
+        canv.grid(posiciones, alturas)
+
+        self.y = abajo
+
+    def draw_signature_section(self, profesor_info):
+        """Líneas de firma del profesor y de la coordinación"""
+        # Espacio previo de 15 puntos; si no cabe pasa a la página siguiente, como un Spacer
+        if self._disponible() < 15 - 1e-6:
+            self._nueva_pagina()
+        self.y -= 15
+
+        x = X_CONTENIDO + (ANCHO_CONTENIDO - sum(ANCHOS_FIRMAS)) / 2.0
+        centros = [x + ANCHOS_FIRMAS[0] / 2.0, x + ANCHOS_FIRMAS[0] + ANCHOS_FIRMAS[1] / 2.0]
+        for i, fila in enumerate(self.generador.signature_data(profesor_info)):
+            if self._disponible() < ALTOS_FIRMAS[i] - 1e-6:
+                self._nueva_pagina()
+            self.y -= ALTOS_FIRMAS[i]
+            # La fila de líneas usa la fuente por omisión de las celdas (Helvetica de 10)
+            tamano = 10 if i == 0 else 8
+            self._estilo_texto('Helvetica', tamano)
+            for valor, centro in zip(fila, centros):
+                if valor:
+                    self._centrado(valor, centro, self.y + 3 + INTERLINEADO - tamano)
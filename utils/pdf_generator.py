@@ -1,16 +1,185 @@
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, Flowable
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-from datetime import datetime
+from datetime import date, datetime
+from collections import OrderedDict
+import hashlib
+import io
+import json
 import os
+import threading
+from utils.recursos import registro
+
+# Cambiar al modificar el diseño de los reportes: invalida los PDF guardados en caché
+VERSION_PLANTILLA = 2
+
+# Campos que aparecen en el reporte; solo ellos forman parte de la llave de la caché
+CAMPOS_PROFESOR = ('nombre', 'apellido_paterno', 'apellido_materno', 'clave')
+CAMPOS_MATERIA = ('nombre', 'codigo')
+CAMPOS_ESTUDIANTE = ('clave', 'nombre', 'apellido_paterno', 'apellido_materno',
+                     'parcial_1', 'parcial_2', 'parcial_3', 'ordinario', 'calificacion_final')
+
+TITULO_REPORTE = "NOVAUNIVERSITAS - REPORTE DE CALIFICACIONES"
+SIN_ESTUDIANTES = "No hay estudiantes registrados en esta materia."
+
+# Anchos de columna de las tablas de información y de firmas
+ANCHOS_INFORMACION = [1*inch, 2.5*inch, 0.8*inch, 1.2*inch]
+ANCHOS_FIRMAS = [2.8*inch, 2.8*inch]
+
+# Formas de dibujar un reporte (ver PDFGenerator.build_report)
+MOTORES = ('platypus', 'canvas')
+
+# A partir de cuántos estudiantes la tabla de calificaciones se arma página por página
+FILAS_TABLA_LARGA = 200
+
+# Colores alternados de las filas de la tabla de calificaciones
+COLORES_FILAS = [colors.beige, colors.white]
+
+class TablaPaginada(Flowable):
+    """Tabla de calificaciones para listas muy grandes, construida página por página.
+    
+    Al partir un Table a fin de página, ReportLab vuelve a medir todas las filas
+    restantes, así que el tiempo crece con el cuadrado de las filas. Aquí todas las
+    filas tienen la misma altura (una línea de texto), de modo que se calcula cuántas
+    caben en el espacio disponible y se crea un Table solo con ellas, con el
+    encabezado repetido; el resto queda para la página siguiente. El tiempo es
+    lineal y en memoria solo vive la tabla de una página.
+    """
+    
+    def __init__(self, encabezado, filas, col_widths, estilo, inicio=0, medidas=None):
+        Flowable.__init__(self)
+        self.encabezado = encabezado
+        self.filas = filas
+        self.col_widths = col_widths
+        self.estilo = estilo
+        self.inicio = inicio
+        self.hAlign = 'CENTER'
+        self._medidas = medidas
+    
+    def _tabla(self, fin):
+        # Los colores alternados continúan donde terminó la página anterior
+        desfase = self.inicio % len(COLORES_FILAS)
+        colores = COLORES_FILAS[desfase:] + COLORES_FILAS[:desfase]
+        table = Table([self.encabezado] + self.filas[self.inicio:fin], colWidths=self.col_widths, repeatRows=1)
+        table.setStyle(TableStyle(self.estilo + [('ROWBACKGROUNDS', (0, 1), (-1, -1), colores)]))
+        return table
+    
+    def _medir(self):
+        """Altura del encabezado y de una fila, medidas una sola vez con una tabla de muestra"""
+        if self._medidas is None:
+            muestra = Table([self.encabezado, self.filas[0]], colWidths=self.col_widths)
+            muestra.setStyle(TableStyle(self.estilo))
+            muestra.wrap(0, 0)
+            self._medidas = (muestra._rowHeights[0], muestra._rowHeights[1])
+        return self._medidas
+    
+    def wrap(self, availWidth, availHeight):
+        alto_encabezado, alto_fila = self._medir()
+        self.width = sum(self.col_widths)
+        self.height = alto_encabezado + (len(self.filas) - self.inicio) * alto_fila
+        return self.width, self.height
+    
+    def split(self, availWidth, availHeight):
+        alto_encabezado, alto_fila = self._medir()
+        caben = int((availHeight - alto_encabezado + 1e-6) // alto_fila)
+        if caben <= 0:
+            return []
+        fin = self.inicio + caben
+        if fin >= len(self.filas):
+            return [self._tabla(len(self.filas))]
+        return [self._tabla(fin),
+                TablaPaginada(self.encabezado, self.filas, self.col_widths, self.estilo,
+                              inicio=fin, medidas=self._medidas)]
+    
+    def draw(self):
+        table = self._tabla(len(self.filas))
+        table.wrap(self.width, self.height)
+        table.drawOn(self.canv, 0, 0)
+
+class ReportCache:
+    """Caché LRU de reportes PDF ya generados, limitada por tamaño en bytes.
+    
+    La llave es un hash del tipo de reporte, del profesor, de la materia, de las
+    calificaciones, de la versión de la plantilla y del día, así que un reporte solo se
+    vuelve a generar cuando cambia algo de lo que contiene. La fecha impresa siempre es
+    la del día; un reporte servido desde la caché conserva la hora en que se generó.
+    """
+    
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def make_key(self, tipo_reporte, profesor_info, materia_info, estudiantes_data, extra=None):
+        """Calcula la llave de un reporte a partir de los datos que se imprimen en él"""
+        contenido = {
+            'version': VERSION_PLANTILLA,
+            'tipo': tipo_reporte,
+            'profesor': [profesor_info.get(campo) for campo in CAMPOS_PROFESOR],
+            'materia': [materia_info.get(campo) for campo in CAMPOS_MATERIA],
+            'estudiantes': [[est.get(campo) for campo in CAMPOS_ESTUDIANTE] for est in estudiantes_data],
+            'extra': extra
+        }
+        return hashlib.sha256(json.dumps(contenido, default=str).encode()).hexdigest()
+    
+    def get(self, key):
+        """Devuelve los bytes del reporte en caché (o None)"""
+        with self._lock:
+            datos = self._entries.get(key)
+            if datos is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return datos
+    
+    def put(self, key, datos):
+        """Guarda un reporte y descarta los menos usados hasta respetar el límite de bytes"""
+        if len(datos) > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._entries.pop(key, None)
+            if anterior is not None:
+                self.bytes -= len(anterior)
+            self._entries[key] = datos
+            self.bytes += len(datos)
+            while self.bytes > self.max_bytes:
+                _, descartado = self._entries.popitem(last=False)
+                self.bytes -= len(descartado)
+                self.evictions += 1
+    
+    def clear(self):
+        """Vacía la caché"""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+    
+    def stats(self):
+        """Devuelve el número de entradas, los bytes ocupados y la tasa de aciertos"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entradas': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'aciertos': self.hits,
+                'fallos': self.misses,
+                'expulsiones': self.evictions,
+                'tasa_aciertos': self.hits / total if total else 0.0
+            }
 
 class PDFGenerator:
-    def __init__(self, logo_path=None):
+    def __init__(self, logo_path=None, cache_bytes=64 * 1024 * 1024):
         self.styles = getSampleStyleSheet()
         self.logo_path = logo_path
+        self.cache = ReportCache(max_bytes=cache_bytes)
         self.setup_custom_styles()
     
     def setup_custom_styles(self):
@@ -41,6 +210,32 @@ class PDFGenerator:
             alignment=TA_LEFT
         )
     
+    def logo_size(self):
+        """Ancho y alto del logo en el encabezado, manteniendo su proporción"""
+        # Cargar imagen y mantener proporción
+        from PIL import Image as PILImage
+        img = PILImage.open(self.logo_path)
+        aspect = img.height / img.width
+        
+        # Definir ancho máximo y calcular altura proporcional
+        logo_width = 1.2 * inch
+        logo_height = logo_width * aspect
+        
+        # Si la altura es muy grande, limitar por altura
+        if logo_height > 0.6 * inch:
+            logo_height = 0.6 * inch
+            logo_width = logo_height / aspect
+        
+        return logo_width, logo_height
+    
+    def header_data(self, profesor_info, materia_info, tipo_reporte):
+        """Filas de la tabla de información del profesor y la materia"""
+        return [
+            ['Profesor:', f"{profesor_info['nombre']} {profesor_info['apellido_paterno']} {profesor_info['apellido_materno']}", 'Clave:', profesor_info['clave']],
+            ['Materia:', materia_info['nombre'], 'Código:', materia_info['codigo']],
+            ['Tipo:', tipo_reporte, 'Fecha:', datetime.now().strftime("%d/%m/%Y %H:%M")]
+        ]
+    
     def create_header(self, profesor_info, materia_info, tipo_reporte):
         """Crea el encabezado del reporte"""
         elements = []
@@ -48,20 +243,7 @@ class PDFGenerator:
         # Agregar logo si existe - MÁS PEQUEÑO Y PROPORCIONAL
         if self.logo_path and os.path.exists(self.logo_path):
             try:
-                # Cargar imagen y mantener proporción
-                from PIL import Image as PILImage
-                img = PILImage.open(self.logo_path)
-                aspect = img.height / img.width
-                
-                # Definir ancho máximo y calcular altura proporcional
-                logo_width = 1.2 * inch
-                logo_height = logo_width * aspect
-                
-                # Si la altura es muy grande, limitar por altura
-                if logo_height > 0.6 * inch:
-                    logo_height = 0.6 * inch
-                    logo_width = logo_height / aspect
-                
+                logo_width, logo_height = self.logo_size()
                 logo = Image(self.logo_path, width=logo_width, height=logo_height)
                 logo.hAlign = 'LEFT'
                 elements.append(logo)
@@ -70,18 +252,13 @@ class PDFGenerator:
                 print(f"Error al cargar el logo: {e}")
         
         # Título principal - más compacto
-        title = f"NOVAUNIVERSITAS - REPORTE DE CALIFICACIONES"
-        elements.append(Paragraph(title, self.title_style))
+        elements.append(Paragraph(TITULO_REPORTE, self.title_style))
         elements.append(Spacer(1, 8))
         
         # Información del profesor y materia - más compacta
-        info_data = [
-            ['Profesor:', f"{profesor_info['nombre']} {profesor_info['apellido_paterno']} {profesor_info['apellido_materno']}", 'Clave:', profesor_info['clave']],
-            ['Materia:', materia_info['nombre'], 'Código:', materia_info['codigo']],
-            ['Tipo:', tipo_reporte, 'Fecha:', datetime.now().strftime("%d/%m/%Y %H:%M")]
-        ]
+        info_data = self.header_data(profesor_info, materia_info, tipo_reporte)
         
-        info_table = Table(info_data, colWidths=[1*inch, 2.5*inch, 0.8*inch, 1.2*inch])
+        info_table = Table(info_data, colWidths=ANCHOS_INFORMACION)
         info_table.setStyle(TableStyle([
             ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
             ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
@@ -98,13 +275,8 @@ class PDFGenerator:
         
         return elements
     
-    def create_grades_table(self, estudiantes_data, tipo_reporte):
-        """Crea la tabla de calificaciones según el tipo de reporte"""
-        if not estudiantes_data:
-            return [Paragraph("No hay estudiantes registrados en esta materia.", self.normal_style)]
-        
-        elements = []
-        
+    def grades_table_data(self, estudiantes_data, tipo_reporte):
+        """Filas (con encabezado) y anchos de columna de la tabla de calificaciones"""
         # Definir columnas según el tipo de reporte
         if tipo_reporte == "Parcial 1":
             headers = ['No.', 'Clave', 'Nombre Completo', 'Parcial 1', 'Firma']
@@ -155,9 +327,19 @@ class PDFGenerator:
                 data.append([str(i), est['clave'], nombre_completo, str(p1), str(p2), str(p3), str(ord_cal), str(final), ""])
             col_widths = [0.3*inch, 0.75*inch, 2.3*inch, 0.4*inch, 0.4*inch, 0.4*inch, 0.4*inch, 0.5*inch, 0.95*inch]
         
-        # Crear tabla con diseño más compacto
-        table = Table(data, colWidths=col_widths)
-        table.setStyle(TableStyle([
+        return data, col_widths
+    
+    def create_grades_table(self, estudiantes_data, tipo_reporte):
+        """Crea la tabla de calificaciones según el tipo de reporte"""
+        if not estudiantes_data:
+            return [Paragraph(SIN_ESTUDIANTES, self.normal_style)]
+        
+        elements = []
+        
+        data, col_widths = self.grades_table_data(estudiantes_data, tipo_reporte)
+        
+        # Estilo de la tabla con diseño más compacto
+        estilo = [
             # Estilo del encabezado
             ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
             ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
@@ -171,31 +353,43 @@ class PDFGenerator:
             ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
             ('FONTSIZE', (0, 1), (-1, -1), 7),
             ('ALIGN', (2, 1), (2, -1), 'LEFT'),  # Nombres alineados a la izquierda
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.beige, colors.white]),
             ('TOPPADDING', (0, 1), (-1, -1), 3),
             ('BOTTOMPADDING', (0, 1), (-1, -1), 3),
             
             # Bordes
             ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
             ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
+        ]
+        
+        # Listas muy grandes: una tabla por página en lugar de partir una sola tabla
+        if len(data) - 1 > FILAS_TABLA_LARGA:
+            elements.append(TablaPaginada(data[0], data[1:], col_widths, estilo))
+            return elements
+        
+        # El encabezado se repite si la tabla ocupa más de una página
+        table = Table(data, colWidths=col_widths, repeatRows=1)
+        table.setStyle(TableStyle(estilo + [('ROWBACKGROUNDS', (0, 1), (-1, -1), COLORES_FILAS)]))
         
         elements.append(table)
         return elements
     
+    def signature_data(self, profesor_info):
+        """Filas de la sección de firmas"""
+        return [
+            ['_' * 35, '_' * 35],
+            [f"Profesor: {profesor_info['nombre']} {profesor_info['apellido_paterno']}", 'Vo.Bo. Coordinación Académica'],
+            [f"Clave: {profesor_info['clave']}", '']
+        ]
+    
     def create_signature_section(self, profesor_info):
         """Crea la sección de firmas - MÁS COMPACTA"""
         elements = []
         elements.append(Spacer(1, 15))
         
         # Crear tabla para firmas más pequeña
-        signature_data = [
-            ['_' * 35, '_' * 35],
-            [f"Profesor: {profesor_info['nombre']} {profesor_info['apellido_paterno']}", 'Vo.Bo. Coordinación Académica'],
-            [f"Clave: {profesor_info['clave']}", '']
-        ]
+        signature_data = self.signature_data(profesor_info)
         
-        signature_table = Table(signature_data, colWidths=[2.8*inch, 2.8*inch])
+        signature_table = Table(signature_data, colWidths=ANCHOS_FIRMAS)
         signature_table.setStyle(TableStyle([
             ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
             ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
@@ -207,10 +401,21 @@ class PDFGenerator:
         elements.append(signature_table)
         return elements
     
-    def generate_report(self, profesor_info, materia_info, estudiantes_data, tipo_reporte, output_path):
-        """Genera el reporte PDF completo"""
+    def build_report(self, profesor_info, materia_info, estudiantes_data, tipo_reporte, destino, motor='platypus'):
+        """Construye el PDF en `destino` (ruta o archivo binario) sin pasar por la caché.
+        
+        `motor` elige cómo se dibuja: 'platypus' (flowables de ReportLab) o 'canvas'
+        (el mismo reporte dibujado directamente con coordenadas precalculadas).
+        """
+        if motor not in MOTORES:
+            raise ValueError(f"Motor de reportes desconocido: {motor} (disponibles: {', '.join(MOTORES)})")
+        if motor == 'canvas':
+            from utils.pdf_canvas import CanvasReportRenderer
+            CanvasReportRenderer(self).render(profesor_info, materia_info, estudiantes_data, tipo_reporte, destino)
+            return
+        
         # Márgenes reducidos para aprovechar mejor el espacio
-        doc = SimpleDocTemplate(output_path, pagesize=A4, 
+        doc = SimpleDocTemplate(destino, pagesize=A4, 
                               rightMargin=50, leftMargin=50, 
                               topMargin=40, bottomMargin=40)
         
@@ -227,8 +432,58 @@ class PDFGenerator:
         
         # Construir PDF
         doc.build(story)
+    
+    def _logo_firma(self):
+        """Ruta y fecha de modificación del logo: cambiar el logo invalida la caché"""
+        if self.logo_path and os.path.exists(self.logo_path):
+            return [self.logo_path, os.path.getmtime(self.logo_path)]
+        return None
+    
+    def render_report(self, profesor_info, materia_info, estudiantes_data, tipo_reporte, motor='platypus'):
+        """Devuelve el reporte PDF como bytes, reutilizando uno idéntico ya generado"""
+        # El encabezado imprime la fecha: un reporte de otro día no se reutiliza
+        key = self.cache.make_key(tipo_reporte, profesor_info, materia_info, estudiantes_data,
+                                  extra=[self._logo_firma(), motor, date.today().isoformat()])
+        datos = self.cache.get(key)
+        if datos is None:
+            buffer = io.BytesIO()
+            self.build_report(profesor_info, materia_info, estudiantes_data, tipo_reporte, buffer, motor=motor)
+            datos = buffer.getvalue()
+            self.cache.put(key, datos)
+        return datos
+    
+    def generate_report(self, profesor_info, materia_info, estudiantes_data, tipo_reporte, output_path,
+                        motor='platypus'):
+        """Genera el reporte PDF completo"""
+        datos = self.render_report(profesor_info, materia_info, estudiantes_data, tipo_reporte, motor=motor)
+        with open(output_path, 'wb') as f:
+            f.write(datos)
         
         return output_path
+    
+    def salud(self):
+        """Estado para el registro de recursos"""
+        return {'cache': self.cache.stats()}
+    
+    def cerrar(self):
+        self.cache.clear()
+
+# Generador de cada proceso trabajador (se crea al generar su primer reporte)
+_generador_trabajador = None
+
+def generar_reporte(tarea):
+    """Genera un reporte desde un proceso trabajador y devuelve su ruta.
+    
+    `tarea` es una tupla (logo_path, profesor_info, materia_info, estudiantes_data,
+    tipo_reporte, output_path, motor); este módulo no importa la base de datos ni Streamlit.
+    """
+    global _generador_trabajador
+    logo_path, profesor_info, materia_info, estudiantes_data, tipo_reporte, output_path, motor = tarea
+    if _generador_trabajador is None or _generador_trabajador.logo_path != logo_path:
+        _generador_trabajador = PDFGenerator(logo_path=logo_path)
+    return _generador_trabajador.generate_report(profesor_info, materia_info, estudiantes_data,
+                                                 tipo_reporte, output_path, motor=motor)
 
-# Ejemplo de uso con logo
-# pdf_generator = PDFGenerator(logo_path='logo.png')
+# Generador de la aplicación con el logo (uno por proceso, compartido por todas las sesiones)
+# El logo debe estar en la carpeta raíz o especifica la ruta completa
+pdf_generator = registro().registrar('pdf_generator', lambda: PDFGenerator(logo_path='logo.png'))
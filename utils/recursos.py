@@ -0,0 +1,142 @@
+import atexit
+import gc
+import os
+import sys
+import threading
+import time
+import types
+
+# Atributo de `sys` donde vive el registro: sobrevive a que Streamlit vuelva a
+# importar los módulos de la aplicación, porque `sys` nunca se recarga
+_ATRIBUTO = '_calificaciones_recursos'
+
+# Tipos que no se recorren al estimar memoria (son compartidos, no del recurso)
+_TIPOS_COMPARTIDOS = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+                      types.MethodType, threading.Thread)
+
+
+class RegistroRecursos:
+    """Registro de los objetos pesados del proceso del servidor.
+
+    Cada recurso (base de datos con sus pools y su copia analítica, manejador de
+    Excel con sus procesos trabajadores, generador de PDF, caché de figuras) se
+    crea una sola vez por proceso y lo comparten todas las sesiones. Los recursos
+    pueden definir los métodos opcionales calentar(), cerrar(), salud() y
+    limite_memoria_cache() (bytes que pueden ocupar como máximo fuera de los objetos
+    de Python, p. ej. la caché de SQLite, cuyo uso real no se puede medir).
+    """
+
+    def __init__(self):
+        self._recursos = {}
+        self._orden = []
+        self._lock = threading.RLock()
+        self.calentado = False
+
+    def registrar(self, nombre, fabrica):
+        """Devuelve el recurso `nombre`; solo la primera vez se crea con `fabrica()`"""
+        with self._lock:
+            if nombre not in self._recursos:
+                self._recursos[nombre] = fabrica()
+                self._orden.append(nombre)
+            return self._recursos[nombre]
+
+    def obtener(self, nombre):
+        """Devuelve un recurso ya registrado"""
+        return self._recursos[nombre]
+
+    def nombres(self):
+        return list(self._orden)
+
+    def _llamar(self, nombre, metodo):
+        funcion = getattr(self._recursos[nombre], metodo, None)
+        return funcion() if callable(funcion) else None
+
+    def calentar(self):
+        """Prepara todos los recursos (una vez por proceso); devuelve los segundos por recurso"""
+        with self._lock:
+            if self.calentado:
+                return {}
+            tiempos = {}
+            for nombre in self._orden:
+                inicio = time.perf_counter()
+                self._llamar(nombre, 'calentar')
+                tiempos[nombre] = round(time.perf_counter() - inicio, 4)
+            self.calentado = True
+            return tiempos
+
+    def cerrar(self):
+        """Libera los recursos en orden inverso al de su registro"""
+        with self._lock:
+            for nombre in reversed(self._orden):
+                try:
+                    self._llamar(nombre, 'cerrar')
+                except Exception:
+                    pass
+            self.calentado = False
+
+    def salud(self):
+        """Estado de cada recurso; un recurso cuya verificación falla se reporta con su error"""
+        estado = {}
+        for nombre in self.nombres():
+            try:
+                detalle = self._llamar(nombre, 'salud')
+                estado[nombre] = {'ok': True, **(detalle or {})}
+            except Exception as e:
+                estado[nombre] = {'ok': False, 'error': str(e)}
+        return {'ok': all(r['ok'] for r in estado.values()), 'recursos': estado}
+
+    def memoria(self):
+        """Memoria medida de los objetos de cada recurso, topes de sus cachés externas y memoria del proceso (bytes)"""
+        recursos = {}
+        limites = {}
+        for nombre in self.nombres():
+            recursos[nombre] = tamano_profundo(self._recursos[nombre])
+            limite = self._llamar(nombre, 'limite_memoria_cache')
+            if limite is not None:
+                limites[nombre] = limite
+        return {'proceso_rss': memoria_residente(), 'recursos': recursos, 'limites_cache': limites}
+
+
+def tamano_profundo(objeto, limite=200000):
+    """Suma sys.getsizeof de un objeto y de todo lo que referencia (sin módulos, clases ni funciones)"""
+    vistos = set()
+    pendientes = [objeto]
+    total = 0
+    while pendientes and len(vistos) < limite:
+        actual = pendientes.pop()
+        if id(actual) in vistos or isinstance(actual, _TIPOS_COMPARTIDOS):
+            continue
+        vistos.add(id(actual))
+        try:
+            total += sys.getsizeof(actual)
+        except TypeError:
+            continue
+        pendientes.extend(gc.get_referents(actual))
+    return total
+
+
+def memoria_residente():
+    """Memoria residente actual del proceso en bytes (None si el sistema no la expone)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        try:
+            import resource
+            # ru_maxrss es el máximo (KiB en Linux, bytes en macOS)
+            maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return maximo if sys.platform == 'darwin' else maximo * 1024
+        except ImportError:
+            return None
+
+
+def registro():
+    """Registro de recursos del proceso (el mismo aunque los módulos se vuelvan a importar)"""
+    actual = getattr(sys, _ATRIBUTO, None)
+    if actual is None:
+        # setdefault es atómico: si dos hilos llegan a la vez, ambos obtienen el mismo registro
+        nuevo = RegistroRecursos()
+        actual = vars(sys).setdefault(_ATRIBUTO, nuevo)
+        if actual is nuevo:
+            atexit.register(actual.cerrar)
+    return actual
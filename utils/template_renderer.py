@@ -0,0 +1,44 @@
+import csv
+import io
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+# Columnas de las plantillas de carga (las mismas que genera ExcelHandler.create_template)
+TEMPLATE_COLUMNS = ['clave_estudiante', 'nombre_completo', 'parcial_1', 'parcial_2', 'parcial_3', 'ordinario', 'version']
+
+# Separadores de los formatos de texto
+SEPARADORES = {'csv': ',', 'tsv': '\t'}
+
+
+def render_template(tarea):
+    """Genera el contenido de una plantilla a partir de sus filas.
+
+    Se ejecuta en los procesos trabajadores de la generación masiva, por eso este
+    módulo no importa la base de datos ni Streamlit. `tarea` es una tupla
+    (nombre_archivo, formato, filas) y se devuelve (nombre_archivo, contenido).
+    """
+    nombre_archivo, formato, filas = tarea
+
+    if formato in SEPARADORES:
+        output = io.StringIO()
+        writer = csv.writer(output, delimiter=SEPARADORES[formato], lineterminator='\n')
+        writer.writerow(TEMPLATE_COLUMNS)
+        writer.writerows(['' if valor is None else valor for valor in fila] for fila in filas)
+        return nombre_archivo, output.getvalue().encode('utf-8-sig')
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title="Calificaciones")
+    encabezados = []
+    for columna in TEMPLATE_COLUMNS:
+        cell = WriteOnlyCell(ws, value=columna)
+        cell.font = Font(bold=True)
+        encabezados.append(cell)
+    ws.append(encabezados)
+    for fila in filas:
+        ws.append(fila)
+
+    output = io.BytesIO()
+    wb.save(output)
+    return nombre_archivo, output.getvalue()